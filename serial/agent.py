@@ -19,13 +19,19 @@ Usage:
 import os, sys, socket, subprocess, time
 
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple, _qmon
+from temple import (Temple, TempleException, ARRAY_TYPES, _array_bytes,
+                    _array_target, _array_from, _mem_chunk, _qmon, np)
+from prepared import Prepared
+from symcache import defined_names
 from agent_server import (push_cmd, get_result, start_background,
                           _cmd_queue, _result_queue)
 
 _AGENT_SRC = os.path.join(os.path.dirname(__file__),
                            '..', 'brain', 'templerepo', 'AgentLoop.HC')
 _PORT = 8081
+_MEM_CHUNK = 1280       # AgMemRead bytes per command (g_agent_out is 1300)
+_HEX_LINE = 96          # put_array bytes per AgHexPut line (255-byte lexer lines)
+_HEX_LINES = 8          # AgHexPut lines per command (g_agent_cmd is 2048)
 
 
 # ── helpers ───────────────────────────────────────────────────────────────────
@@ -62,12 +68,22 @@ class Agent:
       • Clean shutdown via EXIT
 
     All HolyC globals and functions defined in one run() call persist
-    in subsequent calls — ExeFile runs in the same HolyC task.
+    in subsequent calls — ExePutS runs in the same HolyC task.
+
+    debug=True launches AgentLoop with g_agent_debug=1: each command goes
+    through C:/AI/_cmd.HC + ExeFile and C:/AI/debug.txt is rewritten after
+    every command, for post-mortem of a command that panics the VM.
     """
 
-    def __init__(self, port: int = _PORT, snap: str = 'snap1'):
+    def __init__(self, port: int = _PORT, snap: str = 'snap1',
+                 debug: bool = False, symbols: bool = False):
         self.port = port
         self.snap = snap
+        self.debug = debug
+        self.symbols = symbols          # load a SymbolCache in start()
+        self.syms = None
+        self._arrays = {}               # put_array() name -> element type
+        self._prepared = {}             # prepared snippets defined this session
         self._t: Temple | None = None   # serial connection kept open
         self._live = False
 
@@ -102,6 +118,8 @@ class Agent:
         Returns True if online, False on timeout.
         """
         _flush_queues()
+        self._prepared.clear()
+        self._arrays.clear()
 
         if _server_alive(self.port):
             subprocess.run(['fuser', '-k', f'{self.port}/tcp'],
@@ -117,6 +135,9 @@ class Agent:
         self._t.connect()
         if pre_deploy is not None:
             pre_deploy(self._t)
+        if self.symbols:
+            # over serial, while the REPL is still free (saved per snapshot)
+            self.syms = self._t.symbol_cache(self.snap)
         self._deploy()
 
         ok = self._wait_online(timeout=timeout)
@@ -174,11 +195,44 @@ class Agent:
         Load HolyC definitions (functions, globals) into the agent environment.
 
         Definitions persist in subsequent run() calls.  Output is discarded.
+        With the symbol index attached (Agent(symbols=True)) the names the
+        code defines are added to it once it has compiled, so
+        symbol_exists() and complete() see them without a round trip.
         Example:
             ag.define('I64 Sq(I64 x) { return x*x; }')
             ag.eval_i64('Sq(7)')  # → 49
         """
-        self.run(code, timeout=timeout)
+        if self.syms is None:
+            self.run(code, timeout=timeout)
+            return
+        out = self.run(code + 'CatPrint(g_agent_out,"\\nOK");', timeout=timeout)
+        if out.endswith('OK'):
+            for name, kind, cls in defined_names(code):
+                self.syms.add(name, kind, cls=cls)
+
+    def symbol_exists(self, name: str) -> bool:
+        """
+        True if name is a function, global or class. A hit in the symbol
+        index (Agent(symbols=True)) costs nothing; otherwise one HashFind
+        over AgentLoop, and a symbol found that way is added to the index.
+        """
+        if self.syms is not None and name in self.syms:
+            return True
+        out = self.run(
+            f'I64 _st=0; CHash *_h=HashFind("{name}",Fs->hash_table,'
+            f'HTT_FUN|HTT_GLBL_VAR|HTT_CLASS);'
+            f'if(_h)_st=_h->type; StrPrint(g_agent_out,"%d\\n",_st);')
+        t = int(out) if out.isdigit() else 0
+        if not t:
+            return False
+        if self.syms is not None:
+            kind = 'fun' if t & 64 else 'glbl' if t & 8 else 'class'
+            self.syms.add(name, kind, type=t)
+        return True
+
+    def complete(self, prefix: str, kind: str | None = None) -> list:
+        """Symbol names starting with prefix, from the index ([] without)."""
+        return self.syms.complete(prefix, kind) if self.syms else []
 
     def eval_i64(self, expr: str, timeout: float = 20) -> int | None:
         """Evaluate a HolyC I64 expression, return Python int."""
@@ -212,6 +266,43 @@ class Agent:
         except (ValueError, AttributeError):
             return None
 
+    def prepare(self, code: str, params=(), ret='I64', timeout: float = 10):
+        """
+        Define `code` as a HolyC function once and return a Prepared handle
+        (prepared.py); each call then sends only the short invocation:
+            sq = ag.prepare('x*x', 'I64 x')
+            [sq(i) for i in range(100)]     # one compile of the body
+        Cached by source hash for this session. ret: 'I64', 'F64', 'U8 *'
+        (str) or 'U0' (returns whatever the function wrote to g_agent_out).
+        Raises RuntimeError if the definition does not compile.
+        """
+        p = Prepared(self, code, params, ret)
+        if p.name not in self._prepared:
+            out = self.run(p.source + 'StrPrint(g_agent_out,"OK");',
+                           timeout=timeout)
+            if out != 'OK':
+                raise RuntimeError(f'prepare {p.name} failed: {out or "timeout"}')
+            self._prepared[p.name] = p
+        return self._prepared[p.name]
+
+    _PREPARED_FMT = {'I64': '%lld', 'F64': '%.10f', 'U8 *': '%s'}
+
+    def _call_prepared(self, p, args, timeout: float = 20):
+        call = p.call_expr(args)
+        if p.ret == 'U0':
+            return self.run(f'{call};', timeout=timeout)
+        out = self.run(f'StrPrint(g_agent_out,"{self._PREPARED_FMT[p.ret]}\\n",'
+                       f'{call});', timeout=timeout)
+        if p.ret == 'U8 *':
+            return out.strip()
+        try:
+            return (int if p.ret == 'I64' else float)(out.strip())
+        except ValueError:
+            return None
+
+    def _map_prepared(self, p, arg_tuples):
+        return [self._call_prepared(p, a) for a in arg_tuples]
+
     # ── system introspection ──────────────────────────────────────────────────
 
     def uptime(self) -> float:
@@ -247,16 +338,108 @@ class Agent:
         """Read an I64 value from TempleOS virtual address."""
         return self.eval_hex(f'({addr})(I64*)[0]')
 
+    def read_mem(self, addr: int, count: int, array: bool = False,
+                 strict: bool = True, window: int = 8, timeout: float = 20):
+        """
+        Read `count` bytes from addr as raw binary. AgMemRead copies up to
+        _MEM_CHUNK bytes per command into g_agent_out and POSTs them as is,
+        followed by one mapped flag per 4KB page; up to `window` commands
+        are queued at once. Unmapped pages (ChkPtr) read as zeros, or raise
+        TempleException with strict=True. Returns bytes, or a NumPy uint8
+        array with array=True. None on timeout.
+        """
+        if array and np is None:
+            raise ImportError('read_mem(array=True) needs numpy')
+        spans = [(a, min(_MEM_CHUNK, addr + count - a))
+                 for a in range(addr, addr + count, _MEM_CHUNK)]
+        chunks = []
+        for i in range(0, len(spans), window):
+            batch = spans[i:i + window]
+            for a, n in batch:
+                push_cmd(f'AgMemRead({a},{n});')
+            raws = [get_result(timeout=timeout) for _ in batch]
+            if None in raws:
+                return None
+            chunks += [_mem_chunk(a, n, raw, strict)
+                       for (a, n), raw in zip(batch, raws)]
+        data = b''.join(chunks)
+        return np.frombuffer(data, np.uint8) if array else data
+
     def read_mem_bytes(self, addr: int, count: int,
                        timeout: float = 20) -> str:
         """Read `count` bytes from addr, return as hex pairs (space-separated)."""
-        code = (
-            f'I64 _i; for(_i=0;_i<{count};_i++){{'
-            f'  StrPrint(g_agent_out+StrLen(g_agent_out),'
-            f'    "%02X ",({addr}+_i)(U8*)[0]);'
-            f'}}'
-        )
-        return self.run(code, timeout=timeout).strip()
+        data = self.read_mem(addr, count, strict=False, timeout=timeout)
+        return ' '.join(f'{b:02X}' for b in data) if data else ''
+
+    def put_array(self, name: str, data, window: int = 8,
+                  timeout: float = 20):
+        """
+        Store a vector in guest global `name`, like Temple.put_array: a new
+        name becomes an I64/F64/U8 pointer plus I64 name_cnt, a pointer of
+        the same type gets a new buffer, a big enough fixed array of that
+        type is written in place; anything else raises TempleException
+        (AgArrInfo tells which). Commands are HolyC source, so the bytes
+        travel as hex: AgHexPut lines of _HEX_LINE bytes, _HEX_LINES per
+        command, up to `window` commands queued at once. Raises
+        TempleException if the guest reports EXCEPT or a command times out.
+        """
+        ctype, raw = _array_bytes(data)
+        n = len(raw) // ARRAY_TYPES[ctype][2]
+        info = self.run(f'AgArrInfo("{name}");', timeout=timeout)
+        if not info:
+            raise TempleException('timeout')
+        mode, has_cnt = _array_target(name, ctype, n, info)
+        decl = ''
+        if mode == 'new':
+            decl = f'{ctype} *{name}=NULL;'
+        if mode != 'fixed' and not has_cnt:
+            decl += f'I64 {name}_cnt=0;'
+        if decl:
+            self.run(decl, timeout=timeout)
+        setup = f'{name}_cnt={n};' if mode != 'fixed' or has_cnt else ''
+        if mode != 'fixed':
+            setup = f'Free({name});{name}=MAlloc({max(len(raw), 1)});' + setup
+        out = self.run(setup + 'StrPrint(g_agent_out,"OK");', timeout=timeout)
+        if out != 'OK':
+            raise TempleException(out or 'timeout')
+        step = _HEX_LINE * _HEX_LINES
+        cmds = ['\n'.join(f'AgHexPut({name}(U8 *)+{o},'
+                          f'"{raw[o:o + _HEX_LINE].hex().upper()}");'
+                          for o in range(off, min(off + step, len(raw)),
+                                         _HEX_LINE))
+                for off in range(0, len(raw), step)]
+        for i in range(0, len(cmds), window):
+            batch = cmds[i:i + window]
+            for cmd in batch:
+                push_cmd(cmd)
+            for _ in batch:
+                r = get_result(timeout=timeout)
+                if r is None or r.startswith(b'EXCEPT'):
+                    raise TempleException('timeout' if r is None else 'except')
+        self._arrays[name] = ctype
+
+    def get_array(self, name: str, ctype: str | None = None,
+                  count: int | None = None, timeout: float = 20):
+        """
+        Read a vector back: one command for its address and name_cnt (or
+        `count` elements at name), then raw bytes via read_mem().
+        ctype defaults to the put_array() type. Returns a NumPy array, or
+        an array.array without NumPy; None on timeout.
+        """
+        ctype = ctype or self._arrays.get(name)
+        if ctype not in ARRAY_TYPES:
+            raise ValueError(f'{name}: element type {ctype!r} not one of '
+                             f'{", ".join(ARRAY_TYPES)}')
+        cnt = f'{name}_cnt' if count is None else count
+        out = self.run(f'StrPrint(g_agent_out,"%d %d\\n",{name},{cnt});',
+                       timeout=timeout)
+        try:
+            addr, n = map(int, out.split())
+        except ValueError:
+            return None
+        raw = self.read_mem(addr, n * ARRAY_TYPES[ctype][2],
+                            timeout=timeout) if n else b''
+        return None if raw is None else _array_from(ctype, raw)
 
     # ── file operations (via serial Temple connection) ────────────────────────
 
@@ -266,6 +449,13 @@ class Agent:
             return None
         return self._t.read_file(path, timeout=timeout)
 
+    def read_files(self, pattern, dest: str | None = None,
+                   timeout: float = 60) -> dict | None:
+        """Read many TempleOS files in one exchange (e.g. 'C:/AI/results/*')."""
+        if self._t is None:
+            return None
+        return self._t.read_files(pattern, dest=dest, timeout=timeout)
+
     def write_file(self, path: str, data: bytes):
         """Write bytes to a TempleOS path."""
         if self._t:
@@ -283,7 +473,10 @@ class Agent:
             self._t.mkdir(path)
 
     def read_debug_log(self) -> str | None:
-        """Read AgentLoop's debug log (written to C:/AI/debug.txt on EXIT)."""
+        """
+        Read AgentLoop's debug log (C:/AI/debug.txt). Written on EXIT, and
+        after every command when the Agent was started with debug=True.
+        """
         data = self.read_file('C:/AI/debug.txt', timeout=5)
         return data.decode(errors='replace') if data else None
 
@@ -295,14 +488,7 @@ class Agent:
             content = f.read()
 
         # drain stale serial bytes
-        self._t.s.settimeout(2)
-        try:
-            while True:
-                if not self._t.s.recv(4096):
-                    break
-        except Exception:
-            pass
-        self._t.s.settimeout(None)
+        self._t._discard_input(quiet=2)
 
         # ensure REPL is up
         if not self._t.is_frozen(timeout=15):
@@ -316,8 +502,11 @@ class Agent:
                 time.sleep(0.5)
 
         self._t.mkdir('C:/AI')
-        self._t.write_file('C:/AI/AgentLoop.HC', content)
-        self._t.s.sendall(b'#include "C:/AI/AgentLoop.HC";\n')
+        self._t.write_file('C:/AI/AgentLoop.HC', content, compressed=True)
+        launch = '#include "C:/AI/AgentLoop.HC";'
+        if self.debug:
+            launch = 'I64 g_agent_debug=1;' + launch
+        self._t.s.sendall(launch.encode() + b'\n')
 
     def _wait_online(self, timeout: float = 60, poll: float = 5.0) -> bool:
         """
@@ -9,12 +9,13 @@ Features:
   • Execute HolyC interactively — globals/functions persist between lines
   • Multi-line input: end a line with \\ for continuation; { auto-continues
   • @file.HC          load and execute a host-side HolyC file
+  • Tab completes symbol names from the cached symbol index (symcache.py)
   • Built-in commands (prefix :):
       :sys            TempleOS system info (uptime, free mem, tasks)
       :tasks          list all running TempleOS tasks
       :ls  [path]     list directory (default C:/AI/*)
       :cat <path>     read + print a TempleOS file
-      :hex <addr>     dump 64 bytes from a virtual address
+      :hex <addr> [n] dump n bytes (default 64) from a virtual address
       :debug          print AgentLoop debug log
       :history        print command history
       :reset          restart AgentLoop (clears all JIT definitions)
@@ -60,6 +61,17 @@ def _setup_readline():
     import atexit
     atexit.register(readline.write_history_file, _HIST)
 
+def _setup_completion(ag: Agent):
+    """Tab-complete HolyC symbol names from the agent's symbol index."""
+    def complete(text, state):
+        if state == 0:
+            complete.matches = ag.complete(text) if text else []
+        return (complete.matches[state]
+                if state < len(complete.matches) else None)
+    readline.set_completer_delims(' \t\n;,(){}[]+-*/%&|^!~<>=?:"\'')
+    readline.set_completer(complete)
+    readline.parse_and_bind('tab: complete')
+
 def _history_lines() -> list[str]:
     return [readline.get_history_item(i + 1)
             for i in range(readline.get_current_history_length())]
@@ -162,31 +174,29 @@ def _cmd_cat(ag: Agent, path: str):
 
 def _cmd_hex(ag: Agent, arg: str):
     if not arg:
-        print(_c(_RED, 'Usage: :hex <address>'))
+        print(_c(_RED, 'Usage: :hex <address> [count]'))
         return
+    parts = arg.split()
     try:
-        addr = int(arg, 16) if arg.startswith('0x') else int(arg, 16)
+        addr = int(parts[0], 16)
+        count = int(parts[1], 0) if len(parts) > 1 else 64
     except ValueError:
         print(_c(_RED, f'Bad address: {arg}'))
         return
 
-    out = ag.read_mem_bytes(addr, 64)
-    if not out:
+    data = ag.read_mem(addr, count, strict=False)
+    if not data:
         print(_c(_RED, 'Read failed (timeout or bad address)'))
         return
 
-    # format as xxd-style hex dump
-    raw = out.split()
+    # format as xxd-style hex dump (unmapped pages read as 00)
     print(_c(_BOLD, f'\n--- memory @ 0x{addr:016X} ---'))
-    for row in range(0, len(raw), 16):
-        chunk = raw[row:row + 16]
+    for row in range(0, len(data), 16):
+        chunk = data[row:row + 16]
         addr_str = f'{addr + row:016X}'
-        hex_str  = ' '.join(chunk)
+        hex_str  = ' '.join(f'{b:02X}' for b in chunk)
         # ascii side
-        chars = ''.join(
-            chr(int(b, 16)) if 0x20 <= int(b, 16) < 0x7F else '.'
-            for b in chunk
-        )
+        chars = ''.join(chr(b) if 0x20 <= b < 0x7F else '.' for b in chunk)
         print(f'  {_c(_DIM, addr_str)}  {hex_str:<47}  {_c(_DIM, chars)}')
     print()
 
@@ -286,12 +296,15 @@ def main():
     parser = argparse.ArgumentParser(description='TempleOS HolyC REPL')
     parser.add_argument('--no-snap', action='store_true',
                         help='Skip loadvm — assume VM already at snap1 state')
+    parser.add_argument('--debug', action='store_true',
+                        help='Run commands via C:/AI/_cmd.HC and flush '
+                             'C:/AI/debug.txt after each one')
     args = parser.parse_args()
 
     _setup_readline()
     _banner()
 
-    ag = Agent()
+    ag = Agent(debug=args.debug, symbols=True)
 
     if args.no_snap:
         # Assume VM is ready; just start the HTTP server and deploy
@@ -307,6 +320,7 @@ def main():
         time.sleep(0.5)
         ag._t = __import__('temple').Temple()
         ag._t.connect()
+        ag.syms = ag._t.symbol_cache(ag.snap)
         ag._deploy()
         ok = ag._wait_online(timeout=60)
     else:
@@ -318,6 +332,7 @@ def main():
         sys.exit(1)
 
     print(_c(_GREEN, 'Agent online.  Type HolyC or :help for commands.\n'))
+    _setup_completion(ag)
 
     history: list[str] = []
 
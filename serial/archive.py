@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+archive.py — Multi-file archive formats shared with SerUnpack.HC and SerPack.HC
+
+Upload (host to guest, SerUnpack): one archive carries many files in a
+single upload:
+
+    U32 count
+    count x { U32 size; U8 path[] NUL }     header table
+    bodies, concatenated in table order
+
+All integers are little-endian. Paths are full TempleOS paths
+('C:/AI/tests/TestMalloc.HC'). SerUnpack(size,z) receives it with
+SerRecvChunk, optionally CompressBuf'd as a whole, and FileWrites every
+entry, so .Z names end up compressed on disk as usual.
+
+Download (guest to host, SerPack): a stream with a header before each file,
+so the guest can send files as it reads them:
+
+    { U32 size; U32 crc32; U8 path[] NUL; U8 body[size] } ...
+
+The body is the file as FileRead returns it (.Z expanded) and crc32 is
+zlib.crc32 of the body. The stream ends with the frame.
+
+Usage:
+    import archive
+    arc = archive.pack({'C:/AI/a.HC': b'...', 'C:/AI/b.HC': b'...'})
+    files = archive.unpack(arc)
+    for path, body, crc in archive.iter_stream(raw):
+        ...
+"""
+import struct
+import zlib
+
+ENTRY_SIZE = struct.Struct('<I')
+STREAM_HDR = struct.Struct('<II')
+
+
+def pack(files):
+    """{guest_path: bytes} -> archive bytes."""
+    table = [struct.pack('<I', len(files))]
+    for path, data in files.items():
+        table.append(ENTRY_SIZE.pack(len(data)) + path.encode('latin-1') + b'\0')
+    return b''.join(table) + b''.join(bytes(d) for d in files.values())
+
+
+def unpack(arc):
+    """Archive bytes -> {guest_path: bytes}. Raises ValueError if malformed."""
+    arc = bytes(arc)
+    if len(arc) < 4:
+        raise ValueError('archive too short')
+    count, = struct.unpack_from('<I', arc)
+    off = 4
+    entries = []
+    for _ in range(count):
+        if off + 4 > len(arc):
+            raise ValueError('truncated header table')
+        size, = ENTRY_SIZE.unpack_from(arc, off)
+        end = arc.find(b'\0', off + 4)
+        if end < 0:
+            raise ValueError('unterminated path')
+        entries.append((arc[off + 4:end].decode('latin-1'), size))
+        off = end + 1
+    files = {}
+    for path, size in entries:
+        if off + size > len(arc):
+            raise ValueError(f'truncated body: {path}')
+        files[path] = arc[off:off + size]
+        off += size
+    if off != len(arc):
+        raise ValueError('trailing bytes after last body')
+    return files
+
+
+def batches(files, limit):
+    """
+    Split {guest_path: bytes} into dicts whose bodies total at most `limit`
+    bytes, in order. A file larger than limit gets a batch of its own.
+    """
+    batch, total = {}, 0
+    for path, data in files.items():
+        if batch and total + len(data) > limit:
+            yield batch
+            batch, total = {}, 0
+        batch[path] = data
+        total += len(data)
+    if batch:
+        yield batch
+
+
+def pack_stream(files):
+    """{guest_path: bytes} -> SerPack stream bytes."""
+    return b''.join(STREAM_HDR.pack(len(d), zlib.crc32(d)) +
+                    p.encode('latin-1') + b'\0' + bytes(d)
+                    for p, d in files.items())
+
+
+def iter_stream(raw):
+    """
+    Yield (path, body, crc32) for each entry of a SerPack stream. The CRC
+    is the guest's; compare it with zlib.crc32(body). Raises ValueError if
+    the stream is truncated.
+    """
+    raw = bytes(raw)
+    off = 0
+    while off < len(raw):
+        if off + STREAM_HDR.size > len(raw):
+            raise ValueError('truncated entry header')
+        size, crc = STREAM_HDR.unpack_from(raw, off)
+        end = raw.find(b'\0', off + STREAM_HDR.size)
+        if end < 0:
+            raise ValueError('unterminated path')
+        path = raw[off + STREAM_HDR.size:end].decode('latin-1')
+        if end + 1 + size > len(raw):
+            raise ValueError(f'truncated body: {path}')
+        yield path, raw[end + 1:end + 1 + size], crc
+        off = end + 1 + size
@@ -0,0 +1,224 @@
+"""
+async_temple.py — asyncio client for the TempleOS serial REPL (CAFEBABE protocol)
+
+Same primitives as temple.Temple, built on asyncio.open_unix_connection so the
+serial REPL, the QEMU monitor and the AgentLoop HTTP server can all be driven
+from one event loop. Timeouts are real deadlines (asyncio.wait_for), not poll
+ticks. Requires a REPL that is already frozen (Temple.freeze() or a snapshot).
+
+Usage:
+    import asyncio
+    from async_temple import AsyncTemple
+
+    async def main():
+        async with AsyncTemple() as t:
+            files = await t.list_dir("C:/Home/*")
+            data = await t.read_file("C:/Home/SerProto.HC")
+            n = await t.exec_i64("1+2")
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import time
+
+from temple import (SOCK, QMON, TERM, BANNED_FILES, FrameReader, TempleException,
+                    _parse_dir, _parse_i64, _parse_str, _parse_rows, _parse_ints)
+
+QMON_PROMPT = b'(qemu) '
+
+
+class AsyncTemple:
+    def __init__(self, sock_path=SOCK, timeout=20):
+        self.sock_path = sock_path
+        self.default_timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._rx = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.sock_path)
+        self._rx = FrameReader()
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._reader = self._writer = self._rx = None
+
+    # -------------------------------------------------------------------------
+    # Low-level protocol
+    # -------------------------------------------------------------------------
+
+    async def _recv_frame(self, term):
+        while True:
+            frame = self._rx.pop_frame(term)
+            if frame is not None:
+                return frame
+            data = await self._reader.read(FrameReader.RECV_SIZE)
+            if not data:
+                return None
+            self._rx.feed(data)
+
+    async def _recv_until_term(self, timeout=None, term=TERM):
+        """Read the next CAFEBABE frame. Returns its payload, or None on timeout/EOF."""
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            return await asyncio.wait_for(self._recv_frame(term), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _drain(self, timeout=3):
+        """Consume trailing OK+TERM from SerReplExe."""
+        await self._recv_until_term(timeout=timeout)
+
+    async def _send(self, data):
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def send_cmd(self, cmd, timeout=None):
+        """Send a command to SerReplExe, return the response payload."""
+        async with self._lock:
+            await self._send((cmd + '\n').encode())
+            content = await self._recv_until_term(timeout=timeout)
+            await self._drain()
+            return content
+
+    async def is_frozen(self, timeout=3):
+        """Return True if SerReplExe answers a no-op command."""
+        async with self._lock:
+            try:
+                await self._send(b';\n')
+                if await self._recv_until_term(timeout=timeout) is None:
+                    return False
+                await self._drain(timeout=2)
+                return True
+            except OSError:
+                return False
+
+    # -------------------------------------------------------------------------
+    # Primitives
+    # -------------------------------------------------------------------------
+
+    async def list_dir(self, pattern):
+        """List directory entries matching pattern (must include *)."""
+        return _parse_dir(await self.send_cmd(f'SerDir("{pattern}");'))
+
+    async def read_file(self, path, timeout=30):
+        """Read file contents from TempleOS. Returns bytes, or None on timeout."""
+        if path in BANNED_FILES:
+            raise ValueError(f"File is banned from transfer: {path}")
+        return await self.send_cmd(f'SerFileRead("{path}");', timeout=timeout)
+
+    async def write_file(self, path, content: bytes):
+        """Write file to TempleOS."""
+        async with self._lock:
+            await self._send(f'SerFileWrite("{path}");\n'.encode())
+            # Wait for ready signal (single \x04)
+            await self._recv_until_term(timeout=10, term=b'\x04')
+            await self._send(content + b'\x04')
+            await self._recv_until_term(timeout=10)
+            await self._drain()
+
+    async def file_exists(self, path):
+        """Check if a file exists. Returns True/False."""
+        raw = await self.send_cmd(f'SerFileExists("{path}");')
+        return raw is not None and raw.strip() == b'1'
+
+    async def mkdir(self, path):
+        """Create a directory on TempleOS."""
+        await self.send_cmd(f'SerMkDir("{path}");')
+
+    async def exec(self, code: str):
+        """Execute arbitrary HolyC code. Returns OK response."""
+        return await self.send_cmd(code)
+
+    async def exec_i64(self, expr: str):
+        """Execute a HolyC expression, return I64 result as int.
+        One round trip: g_r=expr; and SerGetI64(g_r); share a command line.
+        Raises TempleException if TempleOS throws during execution.
+        """
+        return _parse_i64(await self.send_cmd(f'g_r={expr};SerGetI64(g_r);'))
+
+    async def exec_str(self, code: str):
+        """Execute HolyC code that populates g_str, return the string.
+        Raises TempleException if TempleOS throws during execution.
+        """
+        try:
+            raw = await self.send_cmd(f'GStrReset();{code}SerSendStr();')
+        except OSError:
+            raise TempleException('crash')
+        return _parse_str(raw)
+
+    async def symbol_exists(self, name: str) -> bool:
+        """Return True if name is defined in the current TempleOS symbol table."""
+        return await self.exec_str(f'SerSymExists("{name}");') == '1'
+
+    async def exec_rows(self, code: str) -> list:
+        """Execute HolyC code via exec_str, parse result as TSV rows."""
+        return _parse_rows(await self.exec_str(code))
+
+    async def exec_kv(self, code: str) -> dict:
+        """Execute HolyC code via exec_str, parse result as key\\tvalue pairs."""
+        return {r[0]: (r[1] if len(r) > 1 else '') for r in await self.exec_rows(code) if r}
+
+    async def mem_info(self) -> dict:
+        """Return TempleOS memory stats as a dict with integer values."""
+        return _parse_ints(await self.exec_kv('SerMemInfo();'))
+
+    # -------------------------------------------------------------------------
+    # QEMU monitor
+    # -------------------------------------------------------------------------
+
+    async def save_snapshot(self, name='snap1'):
+        """Save a QEMU snapshot."""
+        await qmon(f'savevm {name}', timeout=120)
+
+    async def load_snapshot(self, name='snap1'):
+        """Load a QEMU snapshot. Reconnect afterwards to drop stale bytes."""
+        await qmon(f'loadvm {name}', timeout=120)
+        if self._rx:
+            self._rx.clear()
+
+
+async def qmon(cmd, sock_path=QMON, timeout=10):
+    """
+    Send a command to the QEMU monitor and return its output.
+    Waits for the next "(qemu) " prompt rather than sleeping a fixed time.
+    """
+    reader, writer = await asyncio.open_unix_connection(sock_path)
+    try:
+        async def until_prompt():
+            buf = bytearray()
+            while not buf.endswith(QMON_PROMPT):
+                data = await reader.read(4096)
+                if not data:
+                    break
+                buf += data
+            return bytes(buf)
+
+        deadline = time.monotonic() + timeout
+        # Banner + first prompt, then the command's output + next prompt
+        await asyncio.wait_for(until_prompt(), timeout)
+        writer.write((cmd + '\n').encode())
+        await writer.drain()
+        out = await asyncio.wait_for(until_prompt(),
+                                     max(deadline - time.monotonic(), 0))
+        # Strip the echoed command line and the trailing prompt
+        text = out[:-len(QMON_PROMPT)] if out.endswith(QMON_PROMPT) else out
+        text = text.decode(errors='replace').replace('\r', '')
+        return text.split('\n', 1)[1] if '\n' in text else ''
+    finally:
+        writer.close()
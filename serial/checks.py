@@ -0,0 +1,34 @@
+"""
+checks.py — PASS/FAIL reporting shared by the no-VM test scripts
+
+Each script calls check() once per expectation and finish() at the end:
+
+    from checks import check, finish
+    check("round trip", got, expected)     # prints "  round trip: PASS"
+    finish()                               # "All tests passed" or "N FAILED"
+
+finish() exits with status 1 if any check failed. The same scripts also run
+under pytest (python -m pytest serial/); there a failed check raises
+AssertionError, so the test function it belongs to fails.
+"""
+import sys
+
+failures = 0
+
+
+def check(label, got, expected):
+    """Print PASS/FAIL for got == expected; returns whether it passed."""
+    global failures
+    ok = got == expected
+    if not ok:
+        failures += 1
+    print(f"  {label}: {'PASS' if ok else f'FAIL (got {got!r}, expected {expected!r})'}")
+    if not ok and 'pytest' in sys.modules:
+        raise AssertionError(f'{label}: got {got!r}, expected {expected!r}')
+    return ok
+
+
+def finish():
+    """Print the summary line and exit (status 1 if anything failed)."""
+    print(f"\n{'All tests passed' if not failures else f'{failures} FAILED'}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+delta.py — rsync-style block delta sync between host and guest files
+
+The guest (SerDelta.HC) splits a file into bs-byte blocks and sends each
+block's weak rolling checksum (rsync's a/b sums, 16 bits each) and CRC32.
+The host slides a bs-byte window over its own copy and looks up every
+offset's weak sum, confirming hits with the CRC32. Only the bytes the other
+side is missing then cross the wire:
+
+    push(t, path, content)     host -> guest: 'C' block copies + 'L' literals,
+                               applied by SerPatch
+    pull(t, path, local_path)  guest -> host: the guest's blocks the host copy
+                               lacks, fetched with pipelined SerBlocks calls
+
+Both work on file content as FileRead/FileWrite see it (.Z files expanded).
+NumPy is used for the all-offsets weak sums if it is installed.
+
+Usage:
+    from delta import push, pull
+    push(t, 'C:/AI/tests/Big.HC', open('Big.HC', 'rb').read())
+    pull(t, 'C:/Home/Big.TXT', 'brain/real-temple-tree/Home/Big.TXT')
+"""
+import sys, os, struct, zlib
+sys.path.insert(0, os.path.dirname(__file__))
+from temple import TempleException, content_hash, _reply_failed
+import templez
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DELTA_BLOCK = 1024
+# Below this size a plain (compressed) transfer is cheaper than the sums
+DELTA_MIN = 16384
+
+
+def _load(t):
+    t.load_primitive('SerFileHash')      # SerHashBuf
+    t.load_primitive('SerFileWrite2')    # SerRecvChunk
+    t.load_primitive('SerDelta')
+
+
+def weak_sum(block):
+    """rsync weak checksum of one block, as SerBlockSums computes it."""
+    n = len(block)
+    a = sum(block)
+    b = sum((n - j) * x for j, x in enumerate(block))
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+
+def weak_sums(data, bs):
+    """weak_sum(data[k:k+bs]) for every offset k, via prefix sums."""
+    n = len(data) - bs + 1
+    if n <= 0:
+        return []
+    if np is not None:
+        x = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+        s = np.concatenate(([0], np.cumsum(x)))
+        u = np.concatenate(([0], np.cumsum(x * np.arange(len(x), dtype=np.int64))))
+        a = s[bs:] - s[:n]
+        b = np.arange(bs, bs + n, dtype=np.int64) * a - (u[bs:] - u[:n])
+        return ((a & 0xFFFF) | ((b & 0xFFFF) << 16)).tolist()
+    s = [0] * (len(data) + 1)
+    u = [0] * (len(data) + 1)
+    acc = accw = 0
+    for i, x in enumerate(data):
+        acc += x
+        accw += i * x
+        s[i + 1] = acc
+        u[i + 1] = accw
+    out = []
+    for k in range(n):
+        a = s[k + bs] - s[k]
+        b = (k + bs) * a - (u[k + bs] - u[k])
+        out.append((a & 0xFFFF) | ((b & 0xFFFF) << 16))
+    return out
+
+
+def local_sums(data, bs=DELTA_BLOCK):
+    """Host-side SerBlockSums: [(weak, crc32) per block] of data."""
+    return [(weak_sum(data[i:i + bs]), zlib.crc32(data[i:i + bs]))
+            for i in range(0, len(data), bs)]
+
+
+def block_sums(t, path, bs=DELTA_BLOCK):
+    """Guest file's (size, [(weak, crc32) per block]), or None if missing."""
+    _load(t)
+    raw = t.send_cmd(f'SerBlockSums("{path}",{bs});', timeout=60)
+    if _reply_failed(raw):
+        return None
+    head, _, body = raw.partition(b'\n')
+    sums = [(int(body[i:i + 8], 16), int(body[i + 8:i + 16], 16))
+            for i in range(0, len(body), 16)]
+    return int(head), sums
+
+
+def _index(sums, bs, size):
+    """weak -> [(block, crc)] for the full-size blocks."""
+    index = {}
+    for idx, (weak, crc) in enumerate(sums):
+        if (idx + 1) * bs <= size:
+            index.setdefault(weak, []).append((idx, crc))
+    return index
+
+
+def make_ops(sums, size, content, bs=DELTA_BLOCK):
+    """Encode content against the guest's block sums as SerPatch ops."""
+    index = _index(sums, bs, size)
+    weak = weak_sums(content, bs)
+    ops = bytearray()
+    lit = pos = 0
+    end = len(content) - bs
+    while pos <= end:
+        hits = index.get(weak[pos])
+        if hits:
+            crc = zlib.crc32(content[pos:pos + bs])
+            idx = next((i for i, c in hits if c == crc), None)
+            if idx is not None:
+                if lit < pos:
+                    ops += b'L' + struct.pack('<I', pos - lit) + content[lit:pos]
+                ops += b'C' + struct.pack('<I', idx)
+                pos += bs
+                lit = pos
+                continue
+        pos += 1
+    if lit < len(content):
+        ops += b'L' + struct.pack('<I', len(content) - lit) + content[lit:]
+    return bytes(ops)
+
+
+def apply_ops(old, ops, newsize, bs=DELTA_BLOCK):
+    """Host-side SerPatch: rebuild the new content from old and ops.
+    Raises ValueError where SerPatch would answer ERR:patch."""
+    new = bytearray()
+    p = 0
+    while p < len(ops):
+        if p + 5 > len(ops):
+            raise ValueError('truncated op')
+        n, = struct.unpack_from('<I', ops, p + 1)
+        if ops[p:p + 1] == b'C':
+            block = old[n * bs:(n + 1) * bs]
+            if not block:
+                raise ValueError(f'copy of missing block {n}')
+            new += block
+            p += 5
+        elif ops[p:p + 1] == b'L':
+            if p + 5 + n > len(ops):
+                raise ValueError('truncated literal')
+            new += ops[p + 5:p + 5 + n]
+            p += 5 + n
+        else:
+            raise ValueError(f'bad op {ops[p:p + 1]!r}')
+        if len(new) > newsize:
+            raise ValueError('ops overrun newsize')
+    if len(new) != newsize:
+        raise ValueError(f'ops give {len(new)} bytes, not {newsize}')
+    return bytes(new)
+
+
+def push(t, path, content, bs=DELTA_BLOCK, verify=True):
+    """
+    Update guest file `path` to `content`, sending only what changed.
+    The SerPatch ops are sent only if they are smaller than the
+    templez.compress'd file a compressed write_file would upload; otherwise
+    (or if the guest has no such file) that compressed write is done.
+    Returns the number of payload bytes sent.
+    """
+    content = bytes(content)
+    got = block_sums(t, path, bs)
+    ops = make_ops(got[1], got[0], content, bs) if got else None
+    arc = templez.compress(content)
+    if ops is not None and len(ops) < len(arc):
+        t._upload(f'SerPatch("{path}",{len(content)},{len(ops)},{bs});', ops)
+        sent = len(ops)
+    else:
+        t._write_file_compressed(path, content, arc)
+        sent = len(arc)
+    if verify and not t.is_up_to_date(path, content):
+        raise TempleException('verify')
+    return sent
+
+
+def pull(t, path, local_path, bs=DELTA_BLOCK, verify=True):
+    """
+    Update local_path to match guest file `path`, fetching only blocks that
+    do not already appear (at any offset) in the local copy. Returns the
+    number of file bytes fetched, or None if the guest file is missing.
+    """
+    got = block_sums(t, path, bs)
+    if got is None:
+        return None
+    size, sums = got
+    try:
+        with open(local_path, 'rb') as f:
+            old = f.read()
+    except FileNotFoundError:
+        old = b''
+
+    have = {}
+    index = _index(sums, bs, size)
+    if index:
+        for pos, w in enumerate(weak_sums(old, bs)):
+            hits = index.get(w)
+            if hits:
+                crc = zlib.crc32(old[pos:pos + bs])
+                for idx, c in hits:
+                    if c == crc and idx not in have:
+                        have[idx] = old[pos:pos + bs]
+    if sums and size % bs:
+        # Short last block: reuse it only from the same offset
+        idx = len(sums) - 1
+        tail = old[idx * bs:size]
+        if len(tail) == size - idx * bs and zlib.crc32(tail) == sums[idx][1]:
+            have[idx] = tail
+
+    runs = []
+    for idx in range(len(sums)):
+        if idx in have:
+            continue
+        if runs and runs[-1][0] + runs[-1][1] == idx:
+            runs[-1][1] += 1
+        else:
+            runs.append([idx, 1])
+    raws = t.send_many([f'SerBlocks("{path}",{bs},{first},{cnt});'
+                        for first, cnt in runs], timeout=60)
+    fetched = 0
+    for (first, cnt), raw in zip(runs, raws):
+        want = min(size, (first + cnt) * bs) - first * bs
+        if raw is None or len(raw) != want:
+            raise TempleException('timeout' if raw is None else 'short read')
+        for i in range(cnt):
+            have[first + i] = raw[i * bs:(i + 1) * bs]
+        fetched += want
+
+    data = b''.join(have[i] for i in range(len(sums)))
+    if verify and t.file_hash(path) != content_hash(data):
+        raise TempleException('verify')
+    part = f'{local_path}.part'
+    with open(part, 'wb') as f:
+        f.write(data)
+    os.replace(part, local_path)
+    return fetched
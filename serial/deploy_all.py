@@ -5,12 +5,16 @@ deploy_all.py — Deploy all HC files from brain/templerepo/ to C:/Home/ on Temp
 Run this after any loadvm to restore files lost by snapshot disk reversion.
 Also creates C:/AI/ workspace directories if they don't exist.
 
+Only files whose CRC32 differs from the guest manifest (C:/AI/Manifest.TXT) are
+uploaded; pass --force to upload everything.
+
 Usage:
-    sudo python3 serial/deploy_all.py
+    sudo python3 serial/deploy_all.py [--force]
 """
 import sys, os, time
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple
+from temple import Temple, TempleException
+from deploy_plan import deploy
 
 REPO_DIR = os.path.join(os.path.dirname(__file__), '..', 'brain', 'templerepo')
 
@@ -20,12 +24,26 @@ FILES = [
     'SerDir.HC',
     'SerFileRead.HC',
     'SerFileWrite.HC',
+    'SerFileWrite2.HC',
+    'SerFileWriteZ.HC',
+    'SerFileWriteRange.HC',
+    'SerFileReadRange.HC',
+    'SerFileReadZ.HC',
+    'SerFileHash.HC',
+    'SerDelta.HC',
+    'SerTree.HC',
+    'SerUnpack.HC',
+    'SerPack.HC',
     'SerFileExists.HC',
     'SerMkDir.HC',
     'SerExecI64.HC',
+    'SerExecI64Many.HC',
+    'SerMemRead.HC',
+    'SerArr.HC',
     'SerExecStr.HC',
     'SerSymExists.HC',
     'SerSymList.HC',
+    'SerSymIndex.HC',
     'SerMemInfo.HC',
     'SerReplExe.HC',
 ]
@@ -61,25 +79,7 @@ def main():
         else:
             print('REPL already running.')
 
-        # Deploy HC files
-        print(f'\nDeploying {len(FILES)} HC files to C:/Home/...')
-        ok = 0
-        for fname in FILES:
-            src = os.path.join(REPO_DIR, fname)
-            dst = f'C:/Home/{fname}'
-            if not os.path.exists(src):
-                print(f'  [SKIP] {fname} — not in templerepo')
-                continue
-            with open(src, 'rb') as f:
-                content = f.read()
-            try:
-                t.write_file(dst, content)
-                print(f'  [OK]   {fname}  ({len(content)}b)')
-                ok += 1
-            except Exception as e:
-                print(f'  [FAIL] {fname}: {e}')
-
-        # Create AI workspace dirs
+        # Create AI workspace dirs (C:/AI holds the deploy manifest)
         print(f'\nEnsuring AI workspace directories...')
         for d in AI_DIRS:
             try:
@@ -91,6 +91,32 @@ def main():
             except Exception as e:
                 print(f'  [SKIP]    {d}: {e}')
 
+        # Deploy HC files — only those changed since the last deploy
+        print(f'\nDeploying {len(FILES)} HC files to C:/Home/...')
+        files = {}
+        for fname in FILES:
+            src = os.path.join(REPO_DIR, fname)
+            if not os.path.exists(src):
+                print(f'  [SKIP] {fname} — not in templerepo')
+                continue
+            files[f'C:/Home/{fname}'] = src
+        try:
+            uploaded, same = deploy(t, files, force='--force' in sys.argv)
+            ok = uploaded + same
+        except TempleException as e:
+            # REPL started bare (no primitives) — plain upload of everything
+            print(f'  planned deploy unavailable ({e}); uploading all files')
+            ok = 0
+            for dst, src in files.items():
+                with open(src, 'rb') as f:
+                    content = f.read()
+                try:
+                    t.write_file(dst, content)
+                    print(f'  [OK]   {dst}  ({len(content)}b)')
+                    ok += 1
+                except Exception as e:
+                    print(f'  [FAIL] {dst}: {e}')
+
         print(f'\nDone. {ok}/{len(FILES)} files deployed.')
         t.unfreeze()
 
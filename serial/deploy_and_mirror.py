@@ -15,7 +15,7 @@ import time
 import socket
 
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple
+from temple import Temple, TempleException
 
 TREE_BASE = '/home/zero/temple/brain/real-temple-tree'
 REPO_BASE = '/home/zero/temple/brain/templerepo'
@@ -70,7 +70,11 @@ def mirror_dir(t, pattern, local_dir):
         # Check if it's an empty dir by seeing if list returns empty
         # Try reading as file
         print(f"  READ    {entry}", end='', flush=True)
-        content = t.read_file(entry, timeout=30)
+        try:
+            content = t.read_file(entry, timeout=30, compressed=True)
+        except TempleException as e:
+            print(f" SKIP ({e})")
+            continue
         if content is None:
             print(f" TIMEOUT - banning")
             ban_file(entry, "Timeout during read")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+deploy_offline.py — Write files into the TempleOS disk image before QEMU starts
+
+Puts deploy_all's primitives in C:/Home/, AgentLoop.HC in C:/AI/ and (with
+--tests) run_tests' test files in C:/AI/tests/ directly into the RedSea
+drive of TempleOS.qcow2, a raw image, or a new qcow2 overlay. Nothing
+crosses the serial line. C:/AI/Manifest.TXT is updated too, so deploy_plan
+(deploy_all.py, run_tests.py) sees the files as already deployed. Files
+whose CRC32 already matches the manifest are skipped.
+
+The VM must be shut down. loadvm restores the snapshot's disk and discards
+these writes, so boot cold (start_with_serial.sh) to use them.
+
+Usage:
+    python3 serial/deploy_offline.py [--tests] [--force]
+    python3 serial/deploy_offline.py --overlay /tmp/run.qcow2 --tests
+        # TempleOS.qcow2 untouched; boot QEMU with -hda /tmp/run.qcow2
+    python3 serial/deploy_offline.py --image disk.raw C:/AI/code/Foo.HC=Foo.HC
+"""
+import sys, os, argparse
+sys.path.insert(0, os.path.dirname(__file__))
+from temple import content_hash
+from redsea import RedSeaWriter, create_overlay
+from deploy_plan import MANIFEST, parse_manifest, format_manifest
+from deploy_all import FILES, AI_DIRS, REPO_DIR
+
+IMAGE = os.path.join(os.path.dirname(__file__), '..', 'TempleOS.qcow2')
+
+
+def deploy(fs, files, force=False, log=print):
+    """
+    Write `files` ({guest_path: local_path}) into an open RedSeaWriter,
+    skipping those the manifest already lists with the same CRC32, then
+    rewrite the manifest. Returns (written, skipped) counts.
+    """
+    manifest = {}
+    if not force and fs.exists(MANIFEST):
+        manifest = parse_manifest(fs.read_file(MANIFEST))
+    written = 0
+    for guest, local in files.items():
+        with open(local, 'rb') as f:
+            content = f.read()
+        crc = content_hash(content)
+        if manifest.get(guest) == crc and fs.exists(guest):
+            continue
+        fs.makedirs(guest.rsplit('/', 1)[0])
+        fs.write_file(guest, content)
+        manifest[guest] = crc
+        written += 1
+        log(f'  [OK]   {guest}  ({len(content)}b)')
+    if written:
+        fs.makedirs(MANIFEST.rsplit('/', 1)[0])
+        fs.write_file(MANIFEST, format_manifest(manifest))
+    skipped = len(files) - written
+    if skipped:
+        log(f'  [SAME] {skipped} file(s) unchanged')
+    return written, skipped
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Deploy files into the TempleOS '
+                                             'disk image with the VM stopped')
+    ap.add_argument('files', nargs='*', metavar='GUEST=LOCAL',
+                    help='extra files, e.g. C:/AI/code/Foo.HC=Foo.HC')
+    ap.add_argument('--image', default=IMAGE, help='raw or qcow2 disk image')
+    ap.add_argument('--overlay', help='create this qcow2 overlay on top of '
+                                      '--image and write there instead')
+    ap.add_argument('--tests', action='store_true',
+                    help="also deploy run_tests' files to C:/AI/tests/")
+    ap.add_argument('--force', action='store_true', help='ignore the manifest')
+    args = ap.parse_args()
+
+    files = {f'C:/Home/{f}': os.path.join(REPO_DIR, f) for f in FILES}
+    files['C:/AI/AgentLoop.HC'] = os.path.join(REPO_DIR, 'AgentLoop.HC')
+    if args.tests:
+        from run_tests import TEST_FILES
+        for f in TEST_FILES:
+            files[f'C:/AI/tests/{f}'] = os.path.join(REPO_DIR, f)
+    for spec in args.files:
+        guest, _, local = spec.partition('=')
+        files[guest] = local
+    missing = [g for g, l in files.items() if not os.path.exists(l)]
+    for g in missing:
+        print(f'  [SKIP] {g} — {files.pop(g)} not found')
+
+    target = args.image
+    if args.overlay:
+        create_overlay(args.overlay, os.path.abspath(args.image))
+        target = args.overlay
+        print(f'Created overlay {target} (backing {args.image})')
+
+    with RedSeaWriter.open(target) as fs:
+        for d in AI_DIRS:
+            fs.makedirs(d)
+        print(f'Deploying {len(files)} files into {os.path.basename(target)}...')
+        written, skipped = deploy(fs, files, force=args.force)
+        print(f'\nDone. {written} written, {skipped} unchanged, '
+              f'{fs.free_blocks() * 512 // 1024}KB free on {fs.drive}:.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+deploy_plan.py — Upload only new or changed files, using a manifest on the guest
+
+The guest keeps C:/AI/Manifest.TXT, one "path<TAB>crc32" line per file that
+was deployed this way. Uploads compare the CRC32 of each local file with the
+manifest entry and skip files that match. The manifest is rewritten once
+after a batch. Large files the guest already has an older version of are
+updated with a block delta (delta.push). loadvm reverts the manifest along
+with the files it describes, so it stays valid.
+
+Usage:
+    from deploy_plan import deploy
+    deploy(t, {'C:/AI/tests/TestMalloc.HC': 'brain/templerepo/TestMalloc.HC'})
+
+    sudo python3 serial/deploy_plan.py    # show what deploy_all would upload
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+from temple import Temple, content_hash, _reply_failed
+import delta
+
+MANIFEST = 'C:/AI/Manifest.TXT'
+
+
+def parse_manifest(raw):
+    """Manifest file content -> {guest_path: crc32}."""
+    manifest = {}
+    for line in (raw or b'').decode(errors='replace').splitlines():
+        path, _, h = line.partition('\t')
+        try:
+            manifest[path] = int(h, 16)
+        except ValueError:
+            continue
+    return manifest
+
+
+def format_manifest(manifest):
+    return ''.join(f'{p}\t{h:08X}\n' for p, h in sorted(manifest.items())).encode()
+
+
+def read_manifest(t):
+    """Guest manifest as {guest_path: crc32}. Empty if it does not exist."""
+    return parse_manifest(t.read_file(MANIFEST))
+
+
+def write_manifest(t, manifest):
+    t.write_file(MANIFEST, format_manifest(manifest), chunked=True)
+
+
+def plan(t, files, manifest=None, check=False):
+    """
+    Decide which files need uploading.
+    files:    {guest_path: local_path}
+    check:    ask the guest for the real hash of every file (pipelined
+              SerFileHash) instead of trusting the manifest.
+    Returns ([(guest_path, local_path, content, crc)...], manifest).
+    """
+    if manifest is None:
+        manifest = read_manifest(t)
+    if check:
+        t.load_primitive('SerFileHash')
+        raws = t.send_many([f'SerFileHash("{g}",0);' for g in files])
+        manifest = dict(manifest)
+        for g, raw in zip(files, raws):
+            if raw and not _reply_failed(raw):
+                manifest[g] = int(raw, 16)
+            else:
+                manifest.pop(g, None)
+    todo = []
+    for guest, local in files.items():
+        with open(local, 'rb') as f:
+            content = f.read()
+        crc = content_hash(content)
+        if manifest.get(guest) != crc:
+            todo.append((guest, local, content, crc))
+    return todo, manifest
+
+
+def deploy(t, files, force=False, check=False, log=print):
+    """
+    Upload the files in `files` ({guest_path: local_path}) that differ from
+    the manifest, then record them in the manifest.
+    New files and the manifest go up together as one compressed archive
+    (t.write_files); large files the guest has an older copy of are sent as
+    block deltas first.
+    force: upload everything. Returns (uploaded, skipped) counts.
+    """
+    manifest = {} if force else read_manifest(t)
+    todo, manifest = plan(t, files, manifest, check=check and not force)
+    bundle = {}
+    for guest, local, content, crc in todo:
+        if guest in manifest and len(content) >= delta.DELTA_MIN:
+            # Guest has an older version — send only the changed blocks
+            sent = delta.push(t, guest, content, verify=False)
+            log(f'  [OK]   {guest}  ({len(content)}b, {sent}b sent)')
+        else:
+            bundle[guest] = content
+        manifest[guest] = crc
+    if todo:
+        bundle[MANIFEST] = format_manifest(manifest)
+        t.write_files(bundle)
+        for guest, content in bundle.items():
+            if guest != MANIFEST:
+                log(f'  [OK]   {guest}  ({len(content)}b)')
+    skipped = len(files) - len(todo)
+    if skipped:
+        log(f'  [SAME] {skipped} file(s) unchanged')
+    return len(todo), skipped
+
+
+def main():
+    from deploy_all import FILES, REPO_DIR
+    files = {f'C:/Home/{f}': os.path.join(REPO_DIR, f) for f in FILES}
+    with Temple() as t:
+        todo, _ = plan(t, files)
+        for guest, _, content, _ in todo:
+            print(f'  {guest}  ({len(content)}b)')
+        print(f'{len(todo)}/{len(files)} file(s) would be uploaded.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+compress_hc.py — Kernel/Compress.HC transliterated statement by statement
+
+A reference for test_templez.py, kept apart from templez.py on purpose:
+templez is written for speed (dict lookups, cached strings), this follows
+the guest source (brain/real-temple-tree/Kernel/Compress.HC, including the
+_ARC_ENTRY_GET asm) with CArcCtrl's arrays as Python lists, pointers as
+indices and BFieldOrU32/BFieldExtU32 on a bytearray. It is slow; use it on
+fixture-sized inputs only.
+
+    python3 serial/fixtures/compress_hc.py <src> <dst.Z>    # CompressBuf
+"""
+
+import struct
+import sys
+
+ARC_BITS_MAX = 12
+CT_NONE, CT_7_BIT, CT_8_BIT = 1, 2, 3
+ARC_HDR = struct.Struct('<qqB')         # CArcCompress: sizes, compression_type
+U32_MAX = 0xFFFFFFFF
+NULL = -1
+HASH = 1 << ARC_BITS_MAX                # &c->hash[b] is entry HASH+b
+
+
+def BFieldOrU32(buf, bit, pattern):
+    pos = bit >> 3
+    v = int.from_bytes(buf[pos:pos + 5], 'little') | (pattern & U32_MAX) << (bit & 7)
+    buf[pos:pos + 5] = v.to_bytes(5, 'little')
+
+
+def BFieldExtU32(buf, bit, size):
+    pos = bit >> 3
+    return (int.from_bytes(buf[pos:pos + 5], 'little') >> (bit & 7)) & ((1 << size) - 1)
+
+
+class CArcCtrl:
+    def __init__(self, expand, compression_type=CT_8_BIT):      # ArcCtrlNew
+        n = 1 << ARC_BITS_MAX
+        # compress[0..n) then hash[0..n): a hash slot's pointer is read as
+        # the .next of a CArcEntry at &c->hash[b], so both live in `next`
+        self.next = [NULL] * (2 * n)
+        self.basecode = [0] * n
+        self.ch = [0] * n
+        self.stk = [] if expand else None
+        self.min_bits = 7 if compression_type == CT_7_BIT else 8
+        self.min_table_entry = 1 << self.min_bits
+        self.free_idx = self.min_table_entry
+        self.next_bits_in_use = self.min_bits + 1
+        self.free_limit = 1 << self.next_bits_in_use
+        self.saved_basecode = U32_MAX
+        self.cur_entry = self.next_entry = NULL
+        self.cur_bits_in_use = 0
+        self.src_pos = self.src_size = self.dst_pos = self.dst_size = 0
+        self.src_buf = self.dst_buf = None
+        self.last_ch = 0
+        self.entry_used = True
+        ArcEntryGet(self)
+        self.entry_used = True
+
+    def hash(self, b):
+        return self.next[HASH + b]
+
+
+def ArcEntryGet(c):
+    if c.entry_used:
+        i = c.free_idx
+        c.entry_used = False
+        c.cur_entry = c.next_entry
+        c.cur_bits_in_use = c.next_bits_in_use
+        if c.next_bits_in_use < ARC_BITS_MAX:
+            c.next_entry = i
+            i += 1
+            if i == c.free_limit:
+                c.next_bits_in_use += 1
+                c.free_limit = 1 << c.next_bits_in_use
+        else:
+            while True:
+                i += 1
+                if i == c.free_limit:
+                    i = c.min_table_entry
+                if c.hash(i) == NULL:
+                    break
+            tmp = i
+            c.next_entry = tmp
+            tmp1 = HASH + c.basecode[tmp]
+            while tmp1 != NULL:
+                if c.next[tmp1] == tmp:
+                    c.next[tmp1] = c.next[tmp]
+                    break
+                tmp1 = c.next[tmp1]
+        c.free_idx = i
+
+
+def ArcDetermineCompressionType(src):
+    return CT_8_BIT if any(b & 0x80 for b in src) else CT_7_BIT
+
+
+def ArcCompressBuf(c):
+    src_ptr = c.src_pos
+    src_limit = c.src_size
+    if c.saved_basecode == U32_MAX:
+        basecode = c.src_buf[src_ptr] if src_ptr < len(c.src_buf) else 0
+        src_ptr += 1
+    else:
+        basecode = c.saved_basecode
+    while src_ptr < src_limit and c.dst_pos + c.cur_bits_in_use <= c.dst_size:
+        ArcEntryGet(c)
+        while True:                                     # ac_start
+            if src_ptr >= src_limit:
+                c.saved_basecode = basecode             # ac_done
+                c.src_pos = src_ptr
+                return
+            ch = c.src_buf[src_ptr]
+            src_ptr += 1
+            tmp = c.hash(basecode)
+            while tmp != NULL:
+                if c.ch[tmp] == ch:
+                    basecode = tmp
+                    break
+                tmp = c.next[tmp]
+            else:
+                break
+        BFieldOrU32(c.dst_buf, c.dst_pos, basecode)
+        c.dst_pos += c.cur_bits_in_use
+        c.entry_used = True
+        tmp = c.cur_entry
+        c.basecode[tmp] = basecode
+        c.ch[tmp] = ch
+        tmp1 = HASH + basecode
+        c.next[tmp] = c.next[tmp1]
+        c.next[tmp1] = tmp
+        basecode = ch
+    c.saved_basecode = basecode
+    c.src_pos = src_ptr
+
+
+def ArcFinishCompression(c):
+    if c.dst_pos + c.cur_bits_in_use <= c.dst_size:
+        BFieldOrU32(c.dst_buf, c.dst_pos, c.saved_basecode)
+        c.dst_pos += c.next_bits_in_use
+        return True
+    return False
+
+
+def ArcExpandBuf(c):
+    dst = c.dst_buf
+    while len(dst) < c.dst_size and c.stk:
+        dst.append(c.stk.pop())
+    if not c.stk and len(dst) < c.dst_size:
+        if c.saved_basecode == U32_MAX:
+            lastcode = BFieldExtU32(c.src_buf, c.src_pos, c.next_bits_in_use)
+            c.src_pos += c.next_bits_in_use
+            dst.append(lastcode & 0xFF)
+            ArcEntryGet(c)
+            c.last_ch = lastcode
+        else:
+            lastcode = c.saved_basecode
+        while len(dst) < c.dst_size and c.src_pos + c.next_bits_in_use <= c.src_size:
+            basecode = BFieldExtU32(c.src_buf, c.src_pos, c.next_bits_in_use)
+            c.src_pos += c.next_bits_in_use
+            if c.cur_entry == basecode:
+                c.stk.append(c.last_ch)
+                code = lastcode
+            else:
+                code = basecode
+            while code >= c.min_table_entry:
+                c.stk.append(c.ch[code])
+                code = c.basecode[code]
+            c.stk.append(code)
+            c.last_ch = code
+            c.entry_used = True
+            tmp = c.cur_entry
+            c.basecode[tmp] = lastcode
+            c.ch[tmp] = c.last_ch
+            tmp1 = HASH + lastcode
+            c.next[tmp] = c.next[tmp1]
+            c.next[tmp1] = tmp
+            ArcEntryGet(c)
+            while len(dst) < c.dst_size and c.stk:
+                dst.append(c.stk.pop())
+            lastcode = basecode
+        c.saved_basecode = lastcode
+
+
+def ExpandBuf(arc):
+    compressed_size, expanded_size, compression_type = ARC_HDR.unpack_from(arc)
+    if not CT_NONE <= compression_type <= CT_8_BIT:
+        raise ValueError('Compress')
+    if compression_type == CT_NONE:
+        return bytes(arc[ARC_HDR.size:ARC_HDR.size + expanded_size])
+    c = CArcCtrl(True, compression_type)
+    c.src_size = compressed_size << 3
+    c.src_pos = ARC_HDR.size << 3
+    c.src_buf = bytes(arc) + bytes(8)
+    c.dst_size = expanded_size
+    c.dst_buf = bytearray()
+    ArcExpandBuf(c)
+    return bytes(c.dst_buf)
+
+
+def CompressBuf(src):
+    src = bytes(src)
+    size = len(src)
+    compression_type = ArcDetermineCompressionType(src)
+    c = CArcCtrl(False, compression_type)
+    c.src_size = size
+    c.src_buf = src
+    c.dst_size = (size + ARC_HDR.size) << 3
+    c.dst_buf = bytearray((c.dst_size >> 3) + 8)
+    c.dst_pos = ARC_HDR.size << 3
+    ArcCompressBuf(c)
+    if ArcFinishCompression(c) and c.src_pos == c.src_size:
+        size_out = (c.dst_pos + 7) >> 3
+        body = bytes(c.dst_buf[ARC_HDR.size:size_out])
+    else:
+        compression_type = CT_NONE
+        size_out = size + ARC_HDR.size
+        body = src
+    return ARC_HDR.pack(size_out, size, compression_type) + body
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'rb') as f:
+        arc = CompressBuf(f.read())
+    with open(sys.argv[2], 'wb') as f:
+        f.write(arc)
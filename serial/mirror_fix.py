@@ -12,7 +12,7 @@ import time
 import socket
 
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple
+from temple import Temple, TempleException
 
 TREE_BASE = '/home/zero/temple/brain/real-temple-tree'
 BAN_FILE  = '/home/zero/temple/brain/file-ban.md'
@@ -41,7 +41,11 @@ def mirror_entry(t, tos_path, local_path):
 
     if is_file:
         print(f"  FILE    {tos_path}", end='', flush=True)
-        content = t.read_file(tos_path, timeout=30)
+        try:
+            content = t.read_file(tos_path, timeout=30, compressed=True)
+        except TempleException as e:
+            print(f" SKIP ({e})")
+            return
         if content is None:
             print(" TIMEOUT")
             ban_file(tos_path, "Timeout during read")
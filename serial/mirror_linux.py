@@ -3,7 +3,7 @@
 mirror_linux.py
 
 Mirror C:/Linux, test SerMkDir properly, save snapshot.
-Strategy: list_dir first to detect directories, fallback to file read.
+Strategy: one SerTree walk lists every file and directory, then read each file.
 """
 
 import sys
@@ -12,7 +12,7 @@ import time
 import socket
 
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple
+from temple import Temple, TempleException
 
 TREE_BASE = '/home/zero/temple/brain/real-temple-tree'
 BAN_FILE  = '/home/zero/temple/brain/file-ban.md'
@@ -30,40 +30,23 @@ def ban_file(path, reason):
     print(f"      -> Banned: {path}")
 
 
-def mirror_entry(t, tos_path, local_path, depth=0):
-    """Mirror a single TempleOS path (file or dir) to local_path."""
-    indent = '  ' * (depth + 1)
-
+def mirror_file(t, tos_path, local_path, indent):
+    """Mirror a single TempleOS file to local_path."""
     if tos_path in BANNED:
         print(f"{indent}BANNED  {tos_path}")
         return
 
-    # First: try listing as directory
-    sub_entries = t.list_dir(tos_path + '/*')
-    if sub_entries:
-        # Has sub-entries -> it's a directory
-        print(f"{indent}DIR     {tos_path}/ ({len(sub_entries)} entries)")
-        os.makedirs(local_path, exist_ok=True)
-        for entry in sub_entries:
-            name = entry.split('/')[-1]
-            mirror_entry(t, entry, os.path.join(local_path, name), depth + 1)
-        return
-
-    # No sub-entries: could be empty dir or file
-    # Try reading as file
     print(f"{indent}READ    {tos_path}", end='', flush=True)
-    content = t.read_file(tos_path, timeout=30)
+    try:
+        content = t.read_file(tos_path, timeout=30, compressed=True)
+    except TempleException as e:
+        print(f" SKIP ({e})")
+        return
     if content is None:
         print(" TIMEOUT")
         ban_file(tos_path, "Timeout during read")
         return
 
-    if len(content) == 0:
-        print(" empty")
-        # Could be empty dir - create as directory
-        os.makedirs(local_path, exist_ok=True)
-        return
-
     # Check for binary content
     null_count = content.count(b'\x00')
     if null_count > len(content) * 0.1:
@@ -74,10 +57,6 @@ def mirror_entry(t, tos_path, local_path, depth=0):
         except Exception:
             text = content.decode('latin-1', errors='replace')
 
-    # If local_path is already a directory, write index file inside it
-    if os.path.isdir(local_path):
-        local_path = os.path.join(local_path, '_contents.txt')
-
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
     with open(local_path, 'w', errors='replace') as f:
         if isinstance(text, bytes):
@@ -101,11 +80,18 @@ def main():
         print("[2] Mirroring C:/Linux...")
         linux_dir = os.path.join(TREE_BASE, 'Linux')
         os.makedirs(linux_dir, exist_ok=True)
-        entries = t.list_dir('C:/Linux/*')
-        print(f"    Found {len(entries)} entries: {entries}")
-        for entry in entries:
-            name = entry.split('/')[-1]
-            mirror_entry(t, entry, os.path.join(linux_dir, name))
+        # SerTree tells files from dirs, so no probing per entry
+        entries = t.walk('C:/Linux') or []
+        print(f"    Found {len(entries)} entries")
+        for e in entries:
+            rel = e['path'][len('C:/Linux/'):]
+            local_path = os.path.join(linux_dir, rel)
+            indent = '  ' * (rel.count('/') + 1)
+            if e['is_dir']:
+                print(f"{indent}DIR     {e['path']}/")
+                os.makedirs(local_path, exist_ok=True)
+            else:
+                mirror_file(t, e['path'], local_path, indent)
         print()
 
         # Test SerMkDir using list_dir
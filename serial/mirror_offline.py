@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+mirror_offline.py — Rebuild brain/real-temple-tree/ straight from the disk image
+
+Reads the RedSea filesystem in TempleOS.qcow2 (or a raw image) on the host with
+the redsea package, so no serial transfer is involved. Stop the VM first, or
+pass --snapshot to read the disk as a savevm snapshot left it.
+
+Files are written as FileRead returns them (.Z expanded), the same as
+sync_mirror.py, and the sync_mirror index is updated so a later serial
+sync stays incremental. Unchanged files (same size and mtime in the index) are
+skipped. Files no longer on the image are deleted.
+
+Usage:
+    python3 serial/mirror_offline.py                       # whole C: drive
+    python3 serial/mirror_offline.py --snapshot snap1 C:/Home C:/AI
+    python3 serial/mirror_offline.py --image /tmp/disk.raw --full
+"""
+import sys, os, time, argparse
+sys.path.insert(0, os.path.dirname(__file__))
+from temple import content_hash
+from redsea import RedSea
+from sync_mirror import TREE_BASE, temple_to_local, load_index, save_index
+
+IMAGE = os.path.join(os.path.dirname(__file__), '..', 'TempleOS.qcow2')
+
+
+def mirror(fs, root, index, stats):
+    entries = fs.walk(root)
+    seen = set()
+    for e in entries:
+        path = e['path']
+        seen.add(path)
+        local_path = temple_to_local(path)
+        if e['is_dir']:
+            os.makedirs(local_path, exist_ok=True)
+            stats['dirs'] += 1
+            continue
+        old = index.get(path)
+        if (old and old['size'] == e['size'] and old['mtime'] == e['mtime']
+                and os.path.exists(local_path)):
+            stats['skipped'] += 1
+            continue
+        try:
+            data = fs.read_file(path)
+        except ValueError as err:
+            # A .Z file that does not expand — keep the stored bytes
+            print(f'  [RAW]  {path}  ({err})')
+            data = fs.read_file(path, raw=True)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, 'wb') as f:
+            f.write(data)
+        index[path] = {'size': e['size'], 'mtime': e['mtime'],
+                       'hash': content_hash(data)}
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+
+    prefix = fs.abspath(root) + '/'
+    for path in sorted(p for p in index if p.startswith(prefix) and p not in seen):
+        print(f'  [DEL]  {path}')
+        del index[path]
+        if os.path.isfile(temple_to_local(path)):
+            os.remove(temple_to_local(path))
+        stats['deleted'] += 1
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Mirror the TempleOS disk image '
+                                             'into brain/real-temple-tree/')
+    ap.add_argument('roots', nargs='*', default=['/'],
+                    help='directories to mirror (default: the whole drive)')
+    ap.add_argument('--image', default=IMAGE, help='raw or qcow2 disk image')
+    ap.add_argument('--drive', default='C', help='drive letter (default C)')
+    ap.add_argument('--snapshot', help='read this qcow2 snapshot (e.g. snap1)')
+    ap.add_argument('--full', action='store_true',
+                    help='ignore the index and rewrite every file')
+    args = ap.parse_args()
+
+    t0 = time.time()
+    stats = {'files': 0, 'dirs': 0, 'skipped': 0, 'deleted': 0, 'bytes': 0}
+    index = {} if args.full else load_index()
+    with RedSea.open(args.image, drive=args.drive,
+                     snapshot=args.snapshot) as fs:
+        try:
+            for root in args.roots:
+                print(f'=== Mirroring {root} from {os.path.basename(args.image)} ===')
+                mirror(fs, root, index, stats)
+        finally:
+            save_index(index)
+
+    print(f'Done in {time.time() - t0:.1f}s: {stats["files"]} files '
+          f'({stats["bytes"]}b), {stats["dirs"]} dirs, {stats["skipped"]} '
+          f'unchanged, {stats["deleted"]} deleted -> {os.path.normpath(TREE_BASE)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,17 @@
 #!/usr/bin/env python3
 """
 Recursively mirror the TempleOS file tree into brain/real-temple-tree/.
-- Uses SerDir to list directories
-- Uses SerFileRead to read file contents
-- Distinguishes files from dirs by trying SerDir("entry/*")
+- Uses SerTree (t.walk) to list the whole tree, files and dirs, in one call
+- Uses SerFileRead to read file contents; .Z files are written expanded
+- Fetches BANNED_FILES with verified ranged reads (sync_mirror.fetch_banned)
 """
-import socket, time, os, sys
+import os, sys
 
-SOCK = '/tmp/temple-serial.sock'
-EOT = 0x04
-OUT_ROOT = '/home/zero/temple/brain/real-temple-tree'
-
-def recv_until_eot(s, timeout=20):
-    buf = b''
-    deadline = time.time() + timeout
-    s.settimeout(1.0)
-    while time.time() < deadline:
-        try:
-            chunk = s.recv(512)
-            if chunk:
-                buf += chunk
-                if EOT in buf:
-                    eot = buf.index(EOT)
-                    return buf[:eot]
-        except socket.timeout:
-            continue
-    return None
-
-def send_cmd(s, cmd, timeout=20):
-    s.sendall((cmd + '\n').encode())
-    return recv_until_eot(s, timeout)
-
-def ser_dir(s, path):
-    """Return list of full paths in directory, excluding . and .."""
-    raw = send_cmd(s, f'SerDir("{path}/*");')
-    if raw is None:
-        return []
-    lines = raw.decode(errors='replace').strip().splitlines()
-    return [l for l in lines if l and not l.endswith('/.') and not l.endswith('/..')]
+sys.path.insert(0, os.path.dirname(__file__))
+from temple import Temple, TempleException, BANNED_FILES
+from sync_mirror import fetch_banned
 
-def ser_file_read(s, path):
-    """Return raw bytes of file, or None on failure."""
-    raw = send_cmd(s, f'SerFileRead("{path}");', timeout=30)
-    return raw
-
-def is_directory(s, path):
-    """Try listing path/* — if we get any response (even empty), it's a dir."""
-    raw = send_cmd(s, f'SerDir("{path}/*");', timeout=10)
-    if raw is None:
-        return False
-    # If it's a file, SerDir will likely return nothing or garbage
-    # If it's a dir, it returns lines (possibly just . and ..)
-    lines = raw.decode(errors='replace').strip().splitlines()
-    # A directory always has at least . and ..
-    has_dot = any(l.endswith('/.') or l == path + '/.' or l == '.' for l in lines)
-    has_dotdot = any(l.endswith('/..') or l == path + '/..' or l == '..' for l in lines)
-    return has_dot or has_dotdot
+OUT_ROOT = '/home/zero/temple/brain/real-temple-tree'
 
 def temple_path_to_local(temple_path):
     """Convert C:/Foo/Bar to OUT_ROOT/Foo/Bar"""
@@ -63,45 +19,57 @@ def temple_path_to_local(temple_path):
     rel = temple_path.replace('C:/', '').replace('C:\\', '')
     return os.path.join(OUT_ROOT, rel)
 
-def mirror(s, path, depth=0):
-    indent = '  ' * depth
-    print(f"{indent}DIR  {path}")
+def mirror(t, path):
+    print(f"DIR  {path}")
 
-    entries = ser_dir(s, path)
+    entries = t.walk(path)
     if not entries:
-        print(f"{indent}  (empty)")
+        print("  (empty)")
         return
 
-    for entry in entries:
-        name = entry.split('/')[-1]
+    for e in entries:
+        entry = e['path']
         local_path = temple_path_to_local(entry)
+        indent = '  ' * entry.count('/')
 
-        if is_directory(s, entry):
+        if e['is_dir']:
+            print(f"{indent}DIR  {entry}")
             os.makedirs(local_path, exist_ok=True)
-            mirror(s, entry, depth + 1)
+        elif entry in BANNED_FILES:
+            print(f"{indent}FILE {entry}  (banned, ranged read)")
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            try:
+                size = fetch_banned(t, entry, local_path)
+            except (TempleException, ValueError) as ex:
+                print(f"{indent}     -> FAILED ({ex})")
+                continue
+            if size is not None:
+                print(f"{indent}     -> {size} bytes stored, written")
+            else:
+                print(f"{indent}     -> FAILED (timeout, rerun to resume)")
         else:
-            print(f"{indent}  FILE {entry}")
-            content = ser_file_read(s, entry)
+            print(f"{indent}FILE {entry}")
+            content = t.read_file(entry, timeout=30)
             if content is not None:
                 os.makedirs(os.path.dirname(local_path), exist_ok=True)
                 with open(local_path, 'wb') as f:
                     f.write(content)
-                print(f"{indent}       -> {len(content)} bytes written")
+                print(f"{indent}     -> {len(content)} bytes written")
             else:
-                print(f"{indent}       -> FAILED (timeout)")
+                print(f"{indent}     -> FAILED (timeout)")
 
 def main():
-    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    s.connect(SOCK)
-
-    print("Loading SerDir and SerFileRead...")
-    send_cmd(s, '#include "C:/Home/SerDir.HC";')
-    send_cmd(s, '#include "C:/Home/SerFileRead.HC";')
-    print("Ready. Starting mirror...\n")
+    with Temple() as t:
+        print("Loading primitives...")
+        t.send_cmd('#include "C:/Home/SerFileRead.HC";')
+        # load_primitive() needs these to upload SerTree
+        t.send_cmd('#include "C:/Home/SerFileWrite.HC";')
+        t.send_cmd('#include "C:/Home/SerExecStr.HC";')
+        t.send_cmd('#include "C:/Home/SerSymExists.HC";')
+        print("Ready. Starting mirror...\n")
 
-    mirror(s, 'C:', depth=0)
+        mirror(t, 'C:')
 
-    s.close()
     print("\nDone.")
 
 if __name__ == '__main__':
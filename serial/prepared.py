@@ -0,0 +1,120 @@
+"""
+prepared.py — Prepared HolyC snippets: compile once, call by name
+
+A prepared snippet is a HolyC function defined on the guest the first time
+it is needed. Every later call is a short line such as _P1A2B3C4D(5,7)
+instead of the whole snippet wrapped in StrPrint, so the JIT has only that
+line to compile. The name is derived from a hash of the source, so preparing
+the same snippet twice (or from a new connection while the VM still has it)
+reuses the definition.
+
+    code    an expression ('a*b+1'), or a function body when it contains
+            'return' or ret is U0
+    params  'I64 a,I64 b', or a list: ['I64 a', 'U8 *s', 'n'] (bare name = I64)
+    ret     'I64', 'F64', 'U8 *' (returned as str) or 'U0'
+
+Arguments are marshalled as HolyC literals: int/bool as decimal, float as
+F64, str/bytes as a string literal.
+
+Usage:
+    sq = t.prepare('x*x', 'I64 x')          # Temple or Agent
+    sq(7)                                   # 49
+    sq.map([(1,), (2,), (3,)])              # [1, 4, 9] (pipelined on Temple)
+"""
+import math
+import re
+import zlib
+
+RET_TYPES = {'I64': 'I64', 'F64': 'F64', 'U8 *': 'U8 *', 'U8*': 'U8 *',
+             'str': 'U8 *', 'U0': 'U0', None: 'U0'}
+
+
+def parse_params(params):
+    """'I64 a,U8 *s' or ['I64 a', 's'] -> list of declarations."""
+    if isinstance(params, str):
+        params = params.split(',')
+    decls = []
+    for p in params or ():
+        p = p.strip()
+        if p:
+            decls.append(p if ' ' in p or '*' in p else f'I64 {p}')
+    return decls
+
+
+def function_name(code, decls, ret):
+    """_P + CRC32 of the signature and body, stable across sessions."""
+    src = f'{ret}({",".join(decls)}){code}'.encode()
+    return '_P%08X' % (zlib.crc32(src) & 0xFFFFFFFF)
+
+
+def function_source(name, code, decls, ret):
+    """HolyC definition of prepared snippet `name`."""
+    body = code.strip()
+    if ret != 'U0' and not re.search(r'\breturn\b', body):
+        # 'x*x;' is still an expression, but (x*x;) would not compile
+        expr = re.sub(r'[;\s]+$', '', body)
+        body = f'return ({expr});'
+    elif not body.endswith((';', '}')):
+        body += ';'
+    head = ret + name if ret.endswith('*') else f'{ret} {name}'
+    return f'{head}({",".join(decls)}){{{body}}}'
+
+
+def literal(value):
+    """Python value -> HolyC literal."""
+    if isinstance(value, (bool, int)):
+        return str(int(value))
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f'no HolyC literal for {value}')
+        r = repr(value).replace('e+', 'e')
+        return r if '.' in r or 'e' in r else r + '.0'
+    if isinstance(value, str):
+        value = value.encode('latin-1')
+    if isinstance(value, (bytes, bytearray)):
+        out = []
+        for b in value:
+            c = chr(b)
+            if c in '\\"':
+                out.append('\\' + c)
+            elif c == '\n':
+                out.append('\\n')
+            elif 32 <= b < 127:
+                out.append(c)
+            else:
+                out.append('\\x%02X' % b)
+        return '"' + ''.join(out) + '"'
+    raise TypeError(f'cannot marshal {type(value).__name__} to HolyC')
+
+
+class Prepared:
+    """
+    Handle to a prepared snippet. Calling it runs the function on the guest
+    through its owner (Temple or Agent) and converts the result by ret.
+    """
+
+    def __init__(self, owner, code, params=(), ret='I64'):
+        if ret not in RET_TYPES:
+            raise ValueError(f'unsupported return type {ret!r}')
+        self.owner = owner
+        self.ret = RET_TYPES[ret]
+        self.params = parse_params(params)
+        self.name = function_name(code, self.params, self.ret)
+        self.source = function_source(self.name, code, self.params, self.ret)
+
+    def __repr__(self):
+        return f'<Prepared {self.name} {self.source!r}>'
+
+    def call_expr(self, args):
+        """HolyC call expression for one set of arguments."""
+        if len(args) != len(self.params):
+            raise TypeError(f'{self.name} takes {len(self.params)} '
+                            f'argument(s), got {len(args)}')
+        return f'{self.name}({",".join(literal(a) for a in args)})'
+
+    def __call__(self, *args):
+        return self.owner._call_prepared(self, args)
+
+    def map(self, arg_tuples):
+        """Call once per argument tuple. Returns the results in order."""
+        return self.owner._map_prepared(self, [tuple(a) for a in arg_tuples])
@@ -0,0 +1,18 @@
+"""
+redsea — Offline access to the TempleOS RedSea filesystem in QEMU disk images
+
+    image.py    raw / qcow2 images through mmap (qcow2 snapshots, backing files)
+    layout.py   on-disk structures: CRedSeaBoot, CDirEntry, MBR partitions
+    reader.py   RedSea: walk, listdir, read_file
+    writer.py   RedSeaWriter: write_file, mkdir, delete (offline deployment)
+
+Usage:
+    from redsea import RedSea
+    with RedSea.open('TempleOS.qcow2', snapshot='snap1') as fs:
+        data = fs.read_file('C:/Home/SerDir.HC')
+"""
+
+from .image import open_image, create_overlay, RawImage, Qcow2Image
+from .layout import DirEntry
+from .reader import RedSea
+from .writer import RedSeaWriter
@@ -0,0 +1,368 @@
+"""
+image.py — Memory-mapped access to QEMU disk images (raw and qcow2)
+
+Both image types expose the same interface:
+    size                    virtual disk size in bytes
+    read(offset, n)         bytes of the virtual disk (zeros where unallocated)
+    write(offset, data)     only when opened with writable=True
+    close()
+
+Qcow2Image follows the active L1 table, or the L1 table of an internal
+snapshot (savevm) when snapshot= names one. Compressed clusters are inflated
+with zlib, and unallocated clusters fall through to the backing file.
+Encrypted images, external data files and extended L2 entries are rejected.
+
+Writes go to the active state only. They follow qcow2's copy-on-write rules:
+a cluster is written in place only if its L2 entry has the COPIED flag
+(refcount 1). Otherwise, whether it is unallocated, compressed, zero, in the
+backing file or shared with a snapshot, it is copied to a new cluster at the
+end of the file, and the L2 table is copied first if it is shared too.
+Refcounts are kept exact, so `qemu-img check` stays clean. Never write to
+an image that a running QEMU has open.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+
+QCOW2_MAGIC = b'QFI\xfb'
+QCOW2_HEADER = struct.Struct('>4sIQIIQIIQQIIQ')     # through snapshots_offset
+QCOW2_SNAPSHOT = struct.Struct('>QIHHIIQII')
+QCOW_OFLAG_COPIED = 1 << 63
+QCOW_OFLAG_COMPRESSED = 1 << 62
+QCOW_OFLAG_ZERO = 1
+L1E_OFFSET_MASK = 0x00FFFFFFFFFFFE00
+L2E_OFFSET_MASK = 0x00FFFFFFFFFFFE00
+# Incompatible feature bits this reader cannot honour
+QCOW2_INCOMPAT_DATA_FILE = 1 << 2
+QCOW2_INCOMPAT_COMPRESSION = 1 << 3
+QCOW2_INCOMPAT_EXTL2 = 1 << 4
+QCOW2_INCOMPAT_DIRTY = 1 << 0
+QCOW2_INCOMPAT_CORRUPT = 1 << 1
+QCOW2_EXT_BACKING_FORMAT = 0xE2792ACA
+REFT_OFFSET_MASK = 0xFFFFFFFFFFFFFE00
+REFCOUNT_FMT = {3: '>B', 4: '>H', 5: '>I', 6: '>Q'}
+
+
+def open_image(path, writable=False, snapshot=None):
+    """RawImage or Qcow2Image, depending on the file's magic."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == QCOW2_MAGIC:
+        return Qcow2Image(path, writable=writable, snapshot=snapshot)
+    if snapshot is not None:
+        raise ValueError(f'{path}: raw images have no snapshots')
+    return RawImage(path, writable=writable)
+
+
+class RawImage:
+    def __init__(self, path, writable=False):
+        self.path = path
+        self._f = open(path, 'r+b' if writable else 'rb')
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._map = mmap.mmap(self._f.fileno(), 0,
+                              access=mmap.ACCESS_WRITE if writable
+                              else mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def read(self, offset, n):
+        if offset < 0 or offset + n > self.size:
+            raise ValueError(f'read past end of image: {offset}+{n}')
+        return self._map[offset:offset + n]
+
+    def write(self, offset, data):
+        if offset < 0 or offset + len(data) > self.size:
+            raise ValueError(f'write past end of image: {offset}+{len(data)}')
+        self._map[offset:offset + len(data)] = data
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._f.close()
+            self._map = None
+
+
+class Qcow2Image:
+    def __init__(self, path, writable=False, snapshot=None):
+        self.path = path
+        self.writable = writable
+        self._f = open(path, 'r+b' if writable else 'rb')
+        self._map = mmap.mmap(self._f.fileno(), 0,
+                              access=mmap.ACCESS_WRITE if writable
+                              else mmap.ACCESS_READ)
+        try:
+            self._parse_header(snapshot)
+            if writable:
+                self._check_writable(snapshot)
+        except Exception:
+            self.close()
+            raise
+        self._zcache = (None, None)
+        # First free host offset; new clusters are appended here
+        self._end = (len(self._map) + self.cluster_size - 1) & ~(self.cluster_size - 1)
+        self._dirty = False
+
+    def _parse_header(self, snapshot):
+        (magic, self.version, backing_off, backing_len, self.cluster_bits,
+         self.size, crypt, self.l1_size, self.l1_offset,
+         self.refcount_table_offset, self.refcount_table_clusters,
+         nb_snapshots, snapshots_offset) = QCOW2_HEADER.unpack_from(self._map)
+        if magic != QCOW2_MAGIC or self.version not in (2, 3):
+            raise ValueError(f'{self.path}: not a qcow2 v2/v3 image')
+        if crypt:
+            raise ValueError(f'{self.path}: encrypted qcow2 is not supported')
+        self.refcount_order = 4
+        self.incompat = 0
+        if self.version == 3:
+            self.incompat = incompat = struct.unpack_from('>Q', self._map, 72)[0]
+            self.refcount_order, = struct.unpack_from('>I', self._map, 96)
+            if incompat & (QCOW2_INCOMPAT_DATA_FILE | QCOW2_INCOMPAT_EXTL2 |
+                           QCOW2_INCOMPAT_COMPRESSION):
+                raise ValueError(f'{self.path}: unsupported qcow2 features '
+                                 f'(incompatible bits {incompat:#x})')
+        self.cluster_size = 1 << self.cluster_bits
+        self.l2_entries = self.cluster_size // 8
+
+        self.snapshots = self._read_snapshots(nb_snapshots, snapshots_offset)
+        if snapshot is not None:
+            for snap in self.snapshots:
+                if snapshot in (snap['name'], snap['id']):
+                    self.l1_offset, self.l1_size = snap['l1_offset'], snap['l1_size']
+                    break
+            else:
+                raise ValueError(f'{self.path}: no snapshot {snapshot!r}')
+
+        self.backing = None
+        if backing_off:
+            name = self._map[backing_off:backing_off + backing_len].decode()
+            if not os.path.isabs(name):
+                name = os.path.join(os.path.dirname(self.path), name)
+            self.backing = open_image(name)
+
+    def _read_snapshots(self, count, offset):
+        snaps = []
+        for _ in range(count):
+            (l1_offset, l1_size, id_len, name_len, _, _, _, _,
+             extra_len) = QCOW2_SNAPSHOT.unpack_from(self._map, offset)
+            p = offset + QCOW2_SNAPSHOT.size + extra_len
+            snap_id = self._map[p:p + id_len].decode()
+            p += id_len
+            name = self._map[p:p + name_len].decode()
+            p += name_len
+            snaps.append({'id': snap_id, 'name': name,
+                          'l1_offset': l1_offset, 'l1_size': l1_size})
+            offset = (p + 7) & ~7
+        return snaps
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _l2_entry(self, cluster):
+        """Raw L2 entry for virtual cluster index `cluster` (0 = unallocated)."""
+        l1_idx, l2_idx = divmod(cluster, self.l2_entries)
+        if l1_idx >= self.l1_size:
+            return 0
+        l2_off, = struct.unpack_from('>Q', self._map, self.l1_offset + l1_idx * 8)
+        l2_off &= L1E_OFFSET_MASK
+        if not l2_off:
+            return 0
+        entry, = struct.unpack_from('>Q', self._map, l2_off + l2_idx * 8)
+        return entry
+
+    def _inflate(self, entry):
+        """Contents of a compressed cluster."""
+        if self._zcache[0] == entry:
+            return self._zcache[1]
+        x = 62 - (self.cluster_bits - 8)
+        off = entry & ((1 << x) - 1)
+        nsect = ((entry >> x) & ((1 << (self.cluster_bits - 8)) - 1)) + 1
+        raw = self._map[off:off + nsect * 512 - (off & 511)]
+        data = zlib.decompressobj(-12).decompress(raw, self.cluster_size)
+        data = data.ljust(self.cluster_size, b'\0')
+        self._zcache = (entry, data)
+        return data
+
+    def read(self, offset, n):
+        if offset < 0 or offset + n > self.size:
+            raise ValueError(f'read past end of image: {offset}+{n}')
+        out = []
+        while n > 0:
+            cluster, within = divmod(offset, self.cluster_size)
+            k = min(n, self.cluster_size - within)
+            entry = self._l2_entry(cluster)
+            if entry & QCOW_OFLAG_COMPRESSED:
+                out.append(self._inflate(entry)[within:within + k])
+            elif entry & QCOW_OFLAG_ZERO:
+                out.append(bytes(k))
+            elif entry & L2E_OFFSET_MASK:
+                host = (entry & L2E_OFFSET_MASK) + within
+                out.append(self._map[host:host + k])
+            elif self.backing is not None and offset < self.backing.size:
+                b = min(k, self.backing.size - offset)
+                out.append(self.backing.read(offset, b) + bytes(k - b))
+            else:
+                out.append(bytes(k))
+            offset += k
+            n -= k
+        return b''.join(out)
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+
+    def _check_writable(self, snapshot):
+        if snapshot is not None:
+            raise ValueError(f'{self.path}: snapshots are read-only')
+        if self.incompat & (QCOW2_INCOMPAT_DIRTY | QCOW2_INCOMPAT_CORRUPT):
+            raise ValueError(f'{self.path}: image is dirty or corrupt; '
+                             'run qemu-img check -r all first')
+        if self.refcount_order not in REFCOUNT_FMT or not self.refcount_table_offset:
+            raise ValueError(f'{self.path}: unsupported refcount layout')
+        self._rc = struct.Struct(REFCOUNT_FMT[self.refcount_order])
+
+    def write(self, offset, data):
+        if not self.writable:
+            raise ValueError(f'{self.path}: opened read-only')
+        if offset < 0 or offset + len(data) > self.size:
+            raise ValueError(f'write past end of image: {offset}+{len(data)}')
+        if not self._dirty:
+            # Autoclear feature bits must be cleared by writers that do
+            # not maintain them (e.g. persistent dirty bitmaps)
+            if self.version == 3:
+                struct.pack_into('>Q', self._map, 88, 0)
+            self._dirty = True
+        data = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            cluster, within = divmod(offset + pos, self.cluster_size)
+            k = min(len(data) - pos, self.cluster_size - within)
+            host = self._cluster_for_write(cluster)
+            self._map[host + within:host + within + k] = data[pos:pos + k]
+            pos += k
+        self._zcache = (None, None)
+
+    def _cluster_for_write(self, cluster):
+        """Host offset of virtual cluster `cluster`, made private to the
+        active L1 (copy-on-write)."""
+        l1_idx, l2_idx = divmod(cluster, self.l2_entries)
+        l1_pos = self.l1_offset + l1_idx * 8
+        l1e, = struct.unpack_from('>Q', self._map, l1_pos)
+        l2_off = l1e & L1E_OFFSET_MASK
+        if not (l1e & QCOW_OFLAG_COPIED and l2_off):
+            new = self._alloc_cluster()
+            if l2_off:
+                self._map[new:new + self.cluster_size] = \
+                    self._map[l2_off:l2_off + self.cluster_size]
+                self._add_refcount(l2_off, -1)
+            l2_off = new
+            struct.pack_into('>Q', self._map, l1_pos, l2_off | QCOW_OFLAG_COPIED)
+
+        l2_pos = l2_off + l2_idx * 8
+        entry, = struct.unpack_from('>Q', self._map, l2_pos)
+        if (entry & QCOW_OFLAG_COPIED and entry & L2E_OFFSET_MASK
+                and not entry & QCOW_OFLAG_COMPRESSED):
+            return entry & L2E_OFFSET_MASK
+        old = self.read(cluster * self.cluster_size,
+                        min(self.cluster_size, self.size - cluster * self.cluster_size))
+        new = self._alloc_cluster()
+        self._map[new:new + len(old)] = old
+        if entry & QCOW_OFLAG_COMPRESSED:
+            x = 62 - (self.cluster_bits - 8)
+            off = entry & ((1 << x) - 1)
+            nsect = ((entry >> x) & ((1 << (self.cluster_bits - 8)) - 1)) + 1
+            end = off + nsect * 512 - (off & 511)
+            for c in range(off & ~(self.cluster_size - 1), end, self.cluster_size):
+                self._add_refcount(c, -1)
+        elif entry & L2E_OFFSET_MASK:
+            self._add_refcount(entry & L2E_OFFSET_MASK, -1)
+        struct.pack_into('>Q', self._map, l2_pos, new | QCOW_OFLAG_COPIED)
+        return new
+
+    def _grow(self, end):
+        if end > len(self._map):
+            self._map.resize(max(end, len(self._map) + 64 * self.cluster_size))
+
+    def _alloc_cluster(self):
+        """Append a zeroed cluster with refcount 1; returns its host offset."""
+        off = self._end
+        self._end += self.cluster_size
+        self._grow(self._end)
+        self._map[off:self._end] = bytes(self.cluster_size)
+        self._add_refcount(off, 1)
+        return off
+
+    def _add_refcount(self, host, delta):
+        per_block = self.cluster_size * 8 >> self.refcount_order
+        rt_idx, rb_idx = divmod(host // self.cluster_size, per_block)
+        if rt_idx >= self.refcount_table_clusters * self.cluster_size // 8:
+            raise ValueError(f'{self.path}: refcount table full; '
+                             'grow the image with qemu-img first')
+        rt_pos = self.refcount_table_offset + rt_idx * 8
+        block = struct.unpack_from('>Q', self._map, rt_pos)[0] & REFT_OFFSET_MASK
+        if not block:
+            # New refcount block at the end of the file. It lands in the
+            # range it covers, so it can count itself.
+            block = self._end
+            self._end += self.cluster_size
+            self._grow(self._end)
+            self._map[block:self._end] = bytes(self.cluster_size)
+            struct.pack_into('>Q', self._map, rt_pos, block)
+            self._add_refcount(block, 1)
+        pos = block + rb_idx * self._rc.size
+        count = self._rc.unpack_from(self._map, pos)[0] + delta
+        if count < 0:
+            raise ValueError(f'{self.path}: refcount underflow at {host:#x}')
+        self._rc.pack_into(self._map, pos, count)
+
+    def close(self):
+        if self._map is not None:
+            if getattr(self, 'backing', None) is not None:
+                self.backing.close()
+            if self.writable and len(self._map) > self._end:
+                self._map.resize(self._end)     # drop unused growth
+            self._map.close()
+            self._f.close()
+            self._map = None
+
+
+def create_overlay(path, backing, cluster_bits=16):
+    """
+    Create an empty qcow2 v3 image at `path` whose reads fall through to
+    `backing` (raw or qcow2), like `qemu-img create -f qcow2 -b backing -F fmt`.
+    The backing file name is stored as given.
+    """
+    with open_image(backing) as img:
+        size = img.size
+        fmt = 'qcow2' if isinstance(img, Qcow2Image) else 'raw'
+    cs = 1 << cluster_bits
+    l1_size = -(-size // (cs * (cs // 8)))
+    l1_clusters = max(1, -(-l1_size * 8 // cs))
+    # cluster 0 header, 1 refcount table, 2 refcount block, 3.. L1 table
+    nclusters = 3 + l1_clusters
+    ext = fmt.encode()
+    ext = struct.pack('>II', QCOW2_EXT_BACKING_FORMAT, len(ext)) + ext
+    ext += bytes(-len(ext) % 8) + struct.pack('>II', 0, 0)
+    name = backing.encode()
+    backing_off = 104 + len(ext)
+    if backing_off + len(name) > cs:
+        raise ValueError('backing file name too long')
+    out = bytearray(nclusters * cs)
+    struct.pack_into('>4sIQIIQIIQQIIQQQQII', out, 0, QCOW2_MAGIC, 3,
+                     backing_off, len(name), cluster_bits, size, 0, l1_size,
+                     3 * cs, cs, 1, 0, 0, 0, 0, 0, 4, 104)
+    out[104:104 + len(ext)] = ext
+    out[backing_off:backing_off + len(name)] = name
+    struct.pack_into('>Q', out, cs, 2 * cs)
+    for i in range(nclusters):
+        struct.pack_into('>H', out, 2 * cs + i * 2, 1)
+    with open(path, 'wb') as f:
+        f.write(out)
@@ -0,0 +1,161 @@
+"""
+layout.py — RedSea on-disk structures (Kernel/KernelA.HH, FileSysRedSea.HC)
+
+A RedSea partition is:
+    block drv_offset        CRedSeaBoot (signature 0x88, sects, root_clus,
+                            bitmap_sects)
+    drv_offset+1 ...        allocation bitmap, one bit per block from
+                            data_area = drv_offset+bitmap_sects (LSB first)
+    data_area ...           clusters; one cluster is one 512-byte block and
+                            a cluster number is the absolute LBA on the disk
+
+Every file and directory is contiguous. A directory is a file of 64-byte
+CDirEntry records ending at the first empty name. Record 0 describes the
+directory itself (its size is the directory's size in bytes), record 1 is
+'..' (clus = parent directory).
+"""
+
+import struct
+from collections import namedtuple
+
+BLK_SIZE = 512
+CDIR_SIZE = 64
+CDIR_FILENAME_LEN = 38          # including the terminating zero
+
+RS_ATTR_READ_ONLY = 0x01
+RS_ATTR_HIDDEN = 0x02
+RS_ATTR_SYSTEM = 0x04
+RS_ATTR_DIR = 0x10
+RS_ATTR_ARCHIVE = 0x20
+RS_ATTR_DELETED = 0x100
+RS_ATTR_RESIDENT = 0x200
+RS_ATTR_COMPRESSED = 0x400
+RS_ATTR_CONTIGUOUS = 0x800
+
+MBR_PT_REDSEA = 0x88
+MBR_PT_FAT32 = {0x0B, 0x0C, 0x1B, 0x1C, 0x8B, 0x8C}
+MBR_PT_NTFS = 0x07
+MBR_PT_EXTENDED = {0x05, 0x0F}
+INVALID_CLUS = -1
+
+MBR_PRT = struct.Struct('<BBHBBHII')    # CMBRPrt
+MBR_PRT_OFFSET = 446                    # CMasterBoot.p
+BOOT = struct.Struct('<3sB4sqqqqq')     # CRedSeaBoot up to code[]
+DIR_ENTRY = struct.Struct('<H38sqqq')   # CDirEntry from .start
+
+
+class DirEntry(namedtuple('DirEntry', 'attr name clus size datetime')):
+    """One on-disk CDirEntry record. name is a str."""
+    __slots__ = ()
+
+    @classmethod
+    def unpack_from(cls, buf, offset=0):
+        attr, name, clus, size, dt = DIR_ENTRY.unpack_from(buf, offset)
+        name = name.split(b'\0', 1)[0].decode('latin-1')
+        return cls(attr, name, clus, size, dt)
+
+    def pack(self):
+        name = self.name.encode('latin-1')
+        if len(name) >= CDIR_FILENAME_LEN:
+            raise ValueError(f'name too long for RedSea: {self.name!r}')
+        return DIR_ENTRY.pack(self.attr, name, self.clus, self.size,
+                              self.datetime)
+
+    @property
+    def is_dir(self):
+        return bool(self.attr & RS_ATTR_DIR)
+
+    @property
+    def deleted(self):
+        return bool(self.attr & RS_ATTR_DELETED)
+
+    @property
+    def blocks(self):
+        return (self.size + BLK_SIZE - 1) // BLK_SIZE
+
+
+Boot = namedtuple('Boot', 'signature drv_offset sects root_clus bitmap_sects '
+                          'unique_id')
+
+
+def unpack_boot(blk):
+    """CRedSeaBoot from a partition's first block; ValueError if not RedSea."""
+    _, sig, _, drv_offset, sects, root_clus, bitmap_sects, uid = \
+        BOOT.unpack_from(blk)
+    if sig != MBR_PT_REDSEA or blk[510:512] != b'\x55\xAA':
+        raise ValueError('not a RedSea boot record')
+    return Boot(sig, drv_offset, sects, root_clus, bitmap_sects, uid)
+
+
+def pack_boot(boot):
+    blk = bytearray(BLK_SIZE)
+    BOOT.pack_into(blk, 0, b'\xEB\x58\x90', MBR_PT_REDSEA, b'\0' * 4,
+                   boot.drv_offset, boot.sects, boot.root_clus,
+                   boot.bitmap_sects, boot.unique_id)
+    blk[510:512] = b'\x55\xAA'
+    return bytes(blk)
+
+
+def bitmap_sects(sects):
+    """RedSeaFmt's bitmap size: one bit per block, rounded up to blocks."""
+    return (sects + (BLK_SIZE << 3) - 1) // (BLK_SIZE << 3)
+
+
+def is_dot_z(name):
+    """IsDotZ(): FileRead expands files named like X.Y.Z."""
+    return name.count('.') > 1 and name.endswith('.Z')
+
+
+def unpack_dir(buf):
+    """All records of a directory buffer, up to the first empty name."""
+    entries = []
+    for off in range(0, len(buf) - CDIR_SIZE + 1, CDIR_SIZE):
+        if not buf[off + 2]:
+            break
+        entries.append(DirEntry.unpack_from(buf, off))
+    return entries
+
+
+Partition = namedtuple('Partition', 'letter type lba sects')
+
+
+def partitions(read_blk, first_letter='C'):
+    """
+    MBR partitions in the order the kernel assigns drive letters
+    (DskAddDev.HC: primary entries, then the extended chain). Only RedSea,
+    FAT32 and NTFS entries take a letter; other types are listed with
+    letter None.
+    read_blk(lba) returns one 512-byte block.
+    """
+    parts = []
+    letter = ord(first_letter)
+    offset = 0
+    ext_base = None
+    seen = set()
+    while offset not in seen:
+        seen.add(offset)
+        mbr = read_blk(offset)
+        if mbr[510:512] != b'\x55\xAA':
+            break
+        ext = None
+        for i in range(4):
+            _, _, _, ptype, _, _, lba, size = MBR_PRT.unpack_from(
+                mbr, MBR_PRT_OFFSET + i * MBR_PRT.size)
+            if not ptype:
+                continue
+            if ptype in MBR_PT_EXTENDED:
+                ext = lba
+                continue
+            if ptype == MBR_PT_REDSEA or ptype in MBR_PT_FAT32 or \
+                    ptype == MBR_PT_NTFS:
+                parts.append(Partition(chr(letter), ptype, lba + offset, size))
+                letter += 1
+            else:
+                parts.append(Partition(None, ptype, lba + offset, size))
+        if not ext:
+            break
+        if ext_base is None:
+            ext_base = offset = ext
+        else:
+            offset = ext + ext_base
+    return parts
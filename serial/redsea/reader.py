@@ -0,0 +1,191 @@
+"""
+reader.py — Read-only RedSea filesystem access on a disk image
+
+Usage:
+    from redsea import RedSea
+    with RedSea.open('TempleOS.qcow2') as fs:              # drive C:
+        for e in fs.walk('C:/Home'):
+            print(e['path'], e['size'])
+        src = fs.read_file('C:/Home/SerDir.HC')
+        reg = fs.read_file('C:/Home/Registry.HC.Z')        # expanded, as FileRead
+
+walk() returns the same dicts as Temple.walk(), so code written against the
+live VM can run on an image. The VM should be stopped (or the image be a
+snapshot) while it is read, or the filesystem may be mid-update.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import templez
+from temple import cdate_to_unix
+
+from .image import open_image
+from .layout import (BLK_SIZE, MBR_PT_REDSEA, MBR_PT_FAT32,
+                     RS_ATTR_COMPRESSED, DirEntry, is_dot_z, partitions,
+                     unpack_boot, unpack_dir)
+
+
+class RedSea:
+    def __init__(self, image, drive='C'):
+        """
+        image: an open RawImage/Qcow2Image. drive: the letter TempleOS gives
+        the partition (C for the first one); an image holding a bare RedSea
+        filesystem without an MBR is accepted for any letter.
+        """
+        self.image = image
+        self.drive = drive.upper()
+        self._own_image = False
+        self.lba = self._find_partition()
+        self.boot = unpack_boot(self.read_blocks(self.lba, 1))
+        self.data_area = self.lba + self.boot.bitmap_sects
+
+    @classmethod
+    def open(cls, path, drive='C', snapshot=None, writable=False):
+        """Open a raw or qcow2 image file and its RedSea drive."""
+        image = open_image(path, writable=writable, snapshot=snapshot)
+        try:
+            fs = cls(image, drive)
+        except Exception:
+            image.close()
+            raise
+        fs._own_image = True
+        return fs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._own_image:
+            self.image.close()
+
+    def _find_partition(self):
+        blk0 = self.read_blocks(0, 1)
+        try:
+            unpack_boot(blk0)
+            return 0
+        except ValueError:
+            pass
+        for p in partitions(lambda lba: self.read_blocks(lba, 1)):
+            if p.letter != self.drive:
+                continue
+            # DskAddDev.HC: a FAT32-typed entry is RedSea only if its boot
+            # record says so, and a real FAT32 drive must not be parsed
+            if p.type == MBR_PT_REDSEA or p.type in MBR_PT_FAT32:
+                try:
+                    unpack_boot(self.read_blocks(p.lba, 1))
+                    return p.lba
+                except ValueError:
+                    pass
+            break
+        raise ValueError(f'{self.image.path}: no RedSea drive {self.drive}:')
+
+    def read_blocks(self, lba, cnt):
+        return self.image.read(lba * BLK_SIZE, cnt * BLK_SIZE)
+
+    # -------------------------------------------------------------------------
+    # Directories
+    # -------------------------------------------------------------------------
+
+    def dir_records(self, clus):
+        """Every record of the directory at `clus`, deleted ones included."""
+        size = DirEntry.unpack_from(self.read_blocks(clus, 1)).size
+        nblk = max(1, (size + BLK_SIZE - 1) // BLK_SIZE)
+        return unpack_dir(self.read_blocks(clus, nblk))
+
+    def _children(self, clus):
+        return sorted((de for de in self.dir_records(clus)[1:]
+                       if not de.deleted and de.name not in ('.', '..')),
+                      key=lambda de: de.name)
+
+    def _parts(self, path):
+        if len(path) >= 2 and path[1] == ':':
+            if path[0].upper() != self.drive:
+                raise FileNotFoundError(f'{path}: not on drive {self.drive}:')
+            path = path[2:]
+        return [p for p in path.replace('\\', '/').split('/') if p]
+
+    def abspath(self, path):
+        """path in the 'C:/Dir/Name' form walk() reports."""
+        return f'{self.drive}:' + ''.join('/' + p for p in self._parts(path))
+
+    def root(self):
+        """Record 0 of the root directory (the root's own entry)."""
+        return DirEntry.unpack_from(self.read_blocks(self.boot.root_clus, 1))
+
+    def lookup(self, path):
+        """DirEntry for a path such as 'C:/Home/Foo.HC' or '/Home'."""
+        de = self.root()
+        for name in self._parts(path):
+            if not de.is_dir:
+                raise NotADirectoryError(path)
+            for child in self._children(de.clus):
+                if child.name == name:
+                    de = child
+                    break
+            else:
+                raise FileNotFoundError(path)
+        return de
+
+    def exists(self, path):
+        try:
+            self.lookup(path)
+            return True
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+    def listdir(self, path='/'):
+        """DirEntry records of a directory, sorted by name."""
+        de = self.lookup(path)
+        if not de.is_dir:
+            raise NotADirectoryError(path)
+        return self._children(de.clus)
+
+    def walk(self, path='/'):
+        """
+        Recursive listing in Temple.walk() form: dicts with path, is_dir,
+        size, attr and mtime, each directory before its contents.
+        """
+        top = self.lookup(path)
+        if not top.is_dir:
+            raise NotADirectoryError(path)
+        entries = []
+        self._walk(self.abspath(path), top.clus, entries, {top.clus})
+        return entries
+
+    def _walk(self, base, clus, entries, seen):
+        for de in self._children(clus):
+            full = f'{base}/{de.name}'
+            entries.append({'path': full, 'is_dir': de.is_dir, 'size': de.size,
+                            'attr': de.attr, 'mtime': cdate_to_unix(de.datetime)})
+            # seen guards against a corrupt tree that loops back on itself
+            if de.is_dir and de.clus not in seen:
+                seen.add(de.clus)
+                self._walk(full, de.clus, entries, seen)
+
+    # -------------------------------------------------------------------------
+    # Files
+    # -------------------------------------------------------------------------
+
+    def read_entry(self, de, raw=False):
+        """Contents of the file a DirEntry describes (see read_file)."""
+        data = self.image.read(de.clus * BLK_SIZE, de.size) if de.size else b''
+        if raw or not data:
+            return data
+        if de.attr & RS_ATTR_COMPRESSED or is_dot_z(de.name):
+            return templez.expand(data)
+        return data
+
+    def read_file(self, path, raw=False):
+        """
+        File contents as FileRead returns them: .Z files are expanded.
+        raw=True returns the stored bytes instead.
+        """
+        de = self.lookup(path)
+        if de.is_dir:
+            raise IsADirectoryError(path)
+        return self.read_entry(de, raw)
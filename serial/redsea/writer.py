@@ -0,0 +1,244 @@
+"""
+writer.py — Write files and directories into a RedSea drive on a disk image
+
+Follows what the kernel does (FileSysRedSea.HC), so TempleOS sees the result
+as if it had written it itself:
+    write_file  RedSeaFileWrite: the old copy is freed, the data gets the
+                best-fitting contiguous run of free blocks (RedSeaAllocClus),
+                and the dir entry is replaced (RedSeaDirNew). A .Z name is
+                stored CompressBuf'd with RS_ATTR_COMPRESSED, as FileWrite does.
+    mkdir       RedSeaMkDir: self record plus '..'
+    delete      RedSeaFilesDel: entry marked deleted, blocks freed
+
+A directory with no free record left is moved to a run one block longer, and
+its parent's entry (or the boot record, for the root) is updated.
+
+Only write an image whose VM is shut down. loadvm restores the snapshot's
+disk and discards these writes, so boot the image cold (start_with_serial.sh)
+to see them.
+
+Usage:
+    from redsea import RedSeaWriter
+    with RedSeaWriter.open('TempleOS.qcow2') as fs:
+        fs.makedirs('C:/AI/tests')
+        fs.write_file('C:/AI/tests/TestMalloc.HC', src)
+"""
+
+import errno
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import templez
+from temple import unix_to_cdate
+
+from .layout import (BLK_SIZE, CDIR_FILENAME_LEN, CDIR_SIZE, INVALID_CLUS,
+                     RS_ATTR_COMPRESSED, RS_ATTR_CONTIGUOUS, RS_ATTR_DELETED,
+                     RS_ATTR_DIR, DirEntry, is_dot_z, pack_boot)
+from .reader import RedSea
+
+
+class RedSeaWriter(RedSea):
+    def __init__(self, image, drive='C'):
+        super().__init__(image, drive)
+        self._bitmap = bytearray(self.read_blocks(self.lba + 1,
+                                                  self.boot.bitmap_sects))
+        self._nblocks = self.lba + self.boot.sects - self.data_area
+
+    @classmethod
+    def open(cls, path, drive='C', snapshot=None, writable=True):
+        return super().open(path, drive, snapshot, writable)
+
+    # -------------------------------------------------------------------------
+    # Allocation bitmap
+    # -------------------------------------------------------------------------
+
+    def _free_runs(self):
+        """(first_clus, count) of every run of free blocks, in disk order."""
+        runs = []
+        start = None
+        bm = self._bitmap
+        i = 0
+        while i < self._nblocks:
+            byte = bm[i >> 3]
+            if not i & 7 and i + 8 <= self._nblocks and byte in (0, 0xFF):
+                if byte == 0xFF and start is not None:
+                    runs.append((start, i - start))
+                    start = None
+                elif byte == 0 and start is None:
+                    start = i
+                i += 8
+                continue
+            if byte >> (i & 7) & 1:
+                if start is not None:
+                    runs.append((start, i - start))
+                    start = None
+            elif start is None:
+                start = i
+            i += 1
+        if start is not None:
+            runs.append((start, self._nblocks - start))
+        return [(self.data_area + s, n) for s, n in runs]
+
+    def free_blocks(self):
+        return sum(n for _, n in self._free_runs())
+
+    def _mark(self, clus, cnt, used):
+        first = clus - self.data_area
+        for i in range(first, first + cnt):
+            if used:
+                self._bitmap[i >> 3] |= 1 << (i & 7)
+            else:
+                self._bitmap[i >> 3] &= ~(1 << (i & 7))
+        lo = first >> 12
+        hi = (first + cnt - 1) >> 12
+        self.image.write((self.lba + 1 + lo) * BLK_SIZE,
+                         self._bitmap[lo * BLK_SIZE:(hi + 1) * BLK_SIZE])
+
+    def alloc(self, cnt):
+        """RedSeaAllocClus: smallest free run that fits, first one on a tie."""
+        best = None
+        for first, n in self._free_runs():
+            if n >= cnt and (best is None or n < best[1]):
+                best = (first, n)
+                if n == cnt:
+                    break
+        if best is None:
+            raise OSError(errno.ENOSPC, f'no {cnt} contiguous free blocks')
+        self._mark(best[0], cnt, True)
+        return best[0]
+
+    def free(self, clus, cnt):
+        if clus > 0 and cnt > 0:
+            self._mark(clus, cnt, False)
+
+    # -------------------------------------------------------------------------
+    # Directories
+    # -------------------------------------------------------------------------
+
+    def _split(self, path):
+        parts = self._parts(path)
+        if not parts:
+            raise ValueError(f'{path}: no file name')
+        name = parts[-1]
+        if (len(name.encode('latin-1')) >= CDIR_FILENAME_LEN or
+                name in ('.', '..') or '*' in name or '?' in name):
+            raise ValueError(f'invalid RedSea file name: {name!r}')
+        return '/' + '/'.join(parts[:-1]), name
+
+    def _dir_put(self, dir_path, de):
+        """RedSeaDirNew: store `de` in directory dir_path, replacing a live
+        entry of the same name, else reusing a deleted record."""
+        d = self.lookup(dir_path)
+        clus = d.clus if dir_path.strip('/') else self.boot.root_clus
+        size = DirEntry.unpack_from(self.read_blocks(clus, 1)).size
+        buf = bytearray(self.read_blocks(clus, size // BLK_SIZE))
+        recs = [DirEntry.unpack_from(buf, off)
+                for off in range(0, size, CDIR_SIZE)]
+        slot = None
+        for i, r in enumerate(recs[1:], 1):
+            if not r.name:
+                break
+            if not r.deleted and r.name == de.name:
+                slot = i
+                break
+            if r.deleted and slot is None:
+                slot = i
+        if slot is None:
+            slot = next((i for i, r in enumerate(recs) if i and not r.name),
+                        len(recs))
+            if (slot + 1) * CDIR_SIZE >= size:
+                # No record left for the terminator: move the directory
+                buf = buf.ljust(size + BLK_SIZE, b'\0')
+                self.free(clus, size // BLK_SIZE)
+                new = self.alloc(size // BLK_SIZE + 1)
+                me = recs[0]._replace(clus=new, size=size + BLK_SIZE)
+                buf[:CDIR_SIZE] = me.pack()
+                buf[slot * CDIR_SIZE:(slot + 1) * CDIR_SIZE] = de.pack()
+                self.image.write(new * BLK_SIZE, bytes(buf))
+                if clus == self.boot.root_clus:
+                    self.boot = self.boot._replace(root_clus=new)
+                    self.image.write(self.lba * BLK_SIZE, pack_boot(self.boot))
+                else:
+                    parent, name = self._split(dir_path)
+                    self._dir_put(parent, self.lookup(dir_path)._replace(
+                        clus=new, size=size + BLK_SIZE))
+                return
+        blk = slot * CDIR_SIZE // BLK_SIZE
+        buf[slot * CDIR_SIZE:(slot + 1) * CDIR_SIZE] = de.pack()
+        self.image.write((clus + blk) * BLK_SIZE,
+                         bytes(buf[blk * BLK_SIZE:(blk + 1) * BLK_SIZE]))
+
+    def mkdir(self, path, entry_cnt=0, datetime=None):
+        """RedSeaMkDir. Returns False if the directory already exists."""
+        parent, name = self._split(path)
+        if self.exists(path):
+            if self.lookup(path).is_dir:
+                return False
+            raise FileExistsError(path)
+        up = self.lookup(parent)
+        if not up.is_dir:
+            raise NotADirectoryError(parent)
+        dt = unix_to_cdate(time.time()) if datetime is None else datetime
+        size = -(-((entry_cnt + 3) * CDIR_SIZE) // BLK_SIZE) * BLK_SIZE
+        clus = self.alloc(size // BLK_SIZE)
+        attr = RS_ATTR_DIR | RS_ATTR_CONTIGUOUS
+        up_clus = up.clus if parent.strip('/') else self.boot.root_clus
+        buf = (DirEntry(attr, name, clus, size, dt).pack() +
+               DirEntry(attr, '..', up_clus, 0, dt).pack())
+        self.image.write(clus * BLK_SIZE, buf.ljust(size, b'\0'))
+        self._dir_put(parent, DirEntry(attr, name, clus, size, dt))
+        return True
+
+    def makedirs(self, path):
+        parts = self._parts(path)
+        for i in range(1, len(parts) + 1):
+            self.mkdir('/' + '/'.join(parts[:i]))
+
+    # -------------------------------------------------------------------------
+    # Files
+    # -------------------------------------------------------------------------
+
+    def write_file(self, path, data, datetime=None, attr=0, raw=False):
+        """
+        Write (or replace) a file. Names like X.Y.Z are compressed with
+        templez, as FileWrite does, unless raw=True says data already is
+        the stored form. Returns the first block.
+        """
+        parent, name = self._split(path)
+        up = self.lookup(parent)
+        if not up.is_dir:
+            raise NotADirectoryError(parent)
+        if self.exists(path):
+            old = self.lookup(path)
+            if old.is_dir:
+                raise IsADirectoryError(path)
+            self.free(old.clus, old.blocks)
+        if is_dot_z(name):
+            attr |= RS_ATTR_COMPRESSED
+            if not raw:
+                data = templez.compress(data)
+        else:
+            attr &= ~RS_ATTR_COMPRESSED
+        blks = (len(data) + BLK_SIZE - 1) // BLK_SIZE
+        clus = self.alloc(blks) if blks else INVALID_CLUS
+        if blks:
+            self.image.write(clus * BLK_SIZE,
+                             bytes(data).ljust(blks * BLK_SIZE, b'\0'))
+        dt = unix_to_cdate(time.time()) if datetime is None else datetime
+        self._dir_put(parent, DirEntry(attr | RS_ATTR_CONTIGUOUS, name, clus,
+                                       len(data), dt))
+        return clus
+
+    def delete(self, path):
+        """RedSeaFilesDel for one file. Returns False if it did not exist."""
+        if not self.exists(path):
+            return False
+        de = self.lookup(path)
+        if de.is_dir:
+            raise IsADirectoryError(path)
+        parent, _ = self._split(path)
+        self._dir_put(parent, de._replace(attr=de.attr | RS_ATTR_DELETED))
+        self.free(de.clus, de.blocks)
+        return True
@@ -11,6 +11,7 @@ Usage:
 import sys, os
 sys.path.insert(0, os.path.dirname(__file__))
 from agent import Agent
+from deploy_plan import deploy
 
 REPO_DIR     = os.path.join(os.path.dirname(__file__), '..', 'brain', 'templerepo')
 RESULTS_PATH = 'C:/AI/results/TestResults.txt'
@@ -80,18 +81,17 @@ def make_pre_deploy():
         t.mkdir('C:/AI/tests')
         t.mkdir('C:/AI/results')
         print(f'Deploying {len(TEST_FILES)} test files to C:/AI/tests/...')
-        ok = 0
+        files = {}
         for fname in TEST_FILES:
             src = os.path.join(REPO_DIR, fname)
             if not os.path.exists(src):
                 print(f'  [SKIP] {fname} — not found in templerepo')
                 continue
-            with open(src, 'rb') as f:
-                content = f.read()
-            t.write_file(f'C:/AI/tests/{fname}', content)
-            print(f'  [OK]   {fname}  ({len(content)}b)')
-            ok += 1
-        print(f'Deployed {ok}/{len(TEST_FILES)} files.')
+            files[f'C:/AI/tests/{fname}'] = src
+        # Only new/changed files are uploaded (see deploy_plan.py)
+        uploaded, same = deploy(t, files)
+        print(f'Deployed {uploaded + same}/{len(TEST_FILES)} files '
+              f'({uploaded} uploaded, {same} unchanged).')
     return pre_deploy
 
 
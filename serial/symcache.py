@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+symcache.py — Host-side index of the TempleOS symbol table
+
+SerSymIndex(mask,local) dumps the hash chain of the REPL task (task ->
+parent -> Adam) as one row per symbol:
+
+    name<TAB>kind<TAB>addr<TAB>type<TAB>class
+
+kind is fun/glbl/class/oth, addr the exe_addr or data_addr (hex), type the
+raw HTT_* | HTF_* word (hex) and class the return or variable class name.
+SerSymGen() answers with the number of entries in the chain, the
+generation: any definition adds an entry, so an unchanged number means the
+index is still current. Checking costs one short round trip instead of
+the ~2500-row dump.
+
+The index is saved per snapshot (INDEX_DIR/<snap>.json) with the generation
+of its full dump, so a session that loadvm's the same snapshot loads it
+from disk. A saved index whose generation differs from the guest's is
+thrown away and dumped again in full: after a loadvm the symbols a past
+session defined are gone. When the generation grew during a session, only
+the REPL task's own table (where define/#include put new symbols) is
+dumped and merged, in memory; a smaller generation means symbols went
+away, so the whole chain is dumped again. reload() forces that.
+
+defined_names() picks the names out of HolyC source, so Agent.define()
+can record them without a round trip (the serial REPL is blocked while
+AgentLoop runs).
+
+Usage:
+    from symcache import SymbolCache
+    syms = SymbolCache(t, 'snap1').load()
+    'MAlloc' in syms                # True, no round trip
+    syms['MAlloc']                  # Symbol(kind='fun', addr=..., ...)
+    syms.complete('Str')            # ['Str2I64', 'StrCmp', ...]
+    t.symbol_cache('snap1')         # attach: symbol_exists() uses the index
+"""
+import json
+import os
+import re
+from collections import namedtuple
+
+INDEX_DIR = '/tmp/temple-symcache'
+
+# HTT_GLBL_VAR|HTT_CLASS|HTT_INTERNAL_TYPE|HTT_FUN
+SYM_MASK = 0x78
+# symbol_exists() counts these kinds, as SerSymExists does
+EXISTS_KINDS = ('fun', 'glbl', 'class')
+
+Symbol = namedtuple('Symbol', 'kind addr type cls')
+
+
+def parse_index(raw):
+    """SerSymIndex payload -> {name: Symbol}; the first row of a name wins
+    (the task's own definition shadows its parents')."""
+    syms = {}
+    for line in raw.decode(errors='replace').splitlines():
+        f = line.split('\t')
+        if len(f) != 5 or f[0] in syms:
+            continue
+        syms[f[0]] = Symbol(f[1], int(f[2], 16), int(f[3], 16), f[4])
+    return syms
+
+
+# Keywords that can start a top-level statement without declaring anything
+NOT_NAMES = {'if', 'else', 'while', 'for', 'do', 'switch', 'return', 'sizeof',
+             'goto', 'break', 'try', 'catch', 'lock', 'no_warn'}
+MODIFIERS = r'(?:(?:public|static|interrupt|noreg|reg)\s+)*'
+
+
+def _top_level(code):
+    """code without comments, literals and the inside of {} blocks."""
+    code = re.sub(r'//[^\n]*|/\*.*?\*/', ' ', code, flags=re.S)
+    code = re.sub(r'"(?:\\.|[^"\\])*"', '0', code)
+    code = re.sub(r"'(?:\\.|[^'\\])*'", '0', code)
+    out, depth = [], 0
+    for c in code:
+        if c == '{':
+            depth += 1
+            if depth == 1:
+                out.append(c)
+        elif c == '}':
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                out.append(c)
+        elif depth == 0:
+            out.append(c)
+    return ''.join(out)
+
+
+def defined_names(code):
+    """
+    [(name, kind, cls)] for the functions ('fun'), globals ('glbl') and
+    classes ('class') that HolyC source defines at top level; cls is the
+    return or variable class. A scan, not a parser: it is meant for
+    define()-style snippets, and skips extern/import declarations.
+    """
+    found = []
+    for stmt in re.split(r'(?<=[;}])', _top_level(code)):
+        stmt = stmt.strip()
+        if re.match(r'_?(?:extern|import)\b', stmt):
+            continue
+        m = re.match(MODIFIERS + r'(class|union)\s+(\w+)', stmt)
+        if m:
+            found.append((m.group(2), 'class', ''))
+            continue
+        m = re.match(MODIFIERS + r'(\w+)[\s*]+(\w+)\s*\([^)]*\)\s*(?:\{\}|;)$', stmt)
+        if m:
+            if m.group(1) not in NOT_NAMES:
+                found.append((m.group(2), 'fun', m.group(1)))
+            continue
+        m = re.match(MODIFIERS + r'(\w+)[\s*]+(\w.*);$', stmt, flags=re.S)
+        if not m or m.group(1) in NOT_NAMES:
+            continue
+        # I64 a=1,*b,c[4];  ->  a, b, c
+        decls = re.sub(r'\([^()]*\)|\[[^\]]*\]', '', m.group(2))
+        for decl in decls.split(','):
+            name = re.match(r'\s*\**\s*(\w+)\s*(?:=.*)?$', decl, flags=re.S)
+            if name and not name.group(1)[0].isdigit():
+                found.append((name.group(1), 'glbl', m.group(1)))
+    return found
+
+
+class SymbolCache:
+    def __init__(self, temple, snapshot='snap1', path=None):
+        self.t = temple
+        self.path = path or os.path.join(INDEX_DIR, f'{snapshot}.json')
+        self.syms = {}
+        self.gen = None
+
+    # -------------------------------------------------------------------------
+    # Guest queries
+    # -------------------------------------------------------------------------
+
+    def _dump(self, local):
+        self.t.load_primitive('SerSymIndex')
+        raw = self.t.send_cmd(f'SerSymIndex({SYM_MASK},{int(local)});',
+                              timeout=60)
+        if raw is None:
+            raise TimeoutError('SerSymIndex')
+        return parse_index(raw)
+
+    def generation(self):
+        """The guest's current generation (hash chain entry count)."""
+        self.t.load_primitive('SerSymIndex')
+        raw = self.t.send_cmd('SerSymGen();')
+        return int(raw) if raw and raw.isdigit() else None
+
+    # -------------------------------------------------------------------------
+    # Loading and refreshing
+    # -------------------------------------------------------------------------
+
+    def load(self):
+        """
+        Use the saved index if its generation is the guest's current one;
+        otherwise (e.g. after a loadvm) discard it and dump in full.
+        """
+        gen = self.generation()
+        if self.gen is None and os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            if gen is not None and saved['gen'] == gen:
+                self.gen = saved['gen']
+                self.syms = {n: Symbol(*s) for n, s in saved['syms'].items()}
+        self.sync(gen)
+        return self
+
+    def sync(self, gen=None):
+        """
+        Bring the index up to date: nothing to do when the generation is
+        unchanged, a local-table merge when it grew, a full dump the first
+        time or when it shrank. Only full dumps are saved, so the file keeps
+        what a fresh session of the snapshot sees. gen: the guest's
+        generation if already known. Returns True if anything was fetched.
+        """
+        if gen is None:
+            gen = self.generation()
+        if gen is not None and gen == self.gen:
+            return False
+        if self.gen is None or gen is not None and gen < self.gen:
+            self.syms = self._dump(local=False)
+            self.gen = gen
+            self.save()
+        else:
+            self.syms.update(self._dump(local=True))
+            self.gen = gen
+        return True
+
+    def reload(self):
+        """Full dump of the whole chain, e.g. after Adam gained symbols."""
+        self.gen = None
+        self.sync()
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.part'
+        with open(tmp, 'w') as f:
+            json.dump({'gen': self.gen, 'syms': self.syms}, f)
+        os.replace(tmp, self.path)
+
+    def add(self, name, kind='fun', addr=0, type=0, cls=''):
+        """Record a symbol learned some other way (e.g. over AgentLoop)."""
+        self.syms[name] = Symbol(kind, addr, type, cls)
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+
+    def __contains__(self, name):
+        s = self.syms.get(name)
+        return s is not None and s.kind in EXISTS_KINDS
+
+    def __getitem__(self, name):
+        return self.syms[name]
+
+    def get(self, name, default=None):
+        return self.syms.get(name, default)
+
+    def __len__(self):
+        return len(self.syms)
+
+    def names(self, kind=None):
+        """Sorted names, optionally only one kind ('fun', 'glbl', ...)."""
+        return sorted(n for n, s in self.syms.items()
+                      if kind is None or s.kind == kind)
+
+    def complete(self, prefix, kind=None):
+        """Sorted names starting with prefix (case-sensitive, like HolyC)."""
+        return [n for n in self.names(kind) if n.startswith(prefix)]
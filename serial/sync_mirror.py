@@ -2,14 +2,34 @@
 """
 sync_mirror.py — Mirror C:/Home/ and C:/AI/ from TempleOS to local brain/real-temple-tree/
 
+Incremental: brain/real-temple-tree.index.json records the guest size and
+mtime (from SerTree) and the CRC32 of every mirrored file. A run lists each
+target in one SerTree call and transfers only files whose size or mtime
+changed, or that are missing locally. Small files are fetched together
+with pipelined SerPack batches (Temple.read_files) rather than one
+SerFileRead each. Files gone from the guest are deleted locally. With
+nothing changed, the listing is the only transfer.
+
+The BANNED files (too big for SerFileRead) are fetched last, with verified,
+resumable ranged reads; the index keeps the CRC32 of their stored bytes, so
+an unchanged one costs a single SerFileHashRange.
+
+.Z files are mirrored EXPANDED, as FileRead returns them: a banned .Z file
+arrives as stored (compressed) bytes and is expanded with templez before
+it replaces the local copy.
+
 Usage:
-    sudo python3 serial/sync_mirror.py
+    sudo python3 serial/sync_mirror.py            # incremental
+    sudo python3 serial/sync_mirror.py --full     # ignore the index
 """
-import sys, os, time
+import sys, os, time, json, shutil
 sys.path.insert(0, os.path.dirname(__file__))
-from temple import Temple
+from temple import Temple, TempleException, READ_WINDOW, content_hash
+import delta
+import templez
 
 TREE_BASE = os.path.join(os.path.dirname(__file__), '..', 'brain', 'real-temple-tree')
+INDEX = TREE_BASE + '.index.json'
 
 BANNED = {
     'C:/Adam/AutoComplete/ACDefs.DATA',
@@ -18,7 +38,7 @@ BANNED = {
     'C:/Misc/Bible.TXT.Z',
 }
 
-stats = {'files': 0, 'dirs': 0, 'skipped': 0, 'errors': 0}
+stats = {'files': 0, 'dirs': 0, 'skipped': 0, 'deleted': 0, 'errors': 0}
 
 
 def temple_to_local(temple_path):
@@ -26,51 +46,198 @@ def temple_to_local(temple_path):
     return os.path.join(TREE_BASE, rel)
 
 
-def is_dir(t, path):
-    """Check if path is a directory by attempting to list it."""
-    entries = t.list_dir(path + '/*')
-    return entries is not None and len(entries) >= 0
+def load_index():
+    """{guest_path: {'size', 'mtime', 'hash'}} from the last run, or {}."""
+    try:
+        with open(INDEX) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
 
 
-def mirror_dir(t, temple_path, depth=0):
-    indent = '  ' * depth
-    entries = t.list_dir(temple_path + '/*')
-    if entries is None:
-        print(f'{indent}  (list failed)')
-        return
+def save_index(index):
+    part = INDEX + '.part'
+    with open(part, 'w') as f:
+        json.dump(index, f, indent=0, sort_keys=True)
+    os.replace(part, INDEX)
 
-    local_dir = temple_to_local(temple_path)
-    os.makedirs(local_dir, exist_ok=True)
-    stats['dirs'] += 1
 
-    for entry in entries:
-        if entry in BANNED:
-            print(f'{indent}  [BANNED]  {entry}')
+def fetch_banned(t, entry, local_path):
+    """
+    Fetch a file too big for SerFileRead into local_path with verified,
+    resumable ranged reads. The windows carry the stored bytes, so a .Z
+    file is fetched to <local_path>.stored and expanded into local_path.
+    Returns the stored size, or None on timeout (rerun to resume).
+    Raises TempleException if the file cannot be opened, ValueError if a
+    .Z file does not expand.
+    """
+    name = entry.split('/')[-1]
+    is_z = name.count('.') > 1 and name.endswith('.Z')
+    dest = local_path + '.stored' if is_z else local_path
+    size = t.read_file_to(entry, dest, window=READ_WINDOW, verify=True)
+    if size is None or not is_z:
+        return size
+    with open(dest, 'rb') as f:
+        data = templez.expand(f.read())
+    with open(local_path + '.part', 'wb') as f:
+        f.write(data)
+    os.replace(local_path + '.part', local_path)
+    os.remove(dest)
+    return size
+
+
+def mirror_file(t, entry, indent):
+    name = entry.split('/')[-1]
+    local_path = temple_to_local(entry)
+    if entry in BANNED:
+        print(f'{indent}[RANGED] {entry}', end='', flush=True)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        try:
+            size = fetch_banned(t, entry, local_path)
+        except (TempleException, ValueError) as e:
+            print(f'  FAILED ({e})')
+            stats['errors'] += 1
+            return False
+        if size is None:
+            print('  TIMEOUT (rerun to resume)')
+            stats['errors'] += 1
+            return False
+        print(f'  ({size}b stored)')
+        stats['files'] += 1
+        return True
+
+    # Files are streamed to disk as they arrive (via a .part file)
+    print(f'{indent}[FILE] {name}', end='', flush=True)
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    if (os.path.exists(local_path) and
+            os.path.getsize(local_path) >= delta.DELTA_MIN):
+        # Large file mirrored before — fetch only the changed blocks
+        try:
+            fetched = delta.pull(t, entry, local_path)
+            print(f'  (delta, {fetched}b fetched)')
+            stats['files'] += 1
+            return True
+        except TempleException as e:
+            print(f'  [delta failed: {e}]', end='', flush=True)
+    size = t.read_file_to(entry, local_path, timeout=30)
+    if size is not None and not t.is_up_to_date(entry, local_path):
+        print('  [CRC mismatch, retrying]', end='', flush=True)
+        size = t.read_file_to(entry, local_path, timeout=30)
+        if size is not None and not t.is_up_to_date(entry, local_path):
+            print('  CRC MISMATCH')
+            stats['errors'] += 1
+            return False
+    if size is None:
+        print(f'  TIMEOUT')
+        stats['errors'] += 1
+        return False
+    print(f'  ({size}b)')
+    stats['files'] += 1
+    return True
+
+
+def record(index, e):
+    """Store a freshly mirrored file's listing entry and CRC32 in the index."""
+    with open(temple_to_local(e['path']), 'rb') as f:
+        h = content_hash(f.read())
+    index[e['path']] = {'size': e['size'], 'mtime': e['mtime'], 'hash': h}
+
+
+def mirror_batch(t, entries, index):
+    """Fetch changed small files with one read_files() call."""
+    print(f'  [PACK] {len(entries)} file(s)', end='', flush=True)
+    try:
+        got = t.read_files([e['path'] for e in entries], dest=TREE_BASE)
+    except (TempleException, ValueError) as ex:
+        print(f'  FAILED ({ex}), reading one by one')
+        got = {}
+    if got is None:
+        print('  TIMEOUT, reading one by one')
+        got = {}
+    else:
+        print(f'  ({sum(os.path.getsize(p) for p in got.values())}b)')
+    for e in entries:
+        if e['path'] in got:
+            stats['files'] += 1
+            record(index, e)
+        elif mirror_file(t, e['path'], '  '):
+            record(index, e)
+        else:
+            index.pop(e['path'], None)
+
+
+def mirror_banned(t, index):
+    """Fetch the BANNED files whose stored bytes changed; updates index."""
+    for path in sorted(BANNED):
+        stored = t.file_hash(path, offset=0)
+        if stored is None:
+            print(f'  [SKIP] {path} (not on the guest)')
+            continue
+        old = index.get(path)
+        if (old and old.get('stored') == stored
+                and os.path.exists(temple_to_local(path))):
             stats['skipped'] += 1
             continue
+        if mirror_file(t, path, '  '):
+            record(index, {'path': path, 'size': t.file_size(path), 'mtime': None})
+            index[path]['stored'] = stored
+        else:
+            index.pop(path, None)
 
-        name = entry.split('/')[-1]
-        local_path = temple_to_local(entry)
 
-        # Directories have no extension; files always do in TempleOS
-        if '.' not in name:
-            print(f'{indent}  [DIR]  {name}/')
-            mirror_dir(t, entry, depth + 1)
-            continue
+def mirror_dir(t, temple_path, index):
+    """Bring the local copy of temple_path up to date; updates index."""
+    # One SerTree call lists the whole subtree, directories first
+    entries = t.walk(temple_path)
+    if entries is None:
+        print('  (list failed)')
+        stats['errors'] += 1
+        return
 
-        # It's a file — read it
-        print(f'{indent}  [FILE] {name}', end='', flush=True)
-        content = t.read_file(entry, timeout=30)
-        if content is None:
-            print(f'  TIMEOUT')
-            stats['errors'] += 1
+    os.makedirs(temple_to_local(temple_path), exist_ok=True)
+    stats['dirs'] += 1
+    base = temple_path.count('/')
+    seen = set()
+    batch = []
+    for e in entries:
+        path = e['path']
+        seen.add(path)
+        indent = '  ' * (path.count('/') - base)
+        if e['is_dir']:
+            os.makedirs(temple_to_local(path), exist_ok=True)
+            stats['dirs'] += 1
             continue
+        old = index.get(path)
+        local_path = temple_to_local(path)
+        if (old and old['size'] == e['size'] and old['mtime'] == e['mtime']
+                and os.path.exists(local_path)):
+            stats['skipped'] += 1
+            continue
+        if path not in BANNED and not (
+                os.path.exists(local_path) and
+                os.path.getsize(local_path) >= delta.DELTA_MIN):
+            batch.append(e)
+        elif mirror_file(t, path, indent):
+            record(index, e)
+        else:
+            index.pop(path, None)
+    if batch:
+        mirror_batch(t, batch, index)
 
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        with open(local_path, 'wb') as f:
-            f.write(content)
-        print(f'  ({len(content)}b)')
-        stats['files'] += 1
+    # Apply deletions: anything indexed under this root the guest no longer has
+    prefix = temple_path + '/'
+    for path in sorted(p for p in index if p.startswith(prefix) and p not in seen):
+        print(f'  [DEL]  {path}')
+        del index[path]
+        local_path = temple_to_local(path)
+        if os.path.isfile(local_path):
+            os.remove(local_path)
+        stats['deleted'] += 1
+        # Drop the local directory too if the guest removed it
+        d = path.rsplit('/', 1)[0]
+        while d.startswith(prefix) and d not in seen:
+            shutil.rmtree(temple_to_local(d), ignore_errors=True)
+            d = d.rsplit('/', 1)[0]
 
 
 def wait_freeze(t, timeout=20):
@@ -98,20 +265,31 @@ def main():
                 print('ERROR: REPL did not start')
                 sys.exit(1)
 
-        # Load primitives needed for mirroring
-        t.send_cmd('#include "C:/Home/SerDir.HC";')
-        t.send_cmd('#include "C:/Home/SerFileRead.HC";')
+        # Load primitives needed for mirroring in one command. SerFileWrite,
+        # SerExecStr and SerSymExists let load_primitive() upload the rest.
+        t.send_cmd('#include "C:/Home/SerFileRead.HC";'
+                   '#include "C:/Home/SerFileWrite.HC";'
+                   '#include "C:/Home/SerExecStr.HC";'
+                   '#include "C:/Home/SerSymExists.HC";')
         print('REPL ready.\n')
 
-        for temple_path, label in targets:
-            print(f'=== Mirroring {temple_path} ===')
-            mirror_dir(t, temple_path, depth=0)
+        index = {} if '--full' in sys.argv else load_index()
+        try:
+            for temple_path, label in targets:
+                print(f'=== Mirroring {temple_path} ===')
+                mirror_dir(t, temple_path, index)
+                print()
+            print('=== Mirroring banned files ===')
+            mirror_banned(t, index)
             print()
+        finally:
+            save_index(index)
 
         t.unfreeze()
 
     print(f'Done: {stats["files"]} files, {stats["dirs"]} dirs, '
-          f'{stats["skipped"]} skipped, {stats["errors"]} errors')
+          f'{stats["skipped"]} unchanged, {stats["deleted"]} deleted, '
+          f'{stats["errors"]} errors')
 
 
 if __name__ == '__main__':
@@ -11,24 +11,62 @@ Usage:
         t.write_file("C:/Home/test.HC", b'UartPrint("hello\\n");')
         t.unfreeze()
 
-Protocol:
+Protocol v1 (CAFEBABE):
     - Terminator: \\x04\\xCA\\xFE\\xBA\\xBE\\x04\\xFA\\xCE  (CAFEBABE)
     - Every command produces two TERM sequences:
         1. Primitive payload + TERM
         2. SerReplExe OK + TERM
     - drain() always called after every command to consume the trailing OK
     - SerFileWrite uses single \\x04 as ready signal (host-to-temple direction)
+
+Protocol v2 (length-framed, used when SerReplExe supports it):
+    - A command line starting with \\x02<id><space> is a v2 request
+    - Exactly one reply frame: V2_HDR (magic, id, status, flags, length) +
+      payload. Frames flagged V2_MORE come first when a command waits for
+      input from the host (READY, chunk acks), or V2_MORE|V2_PART every
+      4096 bytes of a long payload (the reply continues in the next frame)
+    - Replies carry their status: _recv_until_term() returns a Reply whose
+      .status is 0/1/2, so an ERR:/EXCEPT: reply is told apart from a binary
+      payload that merely starts with those bytes
+    - is_frozen() negotiates: an older SerReplExe answers the probe with
+      CAFEBABE frames and the connection stays on v1
 """
 
+import array
+import fnmatch
+import os
 import socket
+import sys
 import struct
 import time
 import subprocess
+import zlib
+
+from collections import deque
+
+import archive
+import templez
+from prepared import Prepared
+from symcache import SymbolCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 SOCK = '/tmp/temple-serial.sock'
 QMON = '/tmp/qmon.sock'
+REPO_DIR = os.path.join(os.path.dirname(__file__), '..', 'brain', 'templerepo')
 TERM = b'\x04\xCA\xFE\xBA\xBE\x04\xFA\xCE'
 
+# v2 frame header: magic, request id, status, flags, payload length
+V2_MAGIC = b'\xCA\xF2'
+V2_HDR = struct.Struct('<2sIBBI')
+V2_MORE = 1                 # flags: interim frame, the request is not done
+V2_PART = 2                 # flags: the payload continues in the next frame
+V2_STATUS = {0: 'ok', 1: 'err', 2: 'except'}
+V2_REQ = b'\x02'            # first byte of a v2 request line
+
 # Custom primitives not in snap1 — written to VM by freeze()
 _SERPRINT_HC = (
     b'U8 g_sp[4096];\n'
@@ -36,6 +74,15 @@ _SERPRINT_HC = (
     b'U0 SerFmt(U8 *fmt,I64 a,I64 b){StrPrint(g_sp,fmt,a,b);SerSend(g_sp);}\n'
 )
 
+class Reply(bytes):
+    """A reply payload plus the v2 status it came with (None under v1)."""
+
+    def __new__(cls, payload, status=None):
+        self = super().__new__(cls, payload)
+        self.status = status
+        return self
+
+
 class TempleException(Exception):
     """Raised when TempleOS throws an unhandled exception during exec."""
     pass
@@ -53,6 +100,230 @@ def _decode_except_ch(hex_str):
         return hex_str
 
 
+class FrameReader:
+    """
+    Incremental CAFEBABE framer over a stream socket.
+
+    Bytes are received with recv_into() straight into a growable bytearray.
+    Each search only covers bytes that arrived since the previous search plus
+    a len(term)-1 overlap, so a frame costs O(len) however it was chunked.
+    Bytes after a terminator stay buffered and start the next frame — the
+    payload and trailing OK often arrive in the same recv().
+
+    pop_frame2()/pop_partial2() parse v2 frames from the same buffer: the
+    payload length comes from the header, so nothing is scanned.
+    """
+
+    RECV_SIZE = 65536
+
+    def __init__(self, sock=None, bufsize=RECV_SIZE):
+        self.sock = sock
+        self._buf = bytearray(bufsize)
+        self._start = 0     # first unconsumed byte
+        self._end = 0       # end of received data
+        self._scan = 0      # no terminator starts before this offset
+        self._term = TERM   # terminator _scan refers to
+        self._cur = None    # header of the v2 frame pop_partial2() is inside
+        self._left = 0      # payload bytes of that frame still to come
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        """Forget all buffered bytes."""
+        self._start = self._end = self._scan = 0
+        self._cur = None
+
+    def feed(self, data):
+        """Append received bytes (for callers that do their own I/O)."""
+        self._reserve(len(data))
+        self._buf[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def pop_frame(self, term=TERM):
+        """Return the next complete frame without its terminator, or None."""
+        if term != self._term:
+            self._term = term
+            self._scan = self._start
+        idx = self._buf.find(term, max(self._scan, self._start), self._end)
+        if idx < 0:
+            self._scan = max(self._start, self._end - (len(term) - 1))
+            return None
+        frame = bytes(self._buf[self._start:idx])
+        self._start = self._scan = idx + len(term)
+        if self._start == self._end:
+            self.clear()
+        return frame
+
+    def pop_partial(self, term=TERM):
+        """
+        Streaming variant of pop_frame(). Returns (data, done): done=True when
+        data ends the current frame; otherwise data is every buffered byte that
+        cannot be the start of a split terminator (possibly b'').
+        """
+        frame = self.pop_frame(term)
+        if frame is not None:
+            return frame, True
+        data = bytes(self._buf[self._start:self._scan])
+        self._start = self._scan
+        return data, False
+
+    def _sync2(self):
+        """Skip to the next V2_MAGIC. True once a whole header is buffered."""
+        idx = self._buf.find(V2_MAGIC, self._start, self._end)
+        if idx < 0:
+            # Keep a last byte that may be the first half of the magic
+            self._start = max(self._start, self._end - 1)
+            return False
+        self._start = idx
+        return self._end - idx >= V2_HDR.size
+
+    def pop_frame2(self):
+        """
+        Return the next complete v2 frame as (req_id, status, flags, payload),
+        or None. Bytes before the frame's magic are discarded.
+        """
+        if self._cur is not None:
+            if self._end - self._start < self._left:
+                return None
+            frame = self._cur + (bytes(self._buf[self._start:self._start + self._left]),)
+            self._start += self._left
+            self._cur = None
+            return frame
+        if not self._sync2():
+            return None
+        _, rid, status, flags, n = V2_HDR.unpack_from(self._buf, self._start)
+        body = self._start + V2_HDR.size
+        if self._end - body < n:
+            return None
+        self._start = self._scan = body + n
+        if self._start == self._end:
+            self.clear()
+        return rid, status, flags, bytes(self._buf[body:body + n])
+
+    def pop_partial2(self):
+        """
+        Streaming variant of pop_frame2(). Returns (header, data, done):
+        header is (req_id, status, flags) of the frame data belongs to, or
+        None if no frame has started; done=True when data ends the frame.
+        """
+        if self._cur is None:
+            if not self._sync2():
+                return None, b'', False
+            _, rid, status, flags, self._left = V2_HDR.unpack_from(self._buf, self._start)
+            self._start += V2_HDR.size
+            self._cur = (rid, status, flags)
+        hdr = self._cur
+        n = min(self._left, self._end - self._start)
+        data = bytes(self._buf[self._start:self._start + n])
+        self._start += n
+        self._left -= n
+        if not self._left:
+            self._cur = None
+        return hdr, data, self._cur is None
+
+    def detect(self):
+        """2 or 1 once the next reply is recognisably v2 or CAFEBABE, else None."""
+        magic = self._buf.find(V2_MAGIC, self._start, self._end)
+        term = self._buf.find(TERM, self._start, self._end)
+        if magic >= 0 and (term < 0 or magic < term):
+            return 2
+        return 1 if term >= 0 else None
+
+    def recv(self):
+        """One recv_into() from the socket. Returns the byte count (0 on EOF)."""
+        self._reserve(self.RECV_SIZE)
+        with memoryview(self._buf) as mv:
+            n = self.sock.recv_into(mv[self._end:])
+        self._end += n
+        return n
+
+    def recv_frame(self, timeout, term=TERM):
+        """Block until a full frame is buffered. Returns None on timeout/EOF."""
+        return self.wait(lambda: self.pop_frame(term), timeout)
+
+    def recv_frame2(self, timeout):
+        """recv_frame() for v2: (req_id, status, flags, payload) or None."""
+        return self.wait(self.pop_frame2, timeout)
+
+    def wait(self, pop, timeout):
+        """Receive until pop() returns something other than None."""
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = pop()
+            if frame is not None:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                if not self.recv():
+                    return None
+            except socket.timeout:
+                return None
+
+    def _reserve(self, n):
+        """Make room for n more bytes after _end, compacting or growing."""
+        if len(self._buf) - self._end >= n:
+            return
+        used = self._end - self._start
+        if self._start:
+            self._buf[:used] = self._buf[self._start:self._end]
+            self._scan -= self._start
+            self._start, self._end = 0, used
+        if len(self._buf) - used < n:
+            self._buf.extend(bytes(max(n, len(self._buf))))
+
+
+# Primitives #included by freeze(), in dependency order
+PRIMITIVES = [
+    'SerDir',
+    'SerFileRead',
+    'SerFileWrite',
+    'SerFileExists',
+    'SerMkDir',
+    'SerExecI64',
+    'SerExecStr',
+    'SerSymExists',
+    'SerSymList',
+    'SerMemInfo',
+]
+
+# send_many() keeps at most this much command text in flight (SerReplExe's
+# line buffer is 4096 bytes)
+MAX_INFLIGHT_BYTES = 4096
+
+# SerReplExe reads each command line with SerRecvLine(buf,256); a v2
+# request id takes up to 7 of those bytes
+MAX_CMD_LEN = 248
+
+# SerFileWrite2 chunk size (8 RedSea blocks); each chunk is Adler-32 acked
+WRITE_CHUNK = 4096
+
+# write_files() sends at most this many file bytes per SerUnpack archive
+# (the guest holds a whole archive in memory while unpacking it)
+ARCHIVE_MAX = 1 << 20
+
+# read_file_to(window=...) default: bytes fetched per SerFileReadRange call
+READ_WINDOW = 65536
+
+# read_mem() asks SerMemRead for at most this many bytes per command
+MEM_WINDOW = 1 << 20
+
+# put_array()/get_array() element types: HolyC type -> (NumPy dtype,
+# array.array typecode, element size)
+ARRAY_TYPES = {'I64': ('<i8', 'q', 8), 'F64': ('<f8', 'd', 8),
+               'U8': ('u1', 'B', 1)}
+
+# SerFileHash algo argument
+HASH_ALGOS = {'crc32': 0, 'fnv64': 1}
+
+I64_MAX = 0x7FFFFFFFFFFFFFFF
+
+# CDate.date of 1970-01-01 (YearStartDate(1970))
+CDATE_UNIX_EPOCH = 719527
+
 BANNED_FILES = {
     'C:/Adam/AutoComplete/ACDefs.DATA',
     'C:/Adam/AutoComplete/ACWords.DATA.Z',
@@ -64,6 +335,15 @@ class Temple:
         self.sock_path = sock_path
         self.default_timeout = timeout
         self.s = None
+        self._rx = None
+        self._loaded = set()    # primitives loaded by load_primitive()
+        self._prepared = {}     # prepared snippets defined on the guest
+        self.syms = None        # SymbolCache attached by symbol_cache()
+        self._arrays = {}       # put_array() name -> HolyC element type
+        self.proto = None       # 1 or 2 once is_frozen() has negotiated
+        self._next_id = 0
+        self._pending = deque() # v2 request ids awaiting their final frame
+        self._err = b''         # error message _pop_partial() is collecting
 
     def __enter__(self):
         self.connect()
@@ -75,62 +355,200 @@ class Temple:
     def connect(self):
         self.s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self.s.connect(self.sock_path)
+        self._rx = FrameReader(self.s)
+        self._loaded.clear()
+        self._prepared.clear()
+        self._arrays.clear()
+        self.syms = None
+        self.proto = None
+        self._pending.clear()
+        self._err = b''
 
     def close(self):
         if self.s:
             self.s.close()
             self.s = None
+            self._rx = None
 
     # -------------------------------------------------------------------------
     # Low-level protocol
     # -------------------------------------------------------------------------
 
+    def _line(self, cmd):
+        """Encode a command line; under v2 it gets a new request id."""
+        if self.proto != 2:
+            return (cmd + '\n').encode()
+        self._next_id = self._next_id % 99999 + 1
+        self._pending.append(self._next_id)
+        return b'%s%d %s\n' % (V2_REQ, self._next_id, cmd.encode())
+
+    def _finish(self, rid):
+        """Request rid got its final frame; any older request is abandoned."""
+        while self._pending and self._pending.popleft() != rid:
+            pass
+
     def _recv_until_term(self, timeout=None):
-        """Read from socket until TERM sequence found. Returns (content, remainder)."""
+        """Read the next CAFEBABE frame. Returns its payload, or None on timeout.
+        Bytes received after the terminator stay buffered for the next call.
+        Under v2, the next reply for a pending request (replies to requests
+        that already timed out are dropped by id) as a Reply with its status:
+        V2_PART frames are joined, and a failed reply is just the final
+        frame's ERR:/EXCEPT: message.
+        """
         if timeout is None:
             timeout = self.default_timeout
-        buf = b''
-        deadline = time.time() + timeout
-        self.s.settimeout(1.0)
-        while time.time() < deadline:
-            try:
-                chunk = self.s.recv(512)
-                if chunk:
-                    buf += chunk
-                    if TERM in buf:
-                        idx = buf.index(TERM)
-                        return buf[:idx], buf[idx + len(TERM):]
-            except socket.timeout:
-                pass
-        return None, b''
+        if self.proto != 2:
+            return self._rx.recv_frame(timeout)
+        deadline = time.monotonic() + timeout
+        parts = []
+        while True:
+            frame = self._rx.recv_frame2(max(0, deadline - time.monotonic()))
+            if frame is None:
+                # Whatever arrives for these requests later is stale
+                self._pending.clear()
+                return None
+            rid, status, flags, payload = frame
+            if rid not in self._pending:
+                continue
+            if flags & V2_PART:
+                parts.append(payload)
+                continue
+            if not flags & V2_MORE:
+                self._finish(rid)
+            if parts and not status:
+                payload = b''.join(parts) + payload
+            return Reply(payload, status)
+
+    def _pop_partial(self):
+        """FrameReader.pop_partial() for the current protocol. Under v2, done
+        is only set at the end of the reply (not of a V2_PART frame), and a
+        reply with an error status raises TempleException once complete."""
+        if self.proto != 2:
+            return self._rx.pop_partial()
+        while True:
+            hdr, data, done = self._rx.pop_partial2()
+            if hdr is None:
+                return b'', False
+            rid, status, flags = hdr
+            if rid not in self._pending:
+                if not done:
+                    return b'', False
+                continue
+            if status:
+                # The ERR:/EXCEPT: message is not file data; collect it whole
+                self._err += data
+                data = b''
+            if not done or flags & V2_PART:
+                return data, False
+            if not flags & V2_MORE:
+                self._finish(rid)
+            if status:
+                err, self._err = Reply(self._err, status), b''
+                raise TempleException(_reply_error(err))
+            return data, True
 
     def _drain(self, timeout=3):
-        """Consume trailing OK+TERM from SerReplExe."""
-        self._recv_until_term(timeout=timeout)
+        """Consume trailing OK+TERM from SerReplExe (v2 has none)."""
+        if self.proto != 2:
+            self._recv_until_term(timeout=timeout)
+
+    def _discard_input(self, quiet=2):
+        """Drop buffered bytes and anything arriving until the line is quiet."""
+        self._rx.clear()
+        self.s.settimeout(quiet)
+        try:
+            while self.s.recv(4096):
+                pass
+        except OSError:
+            pass
+        self.s.settimeout(None)
+
+    def _recv_some(self, timeout):
+        """Receive whatever arrives within timeout. False on timeout/EOF."""
+        self.s.settimeout(timeout)
+        try:
+            return self._rx.recv() > 0
+        except socket.timeout:
+            return False
 
     def send_cmd(self, cmd, timeout=None):
         """Send a command to SerReplExe, return the response payload."""
         if timeout is None:
             timeout = self.default_timeout
-        self.s.sendall((cmd + '\n').encode())
-        content, _ = self._recv_until_term(timeout=timeout)
+        self.s.sendall(self._line(cmd))
+        content = self._recv_until_term(timeout=timeout)
         self._drain()
         return content
 
+    def send_many(self, cmds, window=8, timeout=None):
+        """
+        Pipeline commands to SerReplExe. Returns one payload per command, in order.
+
+        Commands are written back to back without waiting for each round trip.
+        At most `window` commands, and at most MAX_INFLIGHT_BYTES of command
+        text, are outstanding at once, so SerReplExe's input never backs up
+        by more than one REPL buffer.
+
+        Like send_cmd(), each command must produce exactly one payload frame
+        followed by SerReplExe's OK — append SerSendOk(); to commands that
+        send nothing (e.g. #include). Each line must fit SerRecvLine's
+        256-byte limit. If a response times out the stream is out of step:
+        no further commands are sent and the remaining results are None.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        lines = [self._line(cmd) for cmd in cmds]
+        results = [None] * len(lines)
+        sent = done = inflight = 0
+        while done < len(lines):
+            while (sent < len(lines) and sent - done < window and
+                   (sent == done or
+                    inflight + len(lines[sent]) <= MAX_INFLIGHT_BYTES)):
+                self.s.sendall(lines[sent])
+                inflight += len(lines[sent])
+                sent += 1
+            payload = self._recv_until_term(timeout=timeout)
+            if payload is None or (self.proto != 2 and
+                                   self._recv_until_term(timeout=timeout) is None):
+                break
+            results[done] = payload
+            inflight -= len(lines[done])
+            done += 1
+        return results
+
     def is_frozen(self, timeout=3):
         """
         Check if TempleOS REPL (SerReplExe) is currently running.
-        Sends a no-op semicolon and checks for CAFEBABE response.
+        Sends a no-op semicolon and checks for a response.
+        The first check on a connection sends it as a v2 request and sets
+        proto: 2 if a v2 frame comes back, 1 if CAFEBABE frames do (an older
+        SerReplExe, which fails on the request line).
         Returns True if frozen, False if not.
         """
+        probing = self.proto is None
         try:
-            self.s.sendall(b';\n')
-            content, _ = self._recv_until_term(timeout=timeout)
-            if content is None:
+            if not probing:
+                self.s.sendall(self._line(';'))
+                content = self._recv_until_term(timeout=timeout)
+                if content is None:
+                    return False
+                self._drain(timeout=2)
+                return True
+            self.proto = 2
+            self.s.sendall(self._line(';'))
+            self.proto = self._rx.wait(self._rx.detect, timeout)
+            if self.proto is None:
+                self._pending.clear()
                 return False
+            if self.proto == 2:
+                return self._recv_until_term(timeout=timeout) is not None
+            self._pending.clear()
+            self._recv_until_term(timeout=timeout)
             self._drain(timeout=2)
             return True
         except Exception:
+            if probing:
+                self.proto = None
             return False
 
     # -------------------------------------------------------------------------
@@ -143,19 +561,14 @@ class Temple:
         time.sleep(1)
         self._sendkey('Dir;')
         time.sleep(2)
-        # Load primitives
-        self.send_cmd('#include "C:/Home/SerDir.HC";')
-        self.send_cmd('#include "C:/Home/SerFileRead.HC";')
-        self.send_cmd('#include "C:/Home/SerFileWrite.HC";')
-        self.send_cmd('#include "C:/Home/SerFileExists.HC";')
-        self.send_cmd('#include "C:/Home/SerMkDir.HC";')
-        self.send_cmd('#include "C:/Home/SerExecI64.HC";')
-        self.send_cmd('#include "C:/Home/SerExecStr.HC";')
-        self.send_cmd('#include "C:/Home/SerSymExists.HC";')
-        self.send_cmd('#include "C:/Home/SerSymList.HC";')
-        self.send_cmd('#include "C:/Home/SerMemInfo.HC";')
+        # Load primitives — pipelined; SerSendOk() gives each #include the
+        # payload frame send_many() expects.
+        self.send_many([f'#include "C:/Home/{name}.HC";SerSendOk();'
+                        for name in PRIMITIVES])
         self.write_file('C:/Home/SerPrint.HC', _SERPRINT_HC)
         self.send_cmd('#include "C:/Home/SerPrint.HC";')
+        self.proto = None
+        self.is_frozen()
 
     def unfreeze(self):
         """Send EXIT to stop the REPL loop."""
@@ -169,6 +582,11 @@ class Temple:
     def load_snapshot(self, name='snap1'):
         """Load a QEMU snapshot."""
         _qmon(f'loadvm {name}')
+        self._loaded.clear()
+        self._prepared.clear()
+        self._arrays.clear()
+        self.proto = None
+        self.syms = None
 
     def recover(self, snapshot='snap1'):
         """
@@ -196,51 +614,446 @@ class Temple:
         List directory entries matching pattern (must include *).
         Returns list of full TempleOS paths, excluding . and ..
         """
-        raw = self.send_cmd(f'SerDir("{pattern}");')
-        if not raw:
-            return []
-        lines = raw.decode(errors='replace').strip().splitlines()
-        result = []
-        for l in lines:
-            l = l.replace('\x00', '').strip()
-            if l and not l.endswith('/.') and not l.endswith('/..') and l.startswith('C:/'):
-                result.append(l)
-        return result
+        return _parse_dir(self.send_cmd(f'SerDir("{pattern}");'))
 
-    def read_file(self, path, timeout=30):
+    def walk(self, root, timeout=60):
+        """
+        Recursively list directory `root` (e.g. 'C:/Home') in one exchange.
+        Returns a list of dicts with path, is_dir, size, attr and mtime (Unix
+        time, guest local clock), each directory before its contents, or
+        None on timeout. A missing root gives an empty list.
+        """
+        self.load_primitive('SerTree')
+        return _parse_tree(self.send_cmd(f'SerTree("{root}/*");', timeout=timeout))
+
+    def read_file(self, path, timeout=30, offset=None, length=None,
+                  compressed=False, verify=False, retries=2):
         """
         Read file contents from TempleOS. Returns bytes.
         Returns None on timeout.
+        With offset/length, SerFileReadRange reads just those bytes of the
+        file as stored on disk (.Z files stay compressed). Banned files can
+        be read this way. Raises TempleException if the file cannot be opened.
+        compressed=True: SerFileReadZ sends the TempleOS LZW form (a .Z file's
+        stored bytes, or CompressBuf of any other file) and templez expands
+        it here. Same result, typically under half the serial bytes for text.
+        Raises TempleException if the file cannot be opened.
+        verify=True: compare the CRC32 of what arrived with SerFileHash on the
+        guest and re-read up to `retries` times; raises TempleException if the
+        file cannot be opened or never matches.
         """
+        if verify:
+            want = self.file_hash(path, offset=offset, length=length)
+            if want is None:
+                raise TempleException('open')
+            for _ in range(retries + 1):
+                data = self.read_file(path, timeout, offset, length, compressed)
+                if data is not None and content_hash(data) == want:
+                    return data
+            raise TempleException('verify')
+        if offset is not None or length is not None:
+            return self._read_range(path, offset or 0, length, timeout)
+        if compressed:
+            return self._read_compressed(path, timeout)
         if path in BANNED_FILES:
             raise ValueError(f"File is banned from transfer: {path}")
         return self.send_cmd(f'SerFileRead("{path}");', timeout=timeout)
 
-    def write_file(self, path, content: bytes):
+    def read_files(self, pattern, dest=None, recurse=False, timeout=60):
+        """
+        Fetch many files in one exchange instead of a SerFileRead each.
+        pattern: a FilesFind mask such as 'C:/AI/results/*.TXT'
+                 (recurse=True also searches subdirectories), or a list of
+                 full paths, sent as pipelined SerPackFile batches.
+        Files arrive as a SerPack stream (archive.py) with a CRC32 each; one
+        that does not match is read again with read_file(verify=True), and
+        left out if that fails too. Files that cannot be opened are left
+        out, so callers can fall back to reading the missing ones singly.
+        Returns {path: bytes}. With dest (a local directory) each file is
+        written to dest/<path without the drive> instead, and the result is
+        {path: local_path}. Returns None on timeout.
+        """
+        if isinstance(pattern, str):
+            banned = [p for p in BANNED_FILES
+                      if _mask_matches(pattern, p, recurse)]
+        else:
+            banned = [p for p in pattern if p in BANNED_FILES]
+        if banned:
+            raise ValueError(f"File is banned from transfer: {banned[0]}")
+        self.load_primitive('SerFileHash')
+        self.load_primitive('SerPack')
+        if isinstance(pattern, str):
+            raws = [self.send_cmd(f'SerPack("{pattern}",{int(recurse)});',
+                                  timeout=timeout)]
+        else:
+            raws = self.send_many(_pack_cmds(pattern), timeout=timeout)
+        if None in raws:
+            return None
+        for raw in raws:
+            if _reply_failed(raw, binary=True):
+                raise TempleException(_reply_error(raw))
+        out = {}
+        for path, data, crc in archive.iter_stream(b''.join(raws)):
+            if content_hash(data) != crc:
+                try:
+                    data = self.read_file(path, timeout, verify=True)
+                except TempleException:
+                    continue
+            if dest is None:
+                out[path] = data
+                continue
+            local = os.path.join(dest, *path.split(':', 1)[-1].split('/'))
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+            with open(f'{local}.part', 'wb') as f:
+                f.write(data)
+            os.replace(f'{local}.part', local)
+            out[path] = local
+        return out
+
+    def _read_compressed(self, path, timeout):
+        # .Z files come straight off disk, so none of them stalls the guest
+        if path in BANNED_FILES and not path.endswith('.Z'):
+            raise ValueError(f"File is banned from transfer: {path}")
+        self.load_primitive('SerFileReadRange')
+        self.load_primitive('SerFileReadZ')
+        raw = self.send_cmd(f'SerFileReadZ("{path}");', timeout=timeout)
+        if raw is None:
+            return None
+        # ERR:open/EXCEPT: is a reply, not a CArcCompress buffer
+        if not raw or _reply_failed(raw):
+            raise TempleException(_reply_error(raw) if raw else 'open')
+        return templez.expand(raw)
+
+    def file_size(self, path):
+        """Size of a file as stored on disk, or None if it cannot be opened."""
+        self.load_primitive('SerFileReadRange')
+        raw = self.send_cmd(f'SerFileSize("{path}");')
+        if _reply_failed(raw):
+            return None
+        return int(raw)
+
+    def _read_range(self, path, offset, length, timeout):
+        self.load_primitive('SerFileReadRange')
+        if length is None:
+            size = self.file_size(path)
+            if size is None:
+                raise TempleException('open')
+            length = max(size - offset, 0)
+        raw = self.send_cmd(f'SerFileReadRange("{path}",{offset},{length});',
+                            timeout=timeout)
+        # Under v1 a range holding exactly the bytes ERR:open reads as the
+        # error too; v2's status byte tells them apart
+        if raw is not None and (_reply_failed(raw, binary=True) or
+                                getattr(raw, 'status', None) is None and
+                                raw == b'ERR:open'):
+            raise TempleException(_reply_error(raw))
+        return raw
+
+    def iter_file(self, path, timeout=30):
+        """
+        Read a file from TempleOS, yielding chunks as they arrive.
+        Memory use is bounded by the receive buffer, not the file size.
+        timeout applies to each gap between chunks; raises TimeoutError.
+        Abandoning the generator early discards the rest of the file.
+        """
+        if path in BANNED_FILES:
+            raise ValueError(f"File is banned from transfer: {path}")
+        self.s.sendall(self._line(f'SerFileRead("{path}");'))
+        done = stalled = False
+        try:
+            while not done:
+                try:
+                    chunk, done = self._pop_partial()
+                except TempleException:
+                    done = True     # the error reply ended the request
+                    raise
+                if chunk:
+                    yield chunk
+                if not done and not self._recv_some(timeout):
+                    stalled = True
+                    raise TimeoutError(f'read timed out: {path}')
+        finally:
+            # Closed early: skip the rest of the payload to stay in step
+            while not done and not stalled:
+                done = self._pop_partial()[1]
+                stalled = not done and not self._recv_some(timeout)
+            if done:
+                self._drain()
+
+    def read_file_to(self, path, dest, timeout=30, window=None, verify=False,
+                     retries=2):
+        """
+        Stream a file from TempleOS into dest without buffering it whole.
+        dest: local path (written to dest.part, renamed when complete),
+              a binary file object, or a callable taking each chunk.
+        window: fetch the stored bytes in ranged reads of this many bytes
+                (READ_WINDOW is a good size) instead of one SerFileRead.
+                For huge and banned files. If a window times out, the
+                .part file is kept and the next call resumes from its end,
+                once SerFileHashRange shows the guest's first bytes still
+                match it (otherwise the read starts over).
+        verify: check each window's CRC32 against SerFileHashRange and re-read
+                only the windows that fail (up to `retries` times each).
+                Implies window=READ_WINDOW if no window is given.
+        Returns the byte count, or None on timeout. With a window, raises
+        TempleException('open') if the file cannot be opened.
+        """
+        if verify and not window:
+            window = READ_WINDOW
+        if isinstance(dest, (str, os.PathLike)):
+            part = f'{os.fspath(dest)}.part'
+            resume = os.path.getsize(part) if window and os.path.exists(part) else 0
+            if resume and not self._part_matches(path, part, resume):
+                resume = 0      # the guest file changed since the .part began
+            try:
+                with open(part, 'ab' if resume else 'wb') as f:
+                    n = self.read_file_to(path, f, timeout=timeout, window=window,
+                                          verify=verify, retries=retries)
+            except TempleException:
+                os.remove(part)         # the guest file is gone
+                raise
+            if n is None:
+                if not window:
+                    os.remove(part)
+            else:
+                os.replace(part, dest)
+            return n
+        sink = dest.write if hasattr(dest, 'write') else dest
+        if window:
+            start = dest.tell() if hasattr(dest, 'tell') else 0
+            return self._read_windows(path, sink, start, window, timeout,
+                                      retries if verify else None)
+        n = 0
+        try:
+            for chunk in self.iter_file(path, timeout=timeout):
+                sink(chunk)
+                n += len(chunk)
+        except TimeoutError:
+            return None
+        return n
+
+    def _part_matches(self, path, part, n):
+        """True if the first n stored bytes of path hash like local file part."""
+        h = 0
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_WINDOW), b''):
+                h = zlib.crc32(chunk, h)
+        return self.file_hash(path, offset=0, length=n) == h & 0xFFFFFFFF
+
+    def _read_windows(self, path, sink, start, window, timeout, retries=None):
+        """Ranged reads of [start, size). retries=None: no hash check."""
+        size = self.file_size(path)
+        if size is None:
+            raise TempleException('open')
+        for off in range(start, size, window):
+            n = min(window, size - off)
+            want = None if retries is None else self.file_hash(path, offset=off, length=n)
+            for _ in range((retries or 0) + 1):
+                data = self._read_range(path, off, n, timeout)
+                if data is not None and len(data) == n and (
+                        want is None or content_hash(data) == want):
+                    break
+            else:
+                return None
+            sink(data)
+        return size
+
+    def file_hash(self, path, algo='crc32', offset=None, length=None):
+        """
+        Hash a guest file without transferring it. Returns an int, or None
+        if the file cannot be opened.
+        algo: 'crc32' (zlib.crc32) or 'fnv64' (FNV-1a 64-bit).
+        Without offset/length the file content is hashed as FileRead returns
+        it (.Z expanded). With them, the stored bytes of that range are, to
+        match read_file(offset=, length=).
+        """
+        self.load_primitive('SerFileHash')
+        a = HASH_ALGOS[algo]
+        if offset is None and length is None:
+            raw = self.send_cmd(f'SerFileHash("{path}",{a});')
+        else:
+            if length is None:
+                length = I64_MAX - (offset or 0)    # off+len must not overflow
+            raw = self.send_cmd(
+                f'SerFileHashRange("{path}",{offset or 0},{length},{a});')
+        if _reply_failed(raw):
+            return None
+        return int(raw, 16)
+
+    def is_up_to_date(self, path, local, algo='crc32'):
+        """
+        True if guest file `path` has the same content as `local` (bytes or
+        a local file path). Only the hash crosses the serial line.
+        """
+        if isinstance(local, (str, os.PathLike)):
+            with open(local, 'rb') as f:
+                local = f.read()
+        return self.file_hash(path, algo) == content_hash(local, algo)
+
+    def load_primitive(self, name):
+        """
+        Make sure primitive `name` (brain/templerepo/<name>.HC) is defined.
+        Primitives that are not part of snap1 are uploaded with SerFileWrite
+        and #included the first time they are needed.
+        """
+        if name in self._loaded:
+            return
+        if not self._guest_symbol_exists(name):
+            with open(os.path.join(REPO_DIR, f'{name}.HC'), 'rb') as f:
+                self.write_file(f'C:/Home/{name}.HC', f.read())
+            raw = self.send_cmd(f'#include "C:/Home/{name}.HC";SerSendOk();')
+            if raw != b'OK':
+                raise TempleException(_reply_error(raw))
+        self._loaded.add(name)
+
+    def write_file(self, path, content: bytes, chunked=False, compressed=False,
+                   verify=False):
         """
         Write file to TempleOS.
         content: bytes to write
+        chunked: use SerFileWrite2 — length-prefixed, binary-safe, any size,
+                 sent in WRITE_CHUNK pieces that are each checksummed and acked.
+                 Raises TempleException if the upload fails.
+        compressed: like chunked, but send templez.compress(content) and let
+                 SerFileWriteZ ExpandBuf it on the guest. HolyC source shrinks
+                 to ~40%.
+        verify: afterwards compare the CRC32 of content with the guest's:
+                of the stored bytes for chunked (SerFileWrite2 stores content
+                as is, even in a .Z file), of what FileRead returns otherwise.
+                On a mismatch repair the file (_repair_file), then raise
+                TempleException('verify') if it still differs.
         """
-        self.s.sendall(f'SerFileWrite("{path}");\n'.encode())
-        # Wait for ready signal (single \x04)
-        buf = b''
-        deadline = time.time() + 10
-        self.s.settimeout(1.0)
-        while time.time() < deadline:
-            try:
-                chunk = self.s.recv(256)
-                if chunk:
-                    buf += chunk
-                    if b'\x04' in buf:
-                        break
-            except socket.timeout:
-                continue
+        if verify:
+            self.write_file(path, content, chunked, compressed)
+            if self._written(path, content, stored=chunked):
+                return
+            self._repair_file(path, content, stored=chunked)
+            if not self._written(path, content, stored=chunked):
+                raise TempleException('verify')
+            return
+        if compressed:
+            return self._write_file_compressed(path, content)
+        if chunked:
+            return self._write_file_chunked(path, content)
+        self.s.sendall(self._line(f'SerFileWrite("{path}");'))
+        # Wait for ready signal (single \x04; a V2_MORE frame under v2)
+        if self.proto == 2:
+            self._recv_until_term(timeout=10)
+        else:
+            self._rx.recv_frame(10, term=b'\x04')
         # Send file bytes + single EOT
         self.s.sendall(content + b'\x04')
         # Drain OK+TERM
         self._recv_until_term(timeout=10)
         self._drain()
 
+    def _write_file_chunked(self, path, content):
+        self.load_primitive('SerFileWrite2')
+        self._upload(f'SerFileWrite2("{path}",{len(content)});', content)
+
+    def _written(self, path, content, stored=False):
+        """True if path holds content: its stored bytes (stored=True), or
+        what FileRead returns, which for a .Z file is the expansion."""
+        if stored:
+            return self.file_hash(path, offset=0) == content_hash(content)
+        return self.is_up_to_date(path, content)
+
+    def _repair_file(self, path, content, stored=False):
+        """
+        Re-send the WRITE_CHUNK ranges of path whose SerFileHashRange differs
+        from content, which is what the file stores: always for stored=True
+        (a SerFileWrite2 upload), and for any file but a .Z one otherwise.
+        A .Z file written through FileWrite stores the compressed bytes, so
+        it is uploaded again with SerFileWriteZ; a file of the wrong size is
+        uploaded whole with SerFileWrite2. Returns the number of bytes re-sent.
+        """
+        name = path.rsplit('/', 1)[-1]
+        if not stored and name.count('.') > 1 and name.endswith('.Z'):
+            arc = templez.compress(content)
+            self._write_file_compressed(path, content, arc)
+            return len(arc)
+        if self.file_size(path) != len(content):
+            self._write_file_chunked(path, content)
+            return len(content)
+        self.load_primitive('SerFileHash')
+        offs = range(0, len(content), WRITE_CHUNK)
+        hashes = self.send_many([f'SerFileHashRange("{path}",{off},{WRITE_CHUNK},0);'
+                                 for off in offs])
+        bad = [off for off, raw in zip(offs, hashes)
+               if _reply_failed(raw) or
+               int(raw, 16) != content_hash(content[off:off + WRITE_CHUNK])]
+        # Adjacent bad chunks go in one upload
+        runs = []
+        for off in bad:
+            if runs and runs[-1][1] == off:
+                runs[-1][1] = off + WRITE_CHUNK
+            else:
+                runs.append([off, off + WRITE_CHUNK])
+        self.load_primitive('SerFileWrite2')     # SerRecvChunk
+        self.load_primitive('SerFileWriteRange')
+        sent = 0
+        for start, end in runs:
+            data = content[start:end]
+            self._upload(f'SerFileWriteRange("{path}",{start},{len(data)});', data)
+            sent += len(data)
+        return sent
+
+    def _write_file_compressed(self, path, content, arc=None):
+        self.load_primitive('SerFileWrite2')     # SerRecvChunk
+        self.load_primitive('SerFileWriteZ')
+        if arc is None:
+            arc = templez.compress(content)
+        self._upload(f'SerFileWriteZ("{path}",{len(arc)});', arc)
+
+    def write_files(self, files, compressed=True):
+        """
+        Write several files in one upload. files: {guest_path: bytes}.
+        The files travel as one archive (archive.py) that SerUnpack writes
+        out on the guest, creating missing directories, so the whole batch
+        costs one READY handshake instead of one per file. Archives hold at
+        most ARCHIVE_MAX bytes of files; bigger batches are split.
+        compressed: send the archive templez.compress'd (ExpandBuf on the
+        guest). Raises TempleException if an upload fails.
+        """
+        self.load_primitive('SerFileWrite2')     # SerRecvChunk
+        self.load_primitive('SerUnpack')
+        for batch in archive.batches(files, ARCHIVE_MAX):
+            arc = archive.pack(batch)
+            if compressed:
+                arc = templez.compress(arc)
+            self._upload(f'SerUnpack({len(arc)},{int(compressed)});', arc)
+
+    def _upload(self, cmd, content, retries=3, expect=b'OK'):
+        """Run a SerRecvChunk-based upload command (READY, acked chunks,
+        OK). A chunk with a bad checksum is resent. expect=None returns the
+        final payload instead of requiring OK."""
+        self.s.sendall(self._line(cmd))
+        reply = self._recv_until_term(timeout=10)
+        if reply != b'READY':
+            self._drain()
+            raise TempleException(_reply_error(reply))
+        view = memoryview(content).cast('B')
+        for off in range(0, len(view), WRITE_CHUNK):
+            chunk = view[off:off + WRITE_CHUNK]
+            want = b'%08X' % zlib.adler32(chunk)
+            for attempt in range(retries + 1):
+                self.s.sendall(chunk)
+                ack = self._recv_until_term(timeout=10)
+                if ack is None:
+                    raise TempleException('timeout')
+                if ack == want:
+                    self.s.sendall(b'K')
+                    break
+                self.s.sendall(b'R' if attempt < retries else b'X')
+            else:
+                break
+        result = self._recv_until_term(timeout=30)
+        self._drain()
+        if (_reply_failed(result, binary=True) or
+                expect is not None and result != expect):
+            raise TempleException(_reply_error(result))
+        return result
+
     def file_exists(self, path):
         """Check if a file exists. Returns True/False."""
         raw = self.send_cmd(f'SerFileExists("{path}");')
@@ -253,22 +1066,47 @@ class Temple:
         self.send_cmd(f'SerMkDir("{path}");')
 
     def exec(self, code: str):
-        """Execute arbitrary HolyC code. Returns OK response."""
+        """Execute arbitrary HolyC code. Returns the reply payload: b'OK'
+        under v1, under v2 whatever the code sent (b'' if nothing)."""
         return self.send_cmd(code)
 
     def exec_i64(self, expr: str):
         """Execute a HolyC expression, return I64 result as int.
+        One round trip: g_r=expr; and SerGetI64(g_r); share a command line.
         Raises TempleException if TempleOS throws during execution.
         """
-        self.exec(f'g_r={expr};')
-        raw = self.send_cmd('SerGetI64(g_r);')
-        if raw is None:
-            return None
-        if raw.startswith(b'EXCEPT:'):
-            name = raw[7:].decode(errors='replace').strip()
-            raise TempleException(name)
-        s = raw.decode(errors='replace').strip()
-        return int(s) if s else None
+        return _parse_i64(self.send_cmd(f'g_r={expr};SerGetI64(g_r);'))
+
+    def exec_i64_many(self, exprs, array=False):
+        """
+        Evaluate many I64 expressions in one command. The expressions are
+        uploaded NUL-separated (SerRecvChunk), SerExecI64Many runs each with
+        ExePutS under its own try/catch, and the reply is the values as a
+        packed little-endian I64 array followed by one status byte each.
+        Returns a list with an int per expression, or a TempleException
+        (not raised) for each one that threw or did not compile.
+        array=True returns (values, failed) NumPy arrays (int64, bool)
+        instead; a failed slot holds the raw exception code.
+        The expressions must not write to the serial port themselves.
+        """
+        if array and np is None:
+            raise ImportError('exec_i64_many(array=True) needs numpy')
+        exprs = list(exprs)
+        if not exprs:
+            return (np.zeros(0, np.int64), np.zeros(0, bool)) if array else []
+        self.load_primitive('SerFileWrite2')     # SerRecvChunk
+        self.load_primitive('SerExecI64Many')
+        blob = b''.join(e.encode() + b';\0' for e in exprs)
+        raw = self._upload(f'SerExecI64Many({len(blob)});', blob, expect=None)
+        n = len(exprs)
+        if len(raw) != n * 9:
+            raise TempleException(_reply_error(raw))
+        if array:
+            return (np.frombuffer(raw, '<i8', n),
+                    np.frombuffer(raw, np.uint8, n, n * 8).astype(bool))
+        values = struct.unpack(f'<{n}q', raw[:n * 8])
+        return [TempleException(_decode_except_ch('%X' % v))
+                if failed else v for v, failed in zip(values, raw[n * 8:])]
 
     def exec_str(self, code: str):
         """
@@ -283,19 +1121,42 @@ class Temple:
             raw = self.send_cmd(f'GStrReset();{code}SerSendStr();')
         except (ConnectionResetError, OSError):
             raise TempleException('crash')
-        # If SerSendStr never ran (exception in user code), SerSendOk fires
-        # instead, and send_cmd receives b'OK' as the first CAFEBABE payload.
-        if raw == b'OK':
-            raise TempleException('exception')
-        if raw and raw.startswith(b'EXCEPT:'):
-            name = raw[7:].decode(errors='replace').strip()
-            raise TempleException(name)
-        return raw.decode(errors='replace') if raw else ''
+        return _parse_str(raw)
 
     def symbol_exists(self, name: str) -> bool:
-        """Return True if name is defined in the current TempleOS symbol table."""
+        """Return True if name is defined in the current TempleOS symbol table.
+        With a symbol_cache() attached a hit costs nothing, and a miss one
+        SerSymGen round trip (plus a merge if the guest gained symbols)."""
+        if self.syms is None:
+            return self._guest_symbol_exists(name)
+        if name not in self.syms:
+            self.syms.sync()
+        return name in self.syms
+
+    def _guest_symbol_exists(self, name):
         return self.exec_str(f'SerSymExists("{name}");') == '1'
 
+    def symbols_exist(self, names) -> dict:
+        """Pipelined symbol_exists() for many names. Returns {name: bool}."""
+        names = list(names)
+        if self.syms is not None:
+            if not all(n in self.syms for n in names):
+                self.syms.sync()
+            return {n: n in self.syms for n in names}
+        raws = self.send_many(
+            [f'GStrReset();SerSymExists("{n}");SerSendStr();' for n in names])
+        return {n: raw == b'1' for n, raw in zip(names, raws)}
+
+    def symbol_cache(self, snapshot='snap1'):
+        """
+        Attach a SymbolCache (symcache.py) for `snapshot`, loaded from disk
+        when the guest's generation matches, and return it. symbol_exists(),
+        symbols_exist() and list_symbols() then answer from the index;
+        run_hc() and prepare() merge what they define.
+        """
+        self.syms = SymbolCache(self, snapshot).load()
+        return self.syms
+
     def list_symbols(self, kind='functions', detailed=False) -> list:
         """
         Return symbols from the TempleOS hash table chain.
@@ -305,6 +1166,11 @@ class Temple:
         """
         masks = {'functions': 64, 'globals': 8, 'classes': 16, 'all': 131071}
         mask = masks.get(kind, 64)
+        if self.syms is not None and kind != 'all':
+            self.syms.sync()
+            k = {64: 'fun', 8: 'glbl', 16: 'class'}[mask]
+            names = self.syms.names(k)
+            return [(n, k) for n in names] if detailed else names
         raw = self.send_cmd(f'SerSymList({mask});')
         if not raw:
             return []
@@ -324,16 +1190,132 @@ class Temple:
         """
         self.write_file(path, code.encode())
         self.send_cmd(f'#include "{path}";')
+        if self.syms is not None:
+            self.syms.sync()
         if call:
             return self.exec_str(call)
         return None
 
+    def prepare(self, code: str, params=(), ret='I64'):
+        """
+        Define `code` as a HolyC function once and return a Prepared handle
+        (prepared.py) whose calls are one short SerReplExe line each:
+            sq = t.prepare('x*x', 'I64 x'); sq(7)  # 49
+        Handles are cached by source hash, so preparing the same snippet
+        again costs nothing. ret: 'I64' (int), 'F64' (float), 'U8 *' (str)
+        or 'U0' (None). Calls raise TempleException if the guest throws.
+        """
+        p = Prepared(self, code, params, ret)
+        if p.name in self._prepared:
+            return self._prepared[p.name]
+        if not self.symbol_exists(p.name):
+            src = p.source + 'SerSendOk();'
+            if len(src) > MAX_CMD_LEN:
+                self.write_file(f'C:/Home/{p.name}.HC', p.source.encode())
+                src = f'#include "C:/Home/{p.name}.HC";SerSendOk();'
+            raw = self.send_cmd(src)
+            if raw != b'OK':
+                raise TempleException(_reply_error(raw))
+            if self.syms is not None:
+                self.syms.add(p.name, 'fun', cls=p.ret.rstrip(' *'))
+        self._prepared[p.name] = p
+        return p
+
+    def _call_prepared(self, p, args):
+        return _prepared_result(p, self.send_cmd(_prepared_cmd(p, args)))
+
+    def _map_prepared(self, p, arg_tuples):
+        raws = self.send_many([_prepared_cmd(p, a) for a in arg_tuples])
+        return [_prepared_result(p, raw) for raw in raws]
+
+    def read_mem(self, addr, n, array=False, strict=True, timeout=None):
+        """
+        Read n bytes of guest memory at addr as raw binary. SerMemRead sends
+        MEM_WINDOW bytes per command (pipelined) plus one byte per 4KB page
+        saying whether ChkPtr found it mapped; unmapped pages are sent as
+        zeros instead of being touched. strict=True raises TempleException
+        for an unmapped page, strict=False returns the zero-filled bytes.
+        Returns bytes, or a NumPy uint8 array view with array=True.
+        """
+        if array and np is None:
+            raise ImportError('read_mem(array=True) needs numpy')
+        self.load_primitive('SerMemRead')
+        spans = [(a, min(MEM_WINDOW, addr + n - a))
+                 for a in range(addr, addr + n, MEM_WINDOW)]
+        raws = self.send_many([f'SerMemRead({a},{k});' for a, k in spans],
+                              timeout=timeout)
+        data = b''.join(_mem_chunk(a, k, raw, strict)
+                        for (a, k), raw in zip(spans, raws))
+        return np.frombuffer(data, np.uint8) if array else data
+
+    def put_array(self, name, data):
+        """
+        Store a vector in guest global `name`. data is a NumPy array
+        (int64/float64/uint8), an array.array ('q'/'d'/'B') or bytes.
+        SerArrInfo first asks the guest what `name` is:
+          - missing: declared as an I64/F64/U8 pointer plus I64 name_cnt
+            (element count), and filled like the next case;
+          - a pointer of the same element type: SerArrRecv MAllocs the new
+            buffer and Frees the old one (name_cnt is declared if missing);
+          - a fixed array of that type with room for the data: SerArrRecvTo
+            copies into it, setting name_cnt if there is one.
+        Anything else (a scalar, another element type, a short array)
+        raises TempleException; nothing that is not a pointer is Freed.
+        The raw little-endian bytes go through SerRecvChunk.
+        """
+        ctype, raw = _array_bytes(data)
+        n = len(raw) // ARRAY_TYPES[ctype][2]
+        self.load_primitive('SerFileWrite2')     # SerRecvChunk
+        self.load_primitive('SerArr')
+        info = self.send_cmd(f'SerArrInfo("{name}");')
+        if _reply_failed(info):
+            raise TempleException(_reply_error(info))
+        mode, has_cnt = _array_target(name, ctype, n, info.decode())
+        decl = ''
+        if mode == 'new':
+            decl = f'{ctype} *{name}=NULL;'
+        if mode != 'fixed' and not has_cnt:
+            decl += f'I64 {name}_cnt=0;'
+        if decl:
+            reply = self.send_cmd(decl + 'SerSendOk();')
+            if reply != b'OK':
+                raise TempleException(_reply_error(reply))
+        if mode == 'fixed':
+            cnt = f'&{name}_cnt' if has_cnt else 'NULL'
+            self._upload(f'SerArrRecvTo({name},{cnt},{n},{len(raw)});', raw)
+        else:
+            self._upload(f'SerArrRecv(&{name},&{name}_cnt,{n},{len(raw)});', raw)
+        self._arrays[name] = ctype
+
+    def get_array(self, name, ctype=None, count=None):
+        """
+        Read a vector back from the guest as raw bytes (SerArrSend, one
+        command). By default name is a put_array() vector and name_cnt its
+        length; count=N reads N elements at name instead, e.g. a fixed
+        array global. ctype defaults to the put_array() type, else the
+        symbol index's class. Returns a NumPy array, or an array.array
+        without NumPy.
+        """
+        ctype = ctype or self._arrays.get(name)
+        if ctype is None and self.syms is not None and name in self.syms:
+            ctype = self.syms[name].cls
+        if ctype not in ARRAY_TYPES:
+            raise ValueError(f'{name}: element type {ctype!r} not one of '
+                             f'{", ".join(ARRAY_TYPES)}')
+        size = ARRAY_TYPES[ctype][2]
+        nbytes = f'{name}_cnt*{size}' if count is None else count * size
+        self.load_primitive('SerArr')
+        raw = self.send_cmd(f'SerArrSend({name},{nbytes});', timeout=60)
+        if _reply_failed(raw, binary=True) or len(raw) < 8 or \
+                len(raw) != 8 + struct.unpack_from('<q', raw)[0]:
+            raise TempleException(_reply_error(raw))
+        return _array_from(ctype, raw[8:])
+
     def exec_rows(self, code: str) -> list:
         """Execute HolyC code via exec_str, parse result as TSV rows.
         Each line in the result becomes a list of fields split by tab.
         """
-        raw = self.exec_str(code)
-        return [line.split('\t') for line in raw.splitlines() if line]
+        return _parse_rows(self.exec_str(code))
 
     def exec_kv(self, code: str) -> dict:
         """Execute HolyC code via exec_str, parse result as key\\tvalue pairs."""
@@ -341,14 +1323,7 @@ class Temple:
 
     def mem_info(self) -> dict:
         """Return TempleOS memory stats as a dict with integer values."""
-        kv = self.exec_kv('SerMemInfo();')
-        result = {}
-        for k, v in kv.items():
-            try:
-                result[k] = int(v)
-            except ValueError:
-                result[k] = v
-        return result
+        return _parse_ints(self.exec_kv('SerMemInfo();'))
 
     # -------------------------------------------------------------------------
     # Helpers
@@ -366,6 +1341,251 @@ class Temple:
 # Module-level helpers
 # -------------------------------------------------------------------------
 
+def _parse_dir(raw):
+    """SerDir payload -> list of full paths, excluding . and .."""
+    if not raw:
+        return []
+    lines = raw.decode(errors='replace').strip().splitlines()
+    result = []
+    for l in lines:
+        l = l.replace('\x00', '').strip()
+        if l and not l.endswith('/.') and not l.endswith('/..') and l.startswith('C:/'):
+            result.append(l)
+    return result
+
+
+def _parse_tree(raw):
+    """SerTree payload -> list of entry dicts (None on timeout)."""
+    if raw is None:
+        return None
+    entries = []
+    for line in raw.decode(errors='replace').splitlines():
+        fields = line.split('\t', 4)
+        if len(fields) != 5:
+            continue
+        is_dir, size, attr, dt, path = fields
+        entries.append({
+            'path': path,
+            'is_dir': is_dir == '1',
+            'size': int(size),
+            'attr': int(attr, 16),
+            'mtime': cdate_to_unix(int(dt, 16)),
+        })
+    return entries
+
+
+def _mask_matches(mask, path, recurse):
+    """Would FilesFind(mask) list path? Case-insensitive, ';' lists allowed."""
+    mdir, _, fmask = mask.upper().rpartition('/')
+    pdir, _, name = path.upper().rpartition('/')
+    if not (pdir == mdir or recurse and pdir.startswith(mdir + '/')):
+        return False
+    return any(fnmatch.fnmatchcase(name, m) for m in fmask.split(';'))
+
+
+def _pack_cmds(paths):
+    """SerPackFile calls for paths, grouped into lines SerReplExe accepts."""
+    cmds, cmd = [], ''
+    end = 'SerSend("");'
+    for p in paths:
+        call = f'SerPackFile("{p}");'
+        if cmd and len(cmd) + len(call) + len(end) > MAX_CMD_LEN:
+            cmds.append(cmd + end)
+            cmd = ''
+        cmd += call
+    if cmd:
+        cmds.append(cmd + end)
+    return cmds
+
+
+def cdate_to_unix(cdate):
+    """TempleOS CDate (days since AD 0 << 32 | 1/2^32 day) -> Unix time."""
+    days, frac = cdate >> 32, cdate & 0xFFFFFFFF
+    return (days - CDATE_UNIX_EPOCH) * 86400 + frac * 86400 / (1 << 32)
+
+
+def unix_to_cdate(t):
+    """Unix time -> TempleOS CDate (inverse of cdate_to_unix)."""
+    days, secs = divmod(t, 86400)
+    return ((int(days) + CDATE_UNIX_EPOCH) << 32) | min(
+        int(secs * (1 << 32) / 86400), 0xFFFFFFFF)
+
+
+def _parse_i64(raw):
+    """SerGetI64 payload -> int (None on timeout); raises TempleException."""
+    if raw is None:
+        return None
+    if _reply_failed(raw):
+        raise TempleException(_reply_error(raw))
+    s = raw.decode(errors='replace').strip()
+    return int(s) if s else None
+
+
+def _parse_str(raw):
+    """SerSendStr payload -> str; raises TempleException."""
+    # If SerSendStr never ran (exception in user code), SerSendOk fires
+    # instead, and send_cmd receives b'OK' as the first CAFEBABE payload.
+    if raw == b'OK' and getattr(raw, 'status', None) is None:
+        raise TempleException('exception')
+    if raw and _reply_failed(raw):
+        raise TempleException(_reply_error(raw))
+    return raw.decode(errors='replace') if raw else ''
+
+
+def content_hash(data, algo='crc32'):
+    """Host-side equivalent of SerFileHash for bytes."""
+    if algo == 'crc32':
+        return zlib.crc32(data) & 0xFFFFFFFF
+    h = 0xCBF29CE484222325
+    for b in data:
+        h = ((h ^ b) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+def _reply_failed(raw, binary=False):
+    """
+    True for a timeout or a reply that reports a failure. Under v2 the
+    frame status says so; a v1 reply is judged by its ERR:/EXCEPT: prefix,
+    unless binary=True (the payload may legitimately start with those bytes;
+    the caller checks its length instead).
+    """
+    if raw is None:
+        return True
+    status = getattr(raw, 'status', None)
+    if status is not None:
+        return status != 0
+    return not binary and raw.startswith((b'ERR:', b'EXCEPT:'))
+
+
+def _reply_error(raw):
+    """Name of the failure a non-OK primitive reply reports."""
+    if raw is None:
+        return 'timeout'
+    if getattr(raw, 'status', None) != 0:
+        for prefix in (b'EXCEPT:', b'ERR:'):
+            if raw.startswith(prefix):
+                return raw[len(prefix):].decode(errors='replace').strip()
+    return raw.decode(errors='replace')
+
+
+def _prepared_cmd(p, args):
+    """SerReplExe line that calls prepared snippet p and sends its result."""
+    call = p.call_expr(args)
+    if p.ret == 'I64':
+        return f'SerGetI64({call});'
+    if p.ret == 'F64':
+        return f'StrPrint(g_str,"%.10f",{call});SerSendStr();'
+    if p.ret == 'U0':
+        return f'{call};SerSendOk();'
+    return f'GStrReset();GStrAdd({call});SerSendStr();'
+
+
+def _prepared_result(p, raw):
+    """Reply to a _prepared_cmd line -> Python value; raises TempleException."""
+    if p.ret == 'I64':
+        return _parse_i64(raw)
+    if p.ret == 'U0':
+        if raw != b'OK':
+            raise TempleException(_reply_error(raw))
+        return None
+    if raw is None:
+        raise TempleException('timeout')
+    s = _parse_str(raw)
+    return float(s) if p.ret == 'F64' else s
+
+
+def _mem_chunk(addr, n, raw, strict):
+    """SerMemRead / AgMemRead reply for n bytes at addr -> the n bytes."""
+    pages = ((addr + n - 1) >> 12) - (addr >> 12) + 1
+    if _reply_failed(raw, binary=True) or len(raw) != n + pages:
+        raise TempleException(_reply_error(raw))
+    if strict and not all(raw[n:]):
+        bad = raw.index(0, n) - n
+        page = ((addr >> 12) + bad) << 12
+        raise TempleException(f'unmapped page 0x{max(addr, page):X}')
+    return raw[:n]
+
+
+def _array_target(name, ctype, n, info):
+    """
+    Where put_array() may store n ctype elements, from the guest's
+    SerArrInfo/AgArrInfo row for `name` (class, pointer stars, is-array,
+    element count, name_cnt state). Returns (mode, has_cnt): mode 'new'
+    (declare the pointer), 'ptr' (replace its buffer) or 'fixed' (copy
+    into the array); has_cnt says whether an I64 name_cnt exists.
+    Raises TempleException if `name` is none of these.
+    """
+    if info == 'none':
+        return 'new', False
+    try:
+        cls, stars, is_array, count, cnt = info.split('\t')
+        stars, is_array, count, cnt = int(stars), int(is_array), int(count), int(cnt)
+    except ValueError:
+        raise TempleException(f'{name}: bad SerArrInfo reply {info!r}')
+    if cnt == 2:
+        raise TempleException(f'{name}_cnt is not an I64')
+    if stars == 1 and not is_array:
+        if cls != ctype:
+            raise TempleException(f'{name} is {cls} *, not {ctype} *')
+        return 'ptr', bool(cnt)
+    if stars == 0 and is_array and cls == ctype:
+        if n > count:
+            raise TempleException(f'{name} holds {count} elements, not {n}')
+        return 'fixed', bool(cnt)
+    kind = cls + ' ' + '*' * stars if stars else cls
+    if is_array:
+        kind += ' array'
+    raise TempleException(f'{name} is {kind}, not an {ctype} pointer or array')
+
+
+def _array_bytes(data):
+    """put_array() data -> (HolyC element type, little-endian bytes)."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return 'U8', bytes(data)
+    if isinstance(data, array.array):
+        for ctype, (_, code, _) in ARRAY_TYPES.items():
+            if data.typecode == code:
+                if sys.byteorder == 'big':
+                    data = array.array(code, data)
+                    data.byteswap()
+                return ctype, data.tobytes()
+        raise TypeError(f"array.array('{data.typecode}') is not q, d or B")
+    if np is not None and isinstance(data, np.ndarray):
+        for ctype, (dtype, _, _) in ARRAY_TYPES.items():
+            if (data.dtype.kind, data.dtype.itemsize) == \
+                    (np.dtype(dtype).kind, np.dtype(dtype).itemsize):
+                return ctype, np.ascontiguousarray(data, dtype).tobytes()
+        raise TypeError(f'dtype {data.dtype} is not int64, float64 or uint8')
+    raise TypeError(f'cannot send {type(data).__name__} as a guest array')
+
+
+def _array_from(ctype, raw):
+    """Little-endian bytes -> NumPy array (array.array without NumPy)."""
+    dtype, code, _ = ARRAY_TYPES[ctype]
+    if np is not None:
+        return np.frombuffer(raw, dtype)
+    a = array.array(code, raw)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a
+
+
+def _parse_rows(text):
+    """TSV text -> list of field lists."""
+    return [line.split('\t') for line in text.splitlines() if line]
+
+
+def _parse_ints(kv):
+    """Convert dict values to int where they parse."""
+    result = {}
+    for k, v in kv.items():
+        try:
+            result[k] = int(v)
+        except ValueError:
+            result[k] = v
+    return result
+
+
 def _qmon(cmd):
     """Send command to QEMU monitor."""
     with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
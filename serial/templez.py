@@ -0,0 +1,252 @@
+"""
+templez.py — TempleOS compressed-buffer (.Z) format, host side
+
+A port of Kernel/Compress.HC. A CArcCompress buffer is:
+    I64 compressed_size   total bytes including this 17-byte header
+    I64 expanded_size
+    U8  compression_type  CT_NONE, CT_7_BIT or CT_8_BIT
+    body                  LZW codes, packed LSB-first (BFieldExtU32)
+
+Codes start at min_bits+1 bits and grow to ARC_BITS_MAX. Once the table is
+full, entries are recycled: ArcEntryGet() takes the next entry with no
+children and unlinks it from its parent's hash chain. The decoder repeats
+that bookkeeping step for step, so it accepts exactly what ExpandBuf does.
+
+Usage:
+    from templez import compress, expand
+    data = expand(open('Bible.TXT.Z', 'rb').read())
+    arc = compress(data)        # byte-identical to CompressBuf(data)
+"""
+
+import struct
+
+CT_NONE = 1
+CT_7_BIT = 2
+CT_8_BIT = 3
+
+ARC_BITS_MAX = 12
+HEADER = struct.Struct('<qqB')      # sizeof(CArcCompress) == 17
+
+
+def header(arc):
+    """Return (compressed_size, expanded_size, compression_type)."""
+    if len(arc) < HEADER.size:
+        raise ValueError('truncated CArcCompress header')
+    return HEADER.unpack_from(arc)
+
+
+def expand(arc) -> bytes:
+    """Equivalent of ExpandBuf(): CArcCompress buffer -> original bytes."""
+    compressed_size, expanded_size, ctype = header(arc)
+    if ctype == CT_NONE:
+        body = bytes(arc[HEADER.size:HEADER.size + expanded_size])
+        if len(body) != expanded_size:
+            raise ValueError('truncated CT_NONE body')
+        return body
+    if ctype not in (CT_7_BIT, CT_8_BIT):
+        raise ValueError(f'bad compression_type {ctype}')
+    if compressed_size > len(arc):
+        raise ValueError(f'truncated: {len(arc)} of {compressed_size} bytes')
+
+    # Pad so a 3-byte read at any code position stays in bounds
+    src = bytes(arc[:compressed_size]) + b'\0\0\0'
+    src_pos = HEADER.size << 3
+    src_size = compressed_size << 3
+
+    min_bits = 7 if ctype == CT_7_BIT else 8
+    min_entry = 1 << min_bits
+    n = 1 << ARC_BITS_MAX
+    base = [0] * n          # CArcEntry.basecode
+    nxt = [-1] * n          # CArcEntry.next (-1 = NULL)
+    head = [-1] * n         # hash[] chain heads
+    # Decoded string of every live code, so each code costs one lookup
+    # instead of walking the basecode chain
+    strs = [bytes((i,)) for i in range(min_entry)] + [b''] * (n - min_entry)
+
+    # ArcCtrlNew(): the first ArcEntryGet() leaves cur_entry NULL
+    free_idx = min_entry + 1
+    next_bits = min_bits + 1
+    free_limit = 1 << next_bits
+    cur_entry = -1
+    next_entry = min_entry
+
+    if not expanded_size:
+        return b''
+    out = bytearray()
+
+    # First code is emitted as-is
+    lastcode = (int.from_bytes(src[src_pos >> 3:(src_pos >> 3) + 3], 'little')
+                >> (src_pos & 7)) & ((1 << next_bits) - 1)
+    src_pos += next_bits
+    out.append(lastcode & 0xFF)
+    entry_used = True
+    last_ch = lastcode
+
+    while True:
+        # ArcEntryGet()
+        if entry_used:
+            entry_used = False
+            i = free_idx
+            cur_entry = next_entry
+            if next_bits < ARC_BITS_MAX:
+                next_entry = i
+                i += 1
+                if i == free_limit:
+                    next_bits += 1
+                    free_limit = 1 << next_bits
+            else:
+                while True:
+                    i += 1
+                    if i == free_limit:
+                        i = min_entry
+                    if head[i] < 0:
+                        break
+                next_entry = i
+                b = base[i]
+                if head[b] == i:
+                    head[b] = nxt[i]
+                else:
+                    p = head[b]
+                    while p >= 0:
+                        if nxt[p] == i:
+                            nxt[p] = nxt[i]
+                            break
+                        p = nxt[p]
+            free_idx = i
+
+        if len(out) >= expanded_size or src_pos + next_bits > src_size:
+            break
+        basecode = (int.from_bytes(src[src_pos >> 3:(src_pos >> 3) + 3], 'little')
+                    >> (src_pos & 7)) & ((1 << next_bits) - 1)
+        src_pos += next_bits
+
+        if basecode == cur_entry:
+            # Code defined by this very step (KwKwK)
+            s = strs[lastcode] + bytes((last_ch,))
+        else:
+            s = strs[basecode]
+            if not s:
+                raise ValueError(f'undefined code {basecode}')
+        last_ch = s[0]
+        out += s
+
+        entry_used = True
+        tmp = cur_entry
+        base[tmp] = lastcode
+        nxt[tmp] = head[lastcode]
+        head[lastcode] = tmp
+        strs[tmp] = strs[lastcode] + bytes((last_ch,))
+        lastcode = basecode
+
+    if len(out) < expanded_size:
+        raise ValueError(f'short body: {len(out)} of {expanded_size} bytes')
+    del out[expanded_size:]
+    return bytes(out)
+
+
+def compress(data) -> bytes:
+    """Equivalent of CompressBuf(): bytes -> CArcCompress buffer.
+    Falls back to CT_NONE when LZW would not be smaller, as CompressBuf does.
+    """
+    data = bytes(data)
+    size = len(data)
+    ctype = CT_8_BIT if size and max(data) & 0x80 else CT_7_BIT
+    body = _lzw(data, ctype) if size else None
+    if body is None:
+        return HEADER.pack(size + HEADER.size, size, CT_NONE) + data
+    return HEADER.pack(HEADER.size + len(body), size, ctype) + body
+
+
+def _lzw(data, ctype):
+    """ArcCompressBuf() + ArcFinishCompression(). Returns the body, or None
+    if it would not fit in the input size (CompressBuf's CT_NONE case).
+    """
+    size = len(data)
+    dst_size = (size + HEADER.size) << 3
+    dst_pos = HEADER.size << 3
+
+    min_bits = 7 if ctype == CT_7_BIT else 8
+    min_entry = 1 << min_bits
+    n = 1 << ARC_BITS_MAX
+    base = [0] * n
+    ch = [0] * n
+    linked = [False] * n    # entry is on its parent's hash[] chain
+    children = [0] * n      # length of each hash[] chain
+    table = {}              # (basecode << 8 | ch) -> entry; a hash[] chain lookup
+
+    # ArcCtrlNew()
+    free_idx = min_entry + 1
+    next_bits = cur_bits = min_bits + 1
+    free_limit = 1 << next_bits
+    next_entry = min_entry
+    cur_entry = -1
+    entry_used = True
+
+    out = bytearray()
+    acc = nacc = 0          # bits not yet flushed to out (OR semantics)
+
+    basecode = data[0]
+    p = 1
+    while p < size and dst_pos + cur_bits <= dst_size:
+        # ArcEntryGet()
+        if entry_used:
+            entry_used = False
+            i = free_idx
+            cur_entry = next_entry
+            cur_bits = next_bits
+            if next_bits < ARC_BITS_MAX:
+                next_entry = i
+                i += 1
+                if i == free_limit:
+                    next_bits += 1
+                    free_limit = 1 << next_bits
+            else:
+                while True:
+                    i += 1
+                    if i == free_limit:
+                        i = min_entry
+                    if not children[i]:
+                        break
+                next_entry = i
+                if linked[i]:
+                    linked[i] = False
+                    children[base[i]] -= 1
+                    del table[base[i] << 8 | ch[i]]
+            free_idx = i
+
+        # Extend the match as far as the table goes
+        while p < size:
+            c = data[p]
+            p += 1
+            code = table.get(basecode << 8 | c)
+            if code is None:
+                break
+            basecode = code
+        else:
+            break
+
+        acc |= basecode << nacc
+        nacc += cur_bits
+        while nacc >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            nacc -= 8
+        dst_pos += cur_bits
+
+        entry_used = True
+        tmp = cur_entry
+        base[tmp] = basecode
+        ch[tmp] = c
+        linked[tmp] = True
+        children[basecode] += 1
+        table[basecode << 8 | c] = tmp
+        basecode = c
+
+    # ArcFinishCompression()
+    if p != size or dst_pos + cur_bits > dst_size:
+        return None
+    acc |= basecode << nacc
+    dst_pos += next_bits
+    out += acc.to_bytes(8, 'little')
+    nbytes = ((dst_pos + 7) >> 3) - HEADER.size
+    return bytes(out[:nbytes])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Multi-file archive tests: archive.pack/unpack (SerUnpack upload format),
+pack_stream/iter_stream (SerPack download stream) including every truncated
+prefix, SerPackFile command lines, and read_files() leaving out a file
+whose CRC never matches (no VM needed).
+
+    python3 serial/test_archive.py
+"""
+
+import sys, os, tempfile, zlib
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import archive
+from temple import Temple, TempleException, MAX_CMD_LEN, _pack_cmds
+
+FILES = {
+    'C:/AI/a.HC': b'U0 A(){}\n',
+    'C:/AI/empty.TXT': b'',
+    'C:/AI/tests/Bin.BIN': bytes(range(256)) * 3,
+    'C:/Home/Deep/Dir/x.HC.Z': b'\0\0\0\0not really compressed',
+}
+
+def raises(fn, *args):
+    """Name of the exception fn(*args) raises, or None."""
+    try:
+        r = fn(*args)
+        if hasattr(r, '__next__'):
+            list(r)
+    except Exception as e:
+        return type(e).__name__
+    return None
+
+
+def test_pack_unpack():
+    arc = archive.pack(FILES)
+    check("round trip", archive.unpack(arc), FILES)
+    check("empty archive", archive.unpack(archive.pack({})), {})
+    bad = [k for k in range(len(arc)) if raises(archive.unpack, arc[:k]) != 'ValueError']
+    check("every truncated prefix raises ValueError", bad, [])
+    check("trailing bytes raise", raises(archive.unpack, arc + b'x'), 'ValueError')
+
+
+def test_batches():
+    files = {f'C:/AI/{i}': bytes(n) for i, n in enumerate([10, 10, 30, 5, 1, 50])}
+    got = [list(b) for b in archive.batches(files, 25)]
+    check("batches split at the limit", got,
+          [['C:/AI/0', 'C:/AI/1'], ['C:/AI/2'], ['C:/AI/3', 'C:/AI/4'], ['C:/AI/5']])
+    check("batches keep every file", {p: d for b in archive.batches(files, 25)
+                                      for p, d in b.items()}, files)
+
+
+def test_stream():
+    raw = archive.pack_stream(FILES)
+    got = list(archive.iter_stream(raw))
+    check("stream round trip", {p: d for p, d, _ in got}, FILES)
+    check("stream CRCs", all(zlib.crc32(d) == c for _, d, c in got), True)
+    check("empty stream", list(archive.iter_stream(b'')), [])
+    # A cut exactly between entries is a shorter, valid stream
+    ends, off = {0}, 0
+    for p, d in FILES.items():
+        off += archive.STREAM_HDR.size + len(p) + 1 + len(d)
+        ends.add(off)
+    bad = [k for k in range(len(raw))
+           if k not in ends and raises(archive.iter_stream, raw[:k]) != 'ValueError']
+    check("every truncated entry raises ValueError", bad, [])
+
+
+def test_pack_cmds():
+    paths = [f'C:/AI/results/Result{i:04d}.TXT' for i in range(200)]
+    paths.append('C:/Home/' + 'L' * 200 + '.HC')
+    cmds = _pack_cmds(paths)
+    check("every line fits MAX_CMD_LEN",
+          [len(c) for c in cmds if len(c) > MAX_CMD_LEN], [])
+    check("every line ends the frame", all(c.endswith('SerSend("");') for c in cmds), True)
+    check("every path once, in order",
+          [seg.split('");')[0] for c in cmds for seg in c.split('SerPackFile("')[1:]],
+          paths)
+    check("no paths, no lines", _pack_cmds([]), [])
+
+
+class FakeTemple(Temple):
+    """read_files() against a canned SerPack stream; read_file never verifies."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+        self.reread = []
+
+    def load_primitive(self, name):
+        pass
+
+    def send_many(self, cmds, window=8, timeout=None):
+        return [self.stream] + [b''] * (len(cmds) - 1)
+
+    def read_file(self, path, timeout=30, *args, verify=False, **kw):
+        self.reread.append(path)
+        raise TempleException('verify')
+
+
+def test_read_files():
+    raw = bytearray(archive.pack_stream(FILES))
+    # Corrupt one body byte of the binary file
+    pos = raw.index(b'Bin.BIN\0') + 8 + 5
+    raw[pos] ^= 0xFF
+    t = FakeTemple(bytes(raw))
+    got = t.read_files(list(FILES))
+    bad = 'C:/AI/tests/Bin.BIN'
+    check("CRC mismatch re-read once", t.reread, [bad])
+    check("failed file left out, others kept", got,
+          {p: d for p, d in FILES.items() if p != bad})
+    with tempfile.TemporaryDirectory() as tmp:
+        got = FakeTemple(bytes(raw)).read_files(list(FILES), dest=tmp)
+        check("dest: failed file not written", sorted(got), sorted(set(FILES) - {bad}))
+        with open(got['C:/AI/a.HC'], 'rb') as f:
+            check("dest: file content", f.read(), FILES['C:/AI/a.HC'])
+
+
+def main():
+    print("=== archive / read_files ===\n")
+    print("[1] pack / unpack")
+    test_pack_unpack()
+    test_batches()
+    print("[2] SerPack stream")
+    test_stream()
+    test_pack_cmds()
+    print("[3] read_files")
+    test_read_files()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
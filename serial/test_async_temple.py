@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+AsyncTemple tests against a fake SerReplExe / QEMU monitor (no VM needed).
+
+A unix-socket server answers each command line with CAFEBABE frames the way
+SerReplExe does (payload + TERM, then OK + TERM), so the client's framing,
+exec_i64's single command line and exception handling are exercised
+end to end. qmon() is run against a monitor that never prompts.
+
+    python3 serial/test_async_temple.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from temple import TERM, TempleException
+from async_temple import AsyncTemple, qmon, QMON_PROMPT
+
+
+async def fake_repl(path, replies, lines):
+    """Serve one connection: answer the i-th line with replies[i], each frame
+    written in single bytes so terminators straddle reads."""
+    async def handle(reader, writer):
+        for payload in replies:
+            line = await reader.readline()
+            if not line:
+                break
+            lines.append(line)
+            for b in payload + TERM + b'OK' + TERM:
+                writer.write(bytes([b]))
+                await writer.drain()
+        writer.close()
+    return await asyncio.start_unix_server(handle, path)
+
+
+async def exec_i64_case(tmp):
+    path = os.path.join(tmp, 'serial.sock')
+    lines = []
+    server = await fake_repl(path, [b'3', b'EXCEPT:Compiler', b'12345'], lines)
+    async with AsyncTemple(path, timeout=5) as t:
+        check("exec_i64 result", await t.exec_i64('1+2'), 3)
+        check("one command line per call", lines, [b'g_r=1+2;SerGetI64(g_r);\n'])
+        try:
+            got = await t.exec_i64('Bad(')
+        except TempleException as e:
+            got = f'raised {e}'
+        check("EXCEPT reply raises", got, 'raised Compiler')
+        check("stream stays in step", await t.send_cmd('x;'), b'12345')
+    server.close()
+    await server.wait_closed()
+
+
+async def recv_timeout_case(tmp):
+    path = os.path.join(tmp, 'quiet.sock')
+    held = []
+
+    async def handle(reader, writer):
+        await reader.readline()
+        writer.write(b'partial')        # no terminator ever follows
+        await writer.drain()
+        held.append(writer)
+    server = await asyncio.start_unix_server(handle, path)
+    async with AsyncTemple(path) as t:
+        check("missing terminator -> None", await t.send_cmd('x;', timeout=0.3), None)
+    for w in held:
+        w.close()
+    server.close()
+    await server.wait_closed()
+
+
+async def qmon_case(tmp):
+    path = os.path.join(tmp, 'qmon.sock')
+    held = []
+
+    async def handle(reader, writer):
+        writer.write(b'QEMU monitor\r\n' + QMON_PROMPT)
+        await writer.drain()
+        cmd = await reader.readline()
+        if cmd.startswith(b'info'):
+            writer.write(cmd + b'VM status: running\r\n' + QMON_PROMPT)
+            await writer.drain()
+        held.append(writer)             # savevm: open, but never prompts again
+    server = await asyncio.start_unix_server(handle, path)
+    check("qmon output without echo and prompt",
+          await qmon('info status', sock_path=path, timeout=2),
+          'VM status: running\n')
+    try:
+        got = await qmon('savevm snap1', sock_path=path, timeout=0.3)
+    except asyncio.TimeoutError:
+        got = 'timeout'
+    check("qmon without a prompt times out", got, 'timeout')
+    for w in held:
+        w.close()
+    server.close()
+    await server.wait_closed()
+
+
+def in_tmp(case):
+    """Run coroutine function case(tmp) in a fresh event loop and directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(case(tmp))
+
+
+def test_exec_i64():
+    in_tmp(exec_i64_case)
+
+
+def test_recv_timeout():
+    in_tmp(recv_timeout_case)
+
+
+def test_qmon():
+    in_tmp(qmon_case)
+
+
+def main():
+    print("=== AsyncTemple ===\n")
+    print("[1] exec_i64")
+    test_exec_i64()
+    print("[2] timeouts")
+    test_recv_timeout()
+    test_qmon()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+delta.py tests (no VM needed): weak_sums against weak_sum at every offset,
+and make_ops -> apply_ops (the host port of SerPatch) round trips for
+insertions, deletions, shifted and reordered blocks, a short final block
+and files under DELTA_BLOCK. Block sums come from local_sums(), the
+host-side SerBlockSums.
+
+    python3 serial/test_delta.py
+"""
+
+import sys, os, struct
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import templez
+from delta import (DELTA_BLOCK, weak_sum, weak_sums, local_sums, make_ops,
+                   apply_ops)
+
+BS = DELTA_BLOCK
+
+def noise(n, seed=1):
+    """n deterministic pseudo-random bytes (an LCG)."""
+    out = bytearray(n)
+    for i in range(n):
+        seed = (seed * 6364136223846793005 + 1442695040888963407) & (2**64 - 1)
+        out[i] = seed >> 56
+    return bytes(out)
+
+
+def ops_summary(ops):
+    """(copies, literal bytes) in an op stream."""
+    copies = lit = p = 0
+    while p < len(ops):
+        n, = struct.unpack_from('<I', ops, p + 1)
+        if ops[p:p + 1] == b'C':
+            copies += 1
+            p += 5
+        else:
+            lit += n
+            p += 5 + n
+    return copies, lit
+
+
+def delta(label, old, new, copies=None, literal=None):
+    """Encode new against old's sums, apply, compare; check the op mix."""
+    ops = make_ops(local_sums(old, BS), len(old), new, BS)
+    check(f"{label}: round trip", apply_ops(old, ops, len(new), BS), new)
+    got = ops_summary(ops)
+    if copies is not None:
+        check(f"{label}: block copies", got[0], copies)
+    if literal is not None:
+        check(f"{label}: literal bytes", got[1], literal)
+    return ops
+
+
+def test_weak_sums():
+    data = noise(3 * BS + 77)
+    check("weak_sums == weak_sum at every offset", weak_sums(data, BS),
+          [weak_sum(data[k:k + BS]) for k in range(len(data) - BS + 1)])
+    check("weak_sums of data shorter than a block", weak_sums(data[:BS - 1], BS), [])
+    check("weak_sums of exactly one block", weak_sums(data[:BS], BS),
+          [weak_sum(data[:BS])])
+    check("weak_sum packs b<<16|a", weak_sum(b'\x01\x02'), (1 * 2 + 2 * 1) << 16 | 3)
+
+
+def test_round_trips():
+    old = noise(8 * BS)
+    delta("unchanged", old, old, copies=8, literal=0)
+    delta("insertion", old, old[:3 * BS] + b'INSERTED' + old[3 * BS:],
+          copies=8, literal=8)
+    delta("deletion", old, old[:2 * BS] + old[2 * BS + 100:],
+          copies=7, literal=BS - 100)
+    delta("shifted by 1", old, b'x' + old, copies=8, literal=1)
+    delta("blocks reordered", old, old[5 * BS:] + old[:5 * BS], copies=8, literal=0)
+    delta("block repeated", old, old + old[:BS], copies=9, literal=0)
+    delta("appended short tail", old, old + b'tail', copies=8, literal=4)
+    # make_ops indexes full blocks only, so a short final block is a literal
+    short = noise(3 * BS + 300, seed=2)
+    delta("short final block kept", short, short, copies=3, literal=300)
+    delta("short final block edited", short, short[:-1] + b'!', copies=3, literal=300)
+    delta("new file under DELTA_BLOCK", old, b'tiny', copies=0, literal=4)
+    delta("old file under DELTA_BLOCK", b'tiny', old, copies=0, literal=len(old))
+    delta("empty new file", old, b'', copies=0, literal=0)
+    delta("empty old file", b'', old[:BS + 5], copies=0, literal=BS + 5)
+
+
+def test_apply_errors():
+    old = noise(2 * BS)
+    bad = []
+    for ops, n in ((b'C' + struct.pack('<I', 9), BS),     # no such block
+                   (b'L' + struct.pack('<I', 10) + b'abc', 10),
+                   (b'Q' + struct.pack('<I', 0), 0),
+                   (b'C\x00\x00', BS),
+                   (b'L' + struct.pack('<I', 3) + b'abc', 2)):
+        try:
+            apply_ops(old, ops, n, BS)
+            bad.append(ops)
+        except ValueError:
+            pass
+    check("malformed ops raise ValueError", bad, [])
+
+
+def test_push_choice():
+    # push() sends ops only when they beat the compressed upload
+    old = noise(8 * BS)
+    new = old[:4 * BS] + b'changed' + old[4 * BS:]
+    ops = make_ops(local_sums(old, BS), len(old), new, BS)
+    check("small edit: ops beat the compressed file",
+          len(ops) < len(templez.compress(new)), True)
+    text = b'U0 Main(){"hello";}\n' * 600
+    ops = make_ops(local_sums(b'', BS), 0, text, BS)
+    check("new text file: compressed file beats ops",
+          len(templez.compress(text)) < len(ops), True)
+
+
+def main():
+    print("=== delta ===\n")
+    print("[1] weak sums")
+    test_weak_sums()
+    print("[2] make_ops / apply_ops")
+    test_round_trips()
+    test_apply_errors()
+    test_push_choice()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+FrameReader tests over a socketpair (no VM needed).
+
+Covers the CAFEBABE framer (terminators split across recv() boundaries,
+several frames in one recv, pop_partial streaming) and the v2 parser
+(headers split at every byte, pop_partial2 streaming, resync on garbage),
+plus Temple's v2 reply handling: V2_PART frames joined, status kept.
+
+    python3 serial/test_framing.py
+"""
+
+import sys, os, socket
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from temple import (Temple, TempleException, FrameReader, TERM, V2_HDR, V2_MAGIC,
+                    V2_MORE, V2_PART, _reply_failed, _reply_error)
+
+
+def pair():
+    a, b = socket.socketpair()
+    return a, b, FrameReader(b)
+
+
+def fill(rx, n):
+    """recv() until at least n bytes are buffered."""
+    while len(rx) < n:
+        rx.recv()
+
+
+def frame2(rid, payload, status=0, flags=0):
+    return V2_HDR.pack(V2_MAGIC, rid, status, flags, len(payload)) + payload
+
+
+def test_split_term():
+    """Every split point of the 8-byte terminator, one recv() per part."""
+    bad = []
+    for k in range(len(TERM)):
+        a, b, rx = pair()
+        a.sendall(b'payload' + TERM[:k])
+        rx.recv()
+        early = rx.pop_frame()
+        a.sendall(TERM[k:] + b'next')
+        got = rx.recv_frame(2)
+        if early is not None or got != b'payload' or len(rx) != 4:
+            bad.append(k)
+        a.close(); b.close()
+    check("TERM split at every offset", bad, [])
+
+
+def test_two_frames_one_recv():
+    a, b, rx = pair()
+    a.sendall(b'DATA' + TERM + b'OK' + TERM)
+    check("first frame", rx.recv_frame(2), b'DATA')
+    a.close()       # the OK must already be buffered, not read again
+    check("OK frame from the same recv", rx.recv_frame(1), b'OK')
+    check("then nothing", rx.recv_frame(0.2), None)
+    b.close()
+
+
+def test_pop_partial():
+    a, b, rx = pair()
+    a.sendall(b'abcdef' + TERM[:5])
+    rx.recv()
+    data, done = rx.pop_partial()
+    # the last len(TERM)-1 bytes may begin a terminator, so they wait
+    check("partial holds back a possible TERM prefix", (data, done),
+          (b'abcd', False))
+    a.sendall(TERM[5:] + b'xyz' + TERM)
+    fill(rx, 2 + len(TERM) + 3 + len(TERM))
+    check("rest of the split frame", rx.pop_partial(), (b'ef', True))
+    check("next frame", rx.pop_partial(), (b'xyz', True))
+    a.close(); b.close()
+
+
+def test_v2_split_header():
+    """pop_frame2 returns None until the header and payload are complete."""
+    raw = frame2(7, b'hello', status=1)
+    bad = []
+    for k in range(1, len(raw)):
+        a, b, rx = pair()
+        a.sendall(raw[:k])
+        rx.recv()
+        if rx.pop_frame2() is not None:
+            bad.append(k)
+        a.sendall(raw[k:])
+        if rx.recv_frame2(2) != (7, 1, 0, b'hello'):
+            bad.append(k)
+        a.close(); b.close()
+    check("v2 frame split at every offset", bad, [])
+
+
+def test_v2_partial():
+    a, b, rx = pair()
+    raw = frame2(3, b'0123456789', flags=V2_MORE) + frame2(3, b'end')
+    a.sendall(raw[:V2_HDR.size - 2])
+    rx.recv()
+    check("partial header -> nothing", rx.pop_partial2(), (None, b'', False))
+    a.sendall(raw[V2_HDR.size - 2:V2_HDR.size + 4])
+    fill(rx, V2_HDR.size + 4)
+    check("first payload bytes", rx.pop_partial2(), ((3, 0, V2_MORE), b'0123', False))
+    check("no more yet", rx.pop_partial2(), ((3, 0, V2_MORE), b'', False))
+    a.sendall(raw[V2_HDR.size + 4:])
+    fill(rx, len(raw) - V2_HDR.size - 4)
+    check("rest of the MORE frame", rx.pop_partial2(),
+          ((3, 0, V2_MORE), b'456789', True))
+    check("pop_frame2 takes the final frame", rx.pop_frame2(), (3, 0, 0, b'end'))
+    a.close(); b.close()
+
+
+def test_v2_mixed():
+    """pop_frame2 finishes a frame pop_partial2 started; junk is skipped."""
+    a, b, rx = pair()
+    raw = frame2(9, b'abcdef')
+    a.sendall(b'junk\xca' + raw[:V2_HDR.size + 2])
+    fill(rx, 5 + V2_HDR.size + 2)
+    check("junk skipped", rx.pop_partial2(), ((9, 0, 0), b'ab', False))
+    a.sendall(raw[V2_HDR.size + 2:])
+    check("pop_frame2 completes it", rx.recv_frame2(2), (9, 0, 0, b'cdef'))
+    a.close(); b.close()
+
+
+def v2_temple(*rids):
+    """A Temple on one end of a socketpair, speaking v2 with rids pending."""
+    a, b = socket.socketpair()
+    t = Temple()
+    t.s, t._rx, t.proto = b, FrameReader(b), 2
+    t._pending.extend(rids)
+    return a, t
+
+
+def test_v2_parts():
+    a, t = v2_temple(4)
+    part = V2_MORE | V2_PART
+    a.sendall(frame2(4, b'A' * 4096, flags=part) + frame2(4, b'B' * 4096, flags=part)
+              + frame2(4, b'tail'))
+    raw = t._recv_until_term(2)
+    check("V2_PART frames joined", raw, b'A' * 4096 + b'B' * 4096 + b'tail')
+    check("status ok", (raw.status, _reply_failed(raw, binary=True)), (0, False))
+    check("request finished", list(t._pending), [])
+    a.close(); t.close()
+
+
+def test_v2_status():
+    a, t = v2_temple(5, 6, 7)
+    a.sendall(frame2(5, b'ERR:data') + frame2(6, b'ERR:open', status=1)
+              + frame2(7, b'x' * 10, flags=V2_MORE | V2_PART)
+              + frame2(7, b'EXCEPT:Compiler', status=2))
+    raw = t._recv_until_term(2)
+    check("binary ERR: payload with status 0 is data",
+          (raw, _reply_failed(raw)), (b'ERR:data', False))
+    raw = t._recv_until_term(2)
+    check("status 1 is a failure", (_reply_failed(raw), _reply_error(raw)),
+          (True, 'open'))
+    raw = t._recv_until_term(2)
+    check("exception reply is the final frame's message",
+          (raw, raw.status, _reply_error(raw)), (b'EXCEPT:Compiler', 2, 'Compiler'))
+    a.close(); t.close()
+
+
+def test_v2_pop_partial():
+    a, t = v2_temple(8, 9)
+    a.sendall(frame2(8, b'abc', flags=V2_MORE | V2_PART) + frame2(8, b'def')
+              + frame2(9, b'ERR:', flags=V2_MORE | V2_PART, status=1)
+              + frame2(9, b'open', status=1))
+    fill(t._rx, 4 * V2_HDR.size + 14)
+    check("PART frame does not end the read", t._pop_partial(), (b'abc', False))
+    check("final frame does", t._pop_partial(), (b'def', True))
+    try:
+        got = t._pop_partial()
+        got = got if got[1] else t._pop_partial()
+    except TempleException as e:
+        got = str(e)
+    check("error reply raises instead of yielding data", got, 'open')
+    a.close(); t.close()
+
+
+def main():
+    print("=== FrameReader ===\n")
+    print("[1] CAFEBABE")
+    test_split_term()
+    test_two_frames_one_recv()
+    test_pop_partial()
+    print("[2] v2")
+    test_v2_split_header()
+    test_v2_partial()
+    test_v2_mixed()
+    print("[3] Temple v2 replies")
+    test_v2_parts()
+    test_v2_status()
+    test_v2_pop_partial()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
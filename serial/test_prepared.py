@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Prepared snippet tests (no VM needed): parameter parsing, stable names,
+the HolyC source generated for expressions and bodies, literal marshalling,
+and Temple.prepare() defining a snippet once and calling it by name against
+a fake send_cmd.
+
+    python3 serial/test_prepared.py
+"""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from prepared import Prepared, parse_params, function_name, function_source, literal
+from temple import Temple, TempleException
+
+
+def test_params():
+    check("string params", parse_params('I64 a, U8 *s'), ['I64 a', 'U8 *s'])
+    check("list params, bare name is I64", parse_params(['F64 x', 'n', ' ']),
+          ['F64 x', 'I64 n'])
+    check("no params", (parse_params(''), parse_params(None), parse_params(())),
+          ([], [], []))
+    a = function_name('a*b', ['I64 a', 'I64 b'], 'I64')
+    check("name is stable", (a, len(a), a[:2]),
+          (function_name('a*b', ['I64 a', 'I64 b'], 'I64'), 10, '_P'))
+    check("name depends on body, params and ret",
+          len({a, function_name('a+b', ['I64 a', 'I64 b'], 'I64'),
+               function_name('a*b', ['I64 a', 'F64 b'], 'I64'),
+               function_name('a*b', ['I64 a', 'I64 b'], 'F64')}), 4)
+
+
+def test_source():
+    src = lambda code, ret='I64', decls=('I64 x',): \
+        function_source('_P', code, list(decls), ret)
+    check("expression", src('x*x'), 'I64 _P(I64 x){return (x*x);}')
+    check("expression ending in ;", src('x*x;'), 'I64 _P(I64 x){return (x*x);}')
+    check("expression ending in ; and space", src(' x*x ; ;\n'),
+          'I64 _P(I64 x){return (x*x);}')
+    check("body with return", src('I64 y=x+1;return y*y;'),
+          'I64 _P(I64 x){I64 y=x+1;return y*y;}')
+    check("body with return, no final ;", src('return x'),
+          'I64 _P(I64 x){return x;}')
+    check("U0 body", src('"%d\\n",x', ret='U0'), 'U0 _P(I64 x){"%d\\n",x;}')
+    check("U0 block body", src('if (x) Beep;', ret='U0'), 'U0 _P(I64 x){if (x) Beep;}')
+    check("pointer ret", src('"hi"', ret='U8 *', decls=()), 'U8 *_P(){return ("hi");}')
+
+
+def test_literal():
+    check("ints and bools", [literal(v) for v in (0, -5, 1 << 40, True, False)],
+          ['0', '-5', '1099511627776', '1', '0'])
+    check("floats", [literal(v) for v in (1.0, 0.5, -2.0, 1e20, 1.5e-07)],
+          ['1.0', '0.5', '-2.0', '1e20', '1.5e-07'])
+    check("strings", [literal(v) for v in ('abc', 'a"b\\c', 'x\ny', b'\x00\xff', '')],
+          ['"abc"', '"a\\"b\\\\c"', '"x\\ny"', '"\\x00\\xFF"', '""'])
+    for bad, exc in ((float('inf'), ValueError), (float('nan'), ValueError),
+                     (None, TypeError), ([1], TypeError)):
+        try:
+            literal(bad)
+            got = None
+        except (ValueError, TypeError) as e:
+            got = type(e)
+        check(f"{bad!r} rejected", got, exc)
+
+
+def test_call_expr():
+    p = Prepared(None, 'a*b', 'I64 a,U8 *s')
+    check("call expression", p.call_expr((3, 'hi')), f'{p.name}(3,"hi")')
+    try:
+        p.call_expr((1,))
+        got = None
+    except TypeError as e:
+        got = str(e)
+    check("wrong arity", got, f'{p.name} takes 2 argument(s), got 1')
+    try:
+        Prepared(None, 'x', 'I64 x', ret='I32')
+        got = None
+    except ValueError as e:
+        got = str(e)
+    check("unsupported ret", got, "unsupported return type 'I32'")
+
+
+class FakeTemple(Temple):
+    """Answers the commands prepare() and calls send; logs each one."""
+
+    def __init__(self, defined=()):
+        super().__init__()
+        self.defined = set(defined)
+        self.cmds = []
+
+    def send_cmd(self, cmd, timeout=None):
+        self.cmds.append(cmd)
+        if cmd.startswith('GStrReset();SerSymExists("'):
+            return b'1' if cmd.split('"')[1] in self.defined else b'0'
+        if cmd.startswith(('I64 _P', 'U0 _P')):
+            self.defined.add(cmd.split('(')[0].split()[1])
+            return b'OK'
+        if cmd.startswith('SerGetI64(_P'):
+            x = int(cmd.split('(')[2].rstrip(');'))
+            return b'%d' % (x * x)
+        if cmd.startswith('_P'):
+            return b'OK'
+        return b'ERR:unexpected'
+
+    def send_many(self, cmds, window=8, timeout=None):
+        return [self.send_cmd(c) for c in cmds]
+
+
+def test_prepare():
+    t = FakeTemple()
+    sq = t.prepare('x*x;', 'I64 x')
+    check("defined once", [c for c in t.cmds if c.startswith('I64 ')],
+          [f'I64 {sq.name}(I64 x){{return (x*x);}}SerSendOk();'])
+    check("call", (sq(7), t.cmds[-1]), (49, f'SerGetI64({sq.name}(7));'))
+    check("map", sq.map([(1,), (2,), (3,)]), [1, 4, 9])
+    n = len(t.cmds)
+    check("prepared again: cached, nothing sent",
+          (t.prepare('x*x;', 'I64 x') is sq, len(t.cmds)), (True, n))
+
+    t2 = FakeTemple(defined=[sq.name])
+    t2.prepare('x*x;', 'I64 x')
+    check("already on the guest: not redefined",
+          [c for c in t2.cmds if not c.startswith('GStrReset')], [])
+    beep = t2.prepare('Beep(x)', 'x', ret='U0')
+    check("U0 call", (beep(1), t2.cmds[-1]), (None, f'{beep.name}(1);SerSendOk();'))
+
+    t3 = FakeTemple()
+    t3.send_cmd = lambda cmd, timeout=None: (b'0' if 'SerSymExists' in cmd
+                                             else b'ERR:compile')
+    try:
+        t3.prepare('x*', 'I64 x')
+        got = None
+    except TempleException as e:
+        got = str(e)
+    check("compile error raises", got, 'compile')
+
+
+def main():
+    print("=== prepared snippets ===\n")
+    print("[1] params and names")
+    test_params()
+    print("[2] generated source")
+    test_source()
+    print("[3] literals")
+    test_literal()
+    print("[4] call expressions")
+    test_call_expr()
+    print("[5] Temple.prepare")
+    test_prepare()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Ranged read tests against an in-memory guest (no VM needed):
+read_file_to(window=) resuming a .part file only while the guest's first
+bytes still match it, ranged reads of a missing file raising instead of
+returning b'', and sync_mirror.fetch_banned expanding a banned .Z file
+into the mirror.
+
+    python3 serial/test_ranged_read.py
+"""
+
+import sys, os, tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import templez
+from temple import Temple, TempleException, Reply, content_hash
+from sync_mirror import fetch_banned
+
+
+class FakeTemple(Temple):
+    """Guest files as stored bytes; reads (offset, length) are logged."""
+
+    def __init__(self, files):
+        super().__init__()
+        self.files = files
+        self.reads = []
+
+    def file_size(self, path):
+        return len(self.files[path]) if path in self.files else None
+
+    def file_hash(self, path, algo='crc32', offset=None, length=None):
+        data = self.files[path]
+        if offset is not None:
+            data = data[offset:offset + length if length is not None else None]
+        return content_hash(data, algo)
+
+    def _read_range(self, path, offset, length, timeout):
+        self.reads.append((offset, length))
+        return self.files[path][offset:offset + length]
+
+
+DATA = bytes(range(256)) * 40      # 10240 bytes
+
+
+def test_resume():
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, 'f.BIN')
+        with open(dest + '.part', 'wb') as f:
+            f.write(DATA[:4096])
+        t = FakeTemple({'C:/f.BIN': DATA})
+        n = t.read_file_to('C:/f.BIN', dest, window=4096, verify=True)
+        with open(dest, 'rb') as f:
+            got = f.read()
+        check("resume: content", (n, got), (len(DATA), DATA))
+        check("resume: only the rest read", t.reads, [(4096, 4096), (8192, 2048)])
+
+        changed = b'X' + DATA[1:]
+        with open(dest + '.part', 'wb') as f:
+            f.write(DATA[:4096])
+        t = FakeTemple({'C:/f.BIN': changed})
+        t.read_file_to('C:/f.BIN', dest, window=4096, verify=True)
+        with open(dest, 'rb') as f:
+            got = f.read()
+        check("changed guest file: starts over", (t.reads[0], got), ((0, 4096), changed))
+
+
+class ReplyTemple(Temple):
+    """SerFileReadRange replies as the guest sends them for a missing file."""
+
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+
+    def load_primitive(self, name):
+        pass
+
+    def send_cmd(self, cmd, timeout=None):
+        return Reply(b'ERR:open', self.status)
+
+
+def test_missing():
+    for label, status in (('v1', None), ('v2', 1)):
+        t = ReplyTemple(status)
+        got = []
+        for call in (lambda: t.read_file('C:/None.BIN', offset=0, length=16),
+                     lambda: t.read_file('C:/None.BIN', offset=16)):
+            try:
+                got.append(call())
+            except TempleException as e:
+                got.append(str(e))
+        check(f"{label}: missing file raises open", got, ['open', 'open'])
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, 'x.BIN')
+        try:
+            got = ReplyTemple(1).read_file_to('C:/None.BIN', dest, window=4096)
+        except TempleException as e:
+            got = str(e)
+        check("read_file_to: raises, leaves no .part", (got, os.listdir(tmp)),
+              ('open', []))
+    t = ReplyTemple(0)
+    check("v2 status 0: the bytes ERR:open are data",
+          t.read_file('C:/Odd.BIN', offset=0, length=8), b'ERR:open')
+
+
+def test_fetch_banned():
+    text = b'In the beginning God created the heaven and the earth.\n' * 300
+    arc = templez.compress(text)
+    with tempfile.TemporaryDirectory() as tmp:
+        local = os.path.join(tmp, 'Bible.TXT.Z')
+        t = FakeTemple({'C:/Misc/Bible.TXT.Z': arc, 'C:/ACDefs.DATA': DATA})
+        n = fetch_banned(t, 'C:/Misc/Bible.TXT.Z', local)
+        with open(local, 'rb') as f:
+            got = f.read()
+        check(".Z: stored size returned, expanded text written", (n, got), (len(arc), text))
+        check(".Z: no staging files left", sorted(os.listdir(tmp)), ['Bible.TXT.Z'])
+        local = os.path.join(tmp, 'ACDefs.DATA')
+        fetch_banned(t, 'C:/ACDefs.DATA', local)
+        with open(local, 'rb') as f:
+            check("plain file: stored bytes", f.read(), DATA)
+
+
+def main():
+    print("=== ranged reads ===\n")
+    print("[1] read_file_to resume")
+    test_resume()
+    print("[2] missing files")
+    test_missing()
+    print("[3] banned files")
+    test_fetch_banned()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Offline RedSea reader/writer tests against synthetic disk images (no VM needed).
+
+Builds a small partitioned raw image the way RedSeaFmt/RedSeaMkDir/
+RedSeaFileWrite lay it out, wraps it in qcow2 (with a compressed cluster,
+a zero cluster and a savevm-style snapshot), then reads both back. The
+writer is checked on the raw image, on a qcow2 overlay and on an overlay
+with a snapshot, with the allocation bitmap and qcow2 refcounts audited.
+
+    python3 serial/test_redsea.py
+"""
+
+import sys, os, struct, tempfile, zlib
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import templez
+from redsea import RedSea, RedSeaWriter, open_image, create_overlay
+from redsea.image import Qcow2Image
+from redsea.layout import (BLK_SIZE, RS_ATTR_DIR, RS_ATTR_CONTIGUOUS,
+                           RS_ATTR_DELETED, RS_ATTR_COMPRESSED, MBR_PRT,
+                           MBR_PRT_OFFSET, MBR_PT_REDSEA, Boot, DirEntry,
+                           bitmap_sects, pack_boot)
+
+PRT_LBA = 63
+PRT_SECTS = 2048
+DT = (738000 << 32) | (1 << 31)        # some day at noon
+
+# -----------------------------------------------------------------------------
+# Synthetic image
+# -----------------------------------------------------------------------------
+
+class Builder:
+    """Just enough of RedSeaFmt/MkDir/FileWrite to lay out a test drive."""
+
+    def __init__(self):
+        self.disk = bytearray((PRT_LBA + PRT_SECTS) * BLK_SIZE)
+        self.next = PRT_LBA + bitmap_sects(PRT_SECTS) + 1   # after Alloc #1
+
+    def alloc(self, data):
+        blks = max(1, (len(data) + BLK_SIZE - 1) // BLK_SIZE)
+        clus, self.next = self.next, self.next + blks
+        self.disk[clus * BLK_SIZE:clus * BLK_SIZE + len(data)] = data
+        return clus
+
+    def dir(self, name, parent_clus, children, blks=1):
+        """children: DirEntry list; returns the directory's own DirEntry."""
+        size = blks * BLK_SIZE
+        clus = self.alloc(bytes(size))
+        me = DirEntry(RS_ATTR_DIR | RS_ATTR_CONTIGUOUS, name, clus, size, DT)
+        up = DirEntry(RS_ATTR_DIR | RS_ATTR_CONTIGUOUS, '..', parent_clus, 0, DT)
+        recs = b''.join(de.pack() for de in [me, up] + children)
+        self.disk[clus * BLK_SIZE:clus * BLK_SIZE + len(recs)] = recs
+        return me
+
+    def file(self, name, data, attr=0):
+        return DirEntry(attr | RS_ATTR_CONTIGUOUS, name, self.alloc(data),
+                        len(data), DT)
+
+
+HELLO = b'UartPrint("hello\\n");\n'
+TEXT = b''.join(b'I64 x%d=%d;\n' % (i, i * i) for i in range(800))
+BIG = bytes(range(256)) * 300           # spans several qcow2 clusters
+
+
+def build_raw(path, hello=HELLO):
+    b = Builder()
+    # Root first, so its cluster is known before the children point at it
+    root_clus = b.next
+    b.next += 1
+    sub = b.dir('Sub', root_clus, [b.file('Big.BIN', BIG)])
+    home = b.dir('Home', root_clus, [
+        b.file('Hello.HC', hello),
+        b.file('Text.HC.Z', templez.compress(TEXT), RS_ATTR_COMPRESSED),
+        b.file('Gone.HC', b'old', RS_ATTR_DELETED),
+        b.file('Empty.TXT', b''),
+        sub,
+    ])
+    recs = b''.join(de.pack() for de in [
+        DirEntry(RS_ATTR_DIR | RS_ATTR_CONTIGUOUS, '.', root_clus, BLK_SIZE, DT),
+        DirEntry(RS_ATTR_DIR | RS_ATTR_CONTIGUOUS, '..', root_clus, 0, DT),
+        home])
+    b.disk[root_clus * BLK_SIZE:root_clus * BLK_SIZE + len(recs)] = recs
+
+    b.disk[PRT_LBA * BLK_SIZE:(PRT_LBA + 1) * BLK_SIZE] = pack_boot(Boot(
+        MBR_PT_REDSEA, PRT_LBA, PRT_SECTS, root_clus, bitmap_sects(PRT_SECTS), 1))
+    MBR_PRT.pack_into(b.disk, MBR_PRT_OFFSET, 0x80, 0, 0, MBR_PT_REDSEA, 0, 0,
+                      PRT_LBA, PRT_SECTS)
+    b.disk[510:512] = b'\x55\xAA'
+    # Everything allocated so far is in use (Alloc #1 included)
+    for i in range(b.next - (PRT_LBA + bitmap_sects(PRT_SECTS))):
+        b.disk[(PRT_LBA + 1) * BLK_SIZE + (i >> 3)] |= 1 << (i & 7)
+    with open(path, 'wb') as f:
+        f.write(b.disk)
+    return bytes(b.disk)
+
+
+def build_qcow2(path, raw, snapshots=(), cluster_bits=12):
+    """qcow2 v3 of `raw`; snapshots: [(name, older_raw)] as savevm keeps them."""
+    cs = 1 << cluster_bits
+    l2_entries = cs // 8
+    out = bytearray(cs * 2)     # header cluster + snapshot table cluster
+
+    def new_cluster(data=b''):
+        off = len(out)
+        out.extend(data.ljust(cs, b'\0'))
+        return off
+
+    def tables(image):
+        n = (len(image) + cs - 1) // cs
+        l1 = [0] * ((n + l2_entries - 1) // l2_entries)
+        for idx in range(n):
+            chunk = image[idx * cs:(idx + 1) * cs]
+            if not chunk.strip(b'\0'):
+                entry = 1 if idx % 2 else 0         # zero flag / unallocated
+            elif idx % 3 == 0:
+                # Compressed cluster, as qemu-img convert -c writes them
+                c = zlib.compressobj(9, zlib.DEFLATED, -12)
+                z = c.compress(chunk.ljust(cs, b'\0')) + c.flush()
+                off = len(out)
+                out.extend(z)
+                out.extend(bytes(-len(out) % 512))
+                nsect = (off % 512 + len(z) + 511) // 512
+                x = 62 - (cluster_bits - 8)
+                entry = (1 << 62) | ((nsect - 1) << x) | off
+            else:
+                entry = new_cluster(chunk) | (1 << 63)
+            l1i, l2i = divmod(idx, l2_entries)
+            if not l1[l1i]:
+                l1[l1i] = new_cluster()
+            struct.pack_into('>Q', out, l1[l1i] + l2i * 8, entry)
+        l1_off = new_cluster(b''.join(struct.pack('>Q', e | (1 << 63)) for e in l1))
+        return l1_off, len(l1)
+
+    snap_table = bytearray()
+    for i, (name, older) in enumerate(snapshots):
+        l1_off, l1_size = tables(older)
+        sid = str(i + 1).encode()
+        snap_table += struct.pack('>QIHHIIQII', l1_off, l1_size, len(sid),
+                                  len(name), 0, 0, 0, 0, 0) + sid + name.encode()
+        snap_table += bytes(-len(snap_table) % 8)
+    out[cs:cs + len(snap_table)] = snap_table
+    l1_off, l1_size = tables(raw)
+    header = struct.pack('>4sIQIIQIIQQIIQQQQII', b'QFI\xfb', 3, 0, 0,
+                         cluster_bits, len(raw), 0, l1_size, l1_off, 0, 0,
+                         len(snapshots), cs, 0, 0, 0, 4, 104)
+    out[:len(header)] = header
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+# -----------------------------------------------------------------------------
+# Tests
+# -----------------------------------------------------------------------------
+
+def check_fs(fs, hello=HELLO):
+    check("partition LBA", fs.lba, PRT_LBA)
+    check("listdir /", [de.name for de in fs.listdir('/')], ['Home'])
+    check("listdir Home", [de.name for de in fs.listdir('C:/Home')],
+          ['Empty.TXT', 'Hello.HC', 'Sub', 'Text.HC.Z'])
+    walk = fs.walk('C:/')
+    check("walk paths", [e['path'] for e in walk],
+          ['C:/Home', 'C:/Home/Empty.TXT', 'C:/Home/Hello.HC', 'C:/Home/Sub',
+           'C:/Home/Sub/Big.BIN', 'C:/Home/Text.HC.Z'])
+    check("walk is_dir", [e['is_dir'] for e in walk],
+          [True, False, False, True, False, False])
+    check("walk mtime", walk[0]['mtime'], (738000 - 719527) * 86400 + 43200.0)
+    check("read Hello.HC", fs.read_file('C:/Home/Hello.HC'), hello)
+    check("read .Z expanded", fs.read_file('/Home/Text.HC.Z'), TEXT)
+    check("read .Z raw", templez.expand(fs.read_file('/Home/Text.HC.Z', raw=True)),
+          TEXT)
+    check("read empty", fs.read_file('C:/Home/Empty.TXT'), b'')
+    check("read big", fs.read_file('C:/Home/Sub/Big.BIN'), BIG)
+    check("deleted hidden", fs.exists('C:/Home/Gone.HC'), False)
+    for bad in ('C:/Home/Nope.HC', 'D:/Home/Hello.HC'):
+        try:
+            fs.read_file(bad)
+            check(f"missing {bad}", 'no error', 'FileNotFoundError')
+        except FileNotFoundError:
+            check(f"missing {bad}", 'FileNotFoundError', 'FileNotFoundError')
+
+
+def check_bitmap(fs, label):
+    """Every live file/dir is marked in the bitmap and none overlap."""
+    owner = {}
+    clashes = 0
+    todo = [fs.boot.root_clus]
+    extents = [(fs.boot.root_clus, fs.root().blocks)]
+    while todo:
+        clus = todo.pop()
+        for de in fs.dir_records(clus)[1:]:
+            if de.deleted or de.name in ('.', '..') or not de.size:
+                continue
+            extents.append((de.clus, de.blocks))
+            if de.is_dir:
+                todo.append(de.clus)
+    unmarked = 0
+    for clus, n in extents:
+        for c in range(clus, clus + n):
+            clashes += c in owner
+            owner[c] = True
+            i = c - fs.data_area
+            unmarked += not fs._bitmap[i >> 3] >> (i & 7) & 1
+    check(f"{label}: no overlapping extents", clashes, 0)
+    check(f"{label}: extents marked used", unmarked, 0)
+
+
+def qcow2_refcount_errors(path):
+    """Compare every cluster's refcount with the references that exist."""
+    with Qcow2Image(path) as img:
+        m, cs = img._map, img.cluster_size
+        want = {}
+
+        def ref(off, n=1):
+            want[off // cs] = want.get(off // cs, 0) + n
+
+        ref(0)
+        for i in range(img.refcount_table_clusters):
+            ref(img.refcount_table_offset + i * cs)
+        l1s = [(img.l1_offset, img.l1_size)]
+        snaps_off, = struct.unpack_from('>Q', m, 64)
+        if img.snapshots:
+            ref(snaps_off)
+        l1s += [(sn['l1_offset'], sn['l1_size']) for sn in img.snapshots]
+        for l1_off, l1_size in l1s:
+            for c in range(0, max(l1_size * 8, 1), cs):
+                ref(l1_off + c)
+            for i in range(l1_size):
+                l2, = struct.unpack_from('>Q', m, l1_off + i * 8)
+                l2 &= 0x00FFFFFFFFFFFE00
+                if not l2:
+                    continue
+                ref(l2)
+                for j in range(img.l2_entries):
+                    e, = struct.unpack_from('>Q', m, l2 + j * 8)
+                    if e & (1 << 62) == 0 and e & 0x00FFFFFFFFFFFE00:
+                        ref(e & 0x00FFFFFFFFFFFE00)
+        per = cs * 8 >> img.refcount_order
+        errors = 0
+        for i in range(img.refcount_table_clusters * cs // 8):
+            rb, = struct.unpack_from('>Q', m, img.refcount_table_offset + i * 8)
+            if rb:
+                ref(rb)
+        for ci in range((len(m) + cs - 1) // cs):
+            rt_idx, rb_idx = divmod(ci, per)
+            rb, = struct.unpack_from('>Q', m, img.refcount_table_offset + rt_idx * 8)
+            have = struct.unpack_from('>H', m, rb + rb_idx * 2)[0] if rb else 0
+            errors += have != want.get(ci, 0)
+        return errors
+
+
+def fake_savevm(path, name):
+    """What savevm does to the disk: the active L1 is copied into a snapshot
+    and everything it reaches gains a reference (COPIED flags cleared)."""
+    with Qcow2Image(path, writable=True) as img:
+        m, cs = img._map, img.cluster_size
+        snap_l1 = img._alloc_cluster()
+        for i in range(img.l1_size):
+            l1e, = struct.unpack_from('>Q', m, img.l1_offset + i * 8)
+            l2 = l1e & 0x00FFFFFFFFFFFE00
+            if l2:
+                img._add_refcount(l2, 1)
+                for j in range(img.l2_entries):
+                    e, = struct.unpack_from('>Q', m, l2 + j * 8)
+                    if e & 0x00FFFFFFFFFFFE00:
+                        img._add_refcount(e & 0x00FFFFFFFFFFFE00, 1)
+                    struct.pack_into('>Q', m, l2 + j * 8, e & ~(1 << 63))
+            struct.pack_into('>Q', m, img.l1_offset + i * 8, l2)
+            struct.pack_into('>Q', m, snap_l1 + i * 8, l2)
+        table = img._alloc_cluster()
+        entry = struct.pack('>QIHHIIQII', snap_l1, img.l1_size, 1, len(name),
+                            0, 0, 0, 0, 0) + b'1' + name.encode()
+        m[table:table + len(entry)] = entry
+        struct.pack_into('>IQ', m, 60, 1, table)
+
+
+def check_writes(fs, label):
+    fs.write_file('C:/Home/Hello.HC', b'replaced\n')
+    fs.write_file('C:/Home/New.HC', BIG[:3000])         # Home is full: grows
+    fs.write_file('C:/Home/Code.HC.Z', TEXT)            # stored compressed
+    fs.makedirs('C:/AI/tests')
+    for i in range(12):                                 # root grows too
+        fs.write_file(f'C:/R{i}.TXT', b'%d\n' % i)
+    fs.delete('C:/Home/Empty.TXT')
+    fs.write_file('C:/AI/tests/T.HC', b'"ok";\n')
+
+    check(f"{label}: replaced", fs.read_file('C:/Home/Hello.HC'), b'replaced\n')
+    check(f"{label}: new file", fs.read_file('C:/Home/New.HC'), BIG[:3000])
+    de = fs.lookup('C:/Home/Code.HC.Z')
+    check(f"{label}: .Z compressed", (de.attr & RS_ATTR_COMPRESSED,
+                                      de.size < len(TEXT)),
+          (RS_ATTR_COMPRESSED, True))
+    check(f"{label}: .Z reads back", fs.read_file('C:/Home/Code.HC.Z'), TEXT)
+    check(f"{label}: untouched", fs.read_file('C:/Home/Sub/Big.BIN'), BIG)
+    check(f"{label}: root", [de.name for de in fs.listdir('/')][:3],
+          ['AI', 'Home', 'R0.TXT'])
+    check(f"{label}: root grew", fs.root().size > BLK_SIZE, True)
+    check(f"{label}: deep file", fs.read_file('C:/AI/tests/T.HC'), b'"ok";\n')
+    check(f"{label}: deleted", fs.exists('C:/Home/Empty.TXT'), False)
+    check(f"{label}: mkdir again", fs.mkdir('C:/AI'), False)
+    check_bitmap(fs, label)
+
+
+def check_partitions(tmp, raw):
+    """Which MBR entry RedSea.open picks as C:, per DskAddDev.HC."""
+    def opens(disk):
+        path = os.path.join(tmp, 'prt.raw')
+        with open(path, 'wb') as f:
+            f.write(disk)
+        try:
+            with RedSea.open(path) as fs:
+                return fs.read_file('C:/Home/Hello.HC')
+        except ValueError:
+            return 'ValueError'
+
+    def with_type(disk, i, ptype, lba=PRT_LBA, sects=PRT_SECTS):
+        disk = bytearray(disk)
+        MBR_PRT.pack_into(disk, MBR_PRT_OFFSET + i * MBR_PRT.size, 0, 0, 0,
+                          ptype, 0, 0, lba, sects)
+        return disk
+
+    check("FAT32-typed entry with a RedSea boot record",
+          opens(with_type(raw, 0, 0x0C)), HELLO)
+    fat = with_type(raw, 0, 0x0C)
+    fat[PRT_LBA * BLK_SIZE + 3:PRT_LBA * BLK_SIZE + 11] = b'MSWIN4.1'
+    check("FAT32 drive rejected", opens(fat), 'ValueError')
+    check("RedSea-typed entry without a RedSea boot record",
+          opens(with_type(fat, 0, MBR_PT_REDSEA)), 'ValueError')
+    linux_first = with_type(with_type(raw, 0, 0x83, 1, 10), 1, MBR_PT_REDSEA)
+    check("non-RedSea/FAT32/NTFS entry takes no letter", opens(linux_first), HELLO)
+
+
+def main():
+    print("=== RedSea offline reader/writer ===\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, 'disk.raw')
+        qcow_path = os.path.join(tmp, 'disk.qcow2')
+        old = build_raw(os.path.join(tmp, 'old.raw'), hello=b'old\n')
+        raw = build_raw(raw_path)
+        build_qcow2(qcow_path, raw, snapshots=[('snap1', old)])
+
+        print("[1] raw image")
+        with RedSea.open(raw_path) as fs:
+            check_fs(fs)
+
+        print("[2] qcow2 image")
+        with open_image(qcow_path) as img:
+            check("virtual disk identical", img.read(0, img.size), raw)
+        with RedSea.open(qcow_path) as fs:
+            check_fs(fs)
+
+        print("[3] qcow2 snapshot")
+        with RedSea.open(qcow_path, snapshot='snap1') as fs:
+            check_fs(fs, hello=b'old\n')
+
+        print("[4] write raw image")
+        with RedSeaWriter.open(raw_path) as fs:
+            check_writes(fs, 'raw')
+        with RedSea.open(raw_path) as fs:
+            check("reopened", fs.read_file('C:/R11.TXT'), b'11\n')
+
+        print("[5] write qcow2 overlay")
+        base = os.path.join(tmp, 'base.raw')
+        build_raw(base)
+        with open(base, 'rb') as f:
+            before = f.read()
+        overlay = os.path.join(tmp, 'overlay.qcow2')
+        create_overlay(overlay, base)
+        with RedSeaWriter.open(overlay) as fs:
+            check_writes(fs, 'overlay')
+        with RedSea.open(overlay) as fs:
+            check("overlay reopened", fs.read_file('C:/Home/New.HC'), BIG[:3000])
+        with open(base, 'rb') as f:
+            check("backing untouched", f.read() == before, True)
+        check("overlay refcounts", qcow2_refcount_errors(overlay), 0)
+
+        print("[6] write qcow2 with a snapshot")
+        fake_savevm(overlay, 'snap1')
+        check("savevm refcounts", qcow2_refcount_errors(overlay), 0)
+        with RedSeaWriter.open(overlay) as fs:
+            fs.write_file('C:/Home/Hello.HC', b'after snapshot\n')
+            fs.write_file('C:/AI/tests/U.HC', b'1;\n')
+        with RedSea.open(overlay) as fs:
+            check("active changed", fs.read_file('C:/Home/Hello.HC'),
+                  b'after snapshot\n')
+        with RedSea.open(overlay, snapshot='snap1') as fs:
+            check("snapshot kept", (fs.read_file('C:/Home/Hello.HC'),
+                                    fs.exists('C:/AI/tests/U.HC')),
+                  (b'replaced\n', False))
+        check("COW refcounts", qcow2_refcount_errors(overlay), 0)
+
+        print("[7] partition detection")
+        check_partitions(tmp, raw)
+
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+SymbolCache tests against a fake guest symbol table (no VM needed): the
+saved index is used only while its generation is the guest's, a loadvm
+back to the snapshot drops symbols a past session defined, in-session
+defines are merged, and Agent.define() records what it defines.
+
+    python3 serial/test_symcache.py
+"""
+
+import sys, os, re, tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+from symcache import SymbolCache, defined_names
+from agent import Agent
+
+
+class FakeGuest:
+    """SerSymGen/SerSymIndex over a two-table chain: Adam and the REPL task."""
+
+    def __init__(self):
+        self.adam = {'MAlloc': 'fun', 'Print': 'fun', 'CTask': 'class'}
+        self.snapshot = {'SerSend': 'fun'}
+        self.local = dict(self.snapshot)
+        self.dumps = []
+
+    def loadvm(self):
+        self.local = dict(self.snapshot)
+
+    def define(self, name, kind='fun'):
+        self.local[name] = kind
+
+    def load_primitive(self, name):
+        pass
+
+    def send_cmd(self, cmd, timeout=None):
+        if cmd == 'SerSymGen();':
+            return b'%d' % (len(self.adam) + len(self.local))
+        local = int(re.match(r'SerSymIndex\(\d+,(\d)\);', cmd).group(1))
+        self.dumps.append('local' if local else 'full')
+        tables = [self.local] if local else [self.local, self.adam]
+        rows = [f'{n}\t{k}\t0\t0\t' for t in tables for n, k in t.items()]
+        return '\n'.join(rows).encode()
+
+
+def snapshot_reload_case(tmp):
+    path = os.path.join(tmp, 'snap1.json')
+    g = FakeGuest()
+    syms = SymbolCache(g, path=path).load()
+    check("first load dumps the chain", (g.dumps, 'MAlloc' in syms), (['full'], True))
+
+    g.define('Foo')
+    check("define in session: merged", ('Foo' in syms, syms.sync(), 'Foo' in syms),
+          (False, True, True))
+    check("merge is a local dump", g.dumps, ['full', 'local'])
+
+    g.loadvm()
+    g.dumps.clear()
+    syms = SymbolCache(g, path=path).load()
+    check("same snapshot: saved index used", (g.dumps, 'Foo' in syms), ([], False))
+
+
+def stale_saved_index_case(tmp):
+    path = os.path.join(tmp, 'snap1.json')
+    g = FakeGuest()
+    g.define('Stale')
+    SymbolCache(g, path=path).load()        # saved mid-session, after a define
+    g.loadvm()
+    g.dumps.clear()
+    syms = SymbolCache(g, path=path).load()
+    check("saved index from another generation: full dump",
+          (g.dumps, 'Stale' in syms, 'SerSend' in syms), (['full'], False, True))
+
+
+def loadvm_in_session_case(tmp):
+    g = FakeGuest()
+    syms = SymbolCache(g, path=os.path.join(tmp, 'snap1.json')).load()
+    g.define('Tmp1')
+    g.define('Tmp2')
+    syms.sync()
+    g.loadvm()
+    g.define('New')                         # generation below the index's
+    syms.sync()
+    check("shrunk generation: full dump", g.dumps[-1], 'full')
+    check("symbols from before the loadvm gone", ('Tmp1' in syms, 'New' in syms),
+          (False, True))
+
+
+def test_defined_names():
+    check("function", defined_names('I64 Sq(I64 x) { return x*x; }'),
+          [('Sq', 'fun', 'I64')])
+    code = ('U8 *Name(U8 *s,I64 n=3){if(n){return s;}}\n'
+            'I64 g_a=5,*g_b,g_c[4];\n'
+            'class CFoo{I64 a;};\n'
+            'public F64 g_f=Sin(1.5);\n'
+            'extern I64 Ext();\n'
+            'Print("I64 g_str;{");\n'
+            '// I64 g_comment;\n'
+            'g_a=3;if(g_a){I64 inner;}\n'
+            'I64 Proto(I64 a);\n')
+    check("mixed snippet", defined_names(code),
+          [('Name', 'fun', 'U8'), ('g_a', 'glbl', 'I64'), ('g_b', 'glbl', 'I64'),
+           ('g_c', 'glbl', 'I64'), ('CFoo', 'class', ''), ('g_f', 'glbl', 'F64'),
+           ('Proto', 'fun', 'I64')])
+    check("statements only", defined_names('Print("hi");g_x=2;'), [])
+
+
+class FakeAgent(Agent):
+    """define() against a canned AgentLoop reply."""
+
+    def __init__(self, syms, reply):
+        super().__init__(symbols=True)
+        self.syms = syms
+        self.reply = reply
+
+    def run(self, code, timeout=20):
+        return self.reply
+
+
+def agent_define_case(tmp):
+    g = FakeGuest()
+    syms = SymbolCache(g, path=os.path.join(tmp, 'snap1.json')).load()
+    FakeAgent(syms, '\nOK').define('I64 Cube(I64 x){return x*x*x;} I64 g_n;')
+    check("define records its names", ('Cube' in syms, syms['g_n'].kind),
+          (True, 'glbl'))
+    FakeAgent(syms, '').define('I64 Broken(I64 x){return x+;}')
+    check("a definition that did not compile is not recorded", 'Broken' in syms, False)
+
+
+def in_tmp(case):
+    """Run case(tmp) in a fresh temporary directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        case(tmp)
+
+
+def test_snapshot_reload():
+    in_tmp(snapshot_reload_case)
+
+
+def test_stale_saved_index():
+    in_tmp(stale_saved_index_case)
+
+
+def test_loadvm_in_session():
+    in_tmp(loadvm_in_session_case)
+
+
+def test_agent_define():
+    in_tmp(agent_define_case)
+
+
+def main():
+    print("=== SymbolCache ===\n")
+    print("[1] generations and snapshots")
+    test_snapshot_reload()
+    test_stale_saved_index()
+    test_loadvm_in_session()
+    print("[2] defined names")
+    test_defined_names()
+    test_agent_define()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+templez tests (no VM needed):
+- compress -> expand round trips (empty, 1 byte, 7-bit text, 8-bit binary,
+  inputs long enough to fill the 4096-entry LZW table and recycle entries);
+- byte compatibility with the guest: every input is also run through
+  fixtures/compress_hc.py, a statement-by-statement transliteration of
+  Kernel/Compress.HC, and both directions must agree byte for byte;
+- the committed fixture pair fixtures/MakeHome.HC.Z (stored bytes) and
+  fixtures/MakeHome.HC (what FileRead returns). A missing fixture fails.
+
+Provenance: no TempleOS disk image was at hand when the fixture was added, so
+MakeHome.HC.Z was written by compress_hc.CompressBuf from the mirror text
+(brain/real-temple-tree/Home/MakeHome.HC.Z, mirrored expanded through the
+guest's FileRead). To replace it with the bytes the guest's CompressBuf
+stored on disk:
+
+    python3 serial/test_templez.py --capture [TempleOS.qcow2]
+
+    python3 serial/test_templez.py
+"""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import templez
+from templez import CT_NONE, CT_7_BIT, CT_8_BIT
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+sys.path.insert(0, FIXTURE_DIR)
+import compress_hc
+
+FIXTURE = 'Home/MakeHome.HC.Z'          # guest C:/Home/MakeHome.HC.Z
+FIXTURE_Z = os.path.join(FIXTURE_DIR, 'MakeHome.HC.Z')
+FIXTURE_TEXT = os.path.join(FIXTURE_DIR, 'MakeHome.HC')
+MIRROR = os.path.join(ROOT, 'brain', 'real-temple-tree', *FIXTURE.split('/'))
+IMAGE = os.path.join(ROOT, 'TempleOS.qcow2')
+
+
+def noise(n, lo=0, hi=256, seed=1):
+    """n deterministic pseudo-random bytes in [lo, hi) (an LCG)."""
+    out = bytearray(n)
+    for i in range(n):
+        seed = (seed * 6364136223846793005 + 1442695040888963407) & (2**64 - 1)
+        out[i] = lo + (seed >> 33) % (hi - lo)
+    return bytes(out)
+
+
+def round_trip(label, data, ctype=None):
+    arc = templez.compress(data)
+    size, expanded, ct = templez.header(arc)
+    check(f"{label}: round trip", templez.expand(arc), data)
+    check(f"{label}: header sizes", (size, expanded), (len(arc), len(data)))
+    check(f"{label}: same bytes as Compress.HC", arc, compress_hc.CompressBuf(data))
+    check(f"{label}: Compress.HC ExpandBuf reads it", compress_hc.ExpandBuf(arc), data)
+    if ctype is not None:
+        check(f"{label}: compression type", ct, ctype)
+    return arc
+
+
+def test_round_trips():
+    src = open(os.path.join(ROOT, 'brain', 'templerepo', 'SerProto.HC'), 'rb').read()
+    round_trip("empty", b'', CT_NONE)
+    round_trip("1 byte", b'A')
+    round_trip("7-bit text", src * 3, CT_7_BIT)
+    round_trip("8-bit binary", bytes(range(256)) * 40 + b'\xff\x00' * 500, CT_8_BIT)
+    round_trip("incompressible", noise(300), CT_NONE)
+
+
+def test_table_recycling():
+    # Skewed text: compressible, but with far more than 4096 distinct phrases,
+    # so the code width reaches ARC_BITS_MAX and entries are recycled
+    text = bytes(b'etaoinshrdlu  \n'[x % 15] for x in noise(60000, 0, 60, seed=7))
+    arc = round_trip(">4096 codes, 7-bit", text, CT_7_BIT)
+    check(">4096 codes, 7-bit: smaller", len(arc) < len(text), True)
+    data = bytes(0x80 | (x & 0x0F) for x in noise(60000, seed=9))
+    arc = round_trip(">4096 codes, 8-bit", data, CT_8_BIT)
+    check(">4096 codes, 8-bit: smaller", len(arc) < len(data), True)
+
+
+def test_truncated():
+    arc = templez.compress(b'hello hello hello hello hello ' * 20)
+    bad = []
+    for k in (0, 5, 16, 17, len(arc) // 2, len(arc) - 1):
+        try:
+            templez.expand(arc[:k])
+            bad.append(k)
+        except ValueError:
+            pass
+    check("truncated input raises ValueError", bad, [])
+
+
+def test_fixture():
+    ok = check("fixture pair committed",
+               (os.path.exists(FIXTURE_Z), os.path.exists(FIXTURE_TEXT)), (True, True))
+    if not ok:
+        return
+    with open(FIXTURE_Z, 'rb') as f:
+        arc = f.read()
+    with open(FIXTURE_TEXT, 'rb') as f:
+        text = f.read()
+    check("fixture is an LZW archive", templez.header(arc)[1:],
+          (len(text), CT_7_BIT))
+    check("fixture expands to its original", templez.expand(arc), text)
+    check("compress() is byte-identical to the fixture", templez.compress(text), arc)
+    check("Compress.HC ExpandBuf agrees", compress_hc.ExpandBuf(arc), text)
+
+
+def capture(image=IMAGE):
+    """Copy the stored bytes of FIXTURE out of a disk image (offline), and
+    the mirror's FileRead copy as its original."""
+    from redsea import RedSea
+    with RedSea.open(image) as fs:
+        arc = fs.read_file('/' + FIXTURE, raw=True)
+    with open(MIRROR, 'rb') as f:
+        text = f.read()
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(FIXTURE_Z, 'wb') as f:
+        f.write(arc)
+    with open(FIXTURE_TEXT, 'wb') as f:
+        f.write(text)
+    print(f"wrote {FIXTURE_Z} ({len(arc)} bytes, type {templez.header(arc)[2]})")
+
+
+def main():
+    if sys.argv[1:2] == ['--capture']:
+        capture(*sys.argv[2:3])
+        return
+    print("=== templez ===\n")
+    print("[1] round trips")
+    test_round_trips()
+    test_table_recycling()
+    test_truncated()
+    print("[2] committed fixture")
+    test_fixture()
+    finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+write_file(verify=True) repair tests against an in-memory guest (no VM
+needed). The fake stores bytes the way the guest does: SerFileWrite2 and
+SerFileWriteRange as sent, SerFileWriteZ through FileWrite (compressed again
+for a .Z name), and SerFileHash hashes what FileRead returns (.Z expanded).
+
+Only the WRITE_CHUNK ranges whose SerFileHashRange differs are re-sent,
+adjacent ones in one SerFileWriteRange upload; a .Z file written through
+FileWrite is repaired with SerFileWriteZ; a size mismatch is re-uploaded
+whole. Every case checks that the file then reads back as intended.
+
+    python3 serial/test_write_verify.py
+"""
+
+import sys, os, re
+sys.path.insert(0, os.path.dirname(__file__))
+from checks import check, finish
+import templez
+from temple import Temple, TempleException, WRITE_CHUNK, I64_MAX, content_hash
+
+
+def is_dot_z(path):
+    name = path.rsplit('/', 1)[-1]
+    return name.count('.') > 1 and name.endswith('.Z')
+
+
+class FakeTemple(Temple):
+    """Guest files as stored bytes; the first upload corrupts the given
+    stored offsets (every upload with sticky=True)."""
+
+    def __init__(self, corrupt=(), sticky=False):
+        super().__init__()
+        self.files = {}
+        self.corrupt = list(corrupt)
+        self.sticky = sticky
+        self.uploads = []
+
+    def load_primitive(self, name):
+        pass
+
+    def file_read(self, path):
+        """What FileRead returns: a .Z file expanded (None if it cannot be)."""
+        data = self.files[path]
+        if not is_dot_z(path):
+            return data
+        try:
+            return templez.expand(data)
+        except ValueError:
+            return None
+
+    def _damage(self, path):
+        data = bytearray(self.files[path])
+        for off in self.corrupt:
+            if off < len(data):
+                data[off] ^= 0xFF
+        self.files[path] = bytes(data)
+
+    def _upload(self, cmd, content, retries=3, expect=b'OK'):
+        self.uploads.append((cmd.split('(')[0], len(content)))
+        name, path, n = re.match(r'(\w+)\("([^"]+)",(\d+)', cmd).groups()
+        content = bytes(content)
+        if name == 'SerFileWrite2':
+            self.files[path] = content
+        elif name == 'SerFileWriteZ':
+            data = templez.expand(content)          # ExpandBuf, then FileWrite
+            self.files[path] = templez.compress(data) if is_dot_z(path) else data
+        elif name == 'SerFileWriteRange':
+            old = self.files[path]
+            self.files[path] = old[:int(n)] + content + old[int(n) + len(content):]
+        if len(self.uploads) == 1 or self.sticky:
+            self._damage(path)
+        return b'OK'
+
+    def file_size(self, path):
+        return len(self.files[path]) if path in self.files else None
+
+    def file_hash(self, path, algo='crc32', offset=None, length=None):
+        if offset is None and length is None:
+            data = self.file_read(path)
+            return None if data is None else content_hash(data, algo)
+        data = self.files[path][offset or 0:]
+        return content_hash(data if length is None else data[:length], algo)
+
+    def send_many(self, cmds, window=8, timeout=None):
+        out = []
+        for c in cmds:
+            path, off, n = re.match(r'SerFileHashRange\("([^"]+)",(\d+),(\d+),0\);', c).groups()
+            out.append(b'%08X' % self.file_hash(path, offset=int(off), length=int(n)))
+        return out
+
+
+CONTENT = bytes(range(256)) * 80 + b'tail'      # 6 chunks, the last partial
+TEXT = b'U0 Main()\n{\n  "Hello, TempleOS!\\n";\n}\n' * 400
+
+
+def test_ranges():
+    c = WRITE_CHUNK
+    t = FakeTemple(corrupt=[5, c + 7, 5 * c + 1])
+    t.write_file('C:/AI/a.BIN', CONTENT, chunked=True, verify=True)
+    check("content repaired", t.file_read('C:/AI/a.BIN'), CONTENT)
+    check("only the bad chunks re-sent, adjacent ones together", t.uploads,
+          [('SerFileWrite2', len(CONTENT)), ('SerFileWriteRange', 2 * c),
+           ('SerFileWriteRange', len(CONTENT) - 5 * c)])
+
+
+def test_dot_z():
+    # compressed upload: the guest stores CompressBuf output, FileRead expands it
+    t = FakeTemple(corrupt=[40])
+    t.write_file('C:/AI/b.HC.Z', TEXT, compressed=True, verify=True)
+    check("FileWrite'd .Z: reads back as the text", t.file_read('C:/AI/b.HC.Z'), TEXT)
+    check("FileWrite'd .Z: repaired through SerFileWriteZ",
+          [u[0] for u in t.uploads], ['SerFileWriteZ', 'SerFileWriteZ'])
+    # chunked upload of an archive: the stored bytes are compared and repaired
+    arc = templez.compress(TEXT)
+    t = FakeTemple(corrupt=[len(arc) - 3])
+    t.write_file('C:/AI/c.HC.Z', arc, chunked=True, verify=True)
+    check("chunked .Z: stored bytes are the archive", t.files['C:/AI/c.HC.Z'], arc)
+    check("chunked .Z: reads back as the text", t.file_read('C:/AI/c.HC.Z'), TEXT)
+    check("chunked .Z: one range re-sent", [u[0] for u in t.uploads],
+          ['SerFileWrite2', 'SerFileWriteRange'])
+
+
+def test_whole():
+    t = FakeTemple()
+    t.files['C:/AI/d.BIN'] = b'short'
+    check("wrong size re-uploaded whole", t._repair_file('C:/AI/d.BIN', CONTENT),
+          len(CONTENT))
+    check("wrong size: content", t.file_read('C:/AI/d.BIN'), CONTENT)
+
+
+def test_still_bad():
+    t = FakeTemple(corrupt=[9], sticky=True)
+    try:
+        t.write_file('C:/AI/e.BIN', CONTENT, chunked=True, verify=True)
+        got = None
+    except TempleException as e:
+        got = str(e)
+    check("persistent mismatch raises verify", got, 'verify')
+
+
+class CmdTemple(Temple):
+    """Records the command lines file_hash() sends."""
+
+    def __init__(self):
+        super().__init__()
+        self.cmds = []
+
+    def load_primitive(self, name):
+        pass
+
+    def send_cmd(self, cmd, timeout=None):
+        self.cmds.append(cmd)
+        return b'0000ABCD'
+
+
+def test_hash_to_end():
+    t = CmdTemple()
+    t.file_hash('C:/AI/a.BIN', offset=4096)
+    off, n = map(int, re.search(r',(\d+),(\d+),0\);', t.cmds[0]).groups())
+    check("hash from an offset to the end: off+len fits an I64",
+          (off, off + n <= I64_MAX, n > 2**40), (4096, True, True))
+
+
+def main():
+    print("=== write_file(verify=True) ===\n")
+    print("[1] ranged repair")
+    test_ranges()
+    print("[2] .Z files")
+    test_dot_z()
+    print("[3] whole re-upload")
+    test_whole()
+    test_still_bad()
+    print("[4] ranged hash")
+    test_hash_to_end()
+    finish()
+
+
+if __name__ == '__main__':
+    main()